@@ -1,10 +1,19 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import altair as alt
+import functools
 import json
 import os
 import requests
 import data_manager
 import pdf_generator
+import pdf_jobs
+import programme_graph
+from artifact_store import ArtifactStore
+import scheduler
+import simulation
+import solver
 
 # Constants
 URL_ANALYSE_IA = 'https://n8n.srv775529.hstgr.cloud/webhook/analyze-meal'
@@ -84,46 +93,79 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# Chargement des données Ciqual
-@st.cache_data
-def load_data():
+# Chargement de la base Ciqual : une seule instance partagée par toutes les sessions
+@st.cache_resource
+def load_food_db():
     try:
-        df = pd.read_excel("Ciqual.xlsx")
-        column_mapping = {
-            'alim_nom_fr': 'alim_nom_fr',
-            'Energie,\nRèglement\nUE N°\n1169\n2011 (kcal\n100 g)': 'Energie_kcal_100g',
-            'Protéines,\nN x\nfacteur de\nJones (g\n100 g)': 'Proteines_Jones_g_100g',
-            'Glucides\n(g\n100 g)': 'Glucides_g_100g',
-            'Lipides\n(g\n100 g)': 'Lipides_g_100g'
-        }
-        df = df.rename(columns=column_mapping)
-        cols_to_keep = [c for c in column_mapping.values() if c in df.columns]
-        df = df[cols_to_keep]
-
-        def clean_val(x):
-            if pd.isna(x): return 0.0
-            if isinstance(x, (int, float)): return float(x)
-            if isinstance(x, str):
-                x = x.strip()
-                if x == '-' or x == 'traces': return 0.0
-                if x.startswith('<'):
-                    x = x.replace('<', '').strip()
-                return float(x.replace(',', '.'))
-            return 0.0
-
-        numeric_cols = ['Energie_kcal_100g', 'Proteines_Jones_g_100g', 'Glucides_g_100g', 'Lipides_g_100g']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = df[col].apply(clean_val)
-        return df
+        db = data_manager.FoodDatabase.load("Ciqual.xlsx")
+        db.search_index     # index de recherche construit une fois, partagé
+        db.neighbour_index  # index voisins (profils macro), persisté avec le cache
+        return db
     except FileNotFoundError:
         st.error("Fichier Ciqual.xlsx introuvable.")
-        return pd.DataFrame()
+        return None
     except Exception as e:
         st.error(f"Erreur lors du chargement des données : {e}")
-        return pd.DataFrame()
+        return None
+
+food_db = load_food_db()
+
+
+# Grille "what-if" poids x kcal, recalculée seulement si les ratios ou les plages changent
+@st.cache_data
+def macro_grid(ratios_items, poids, kcal):
+    return data_manager.macro_grid(
+        np.arange(poids[0], poids[1] + 1e-9, 1.0), np.arange(kcal[0], kcal[1] + 1e-9, 25.0), dict(ratios_items)
+    )
+
+
+# PDF générés : sur disque, la session ne garde que leur handle
+@st.cache_resource
+def artifact_store():
+    return ArtifactStore()
+
+
+def pdf_a_telecharger(handle, payload):
+    """
+    Octets du PDF pour st.download_button (appelé au clic). Si le fichier a
+    expiré entre l'affichage du bouton et le clic, le PDF est rendu à
+    nouveau à partir du payload plutôt que de renvoyer un téléchargement vide.
+    """
+    store = artifact_store()
+    try:
+        f = store.open(handle)
+    except FileNotFoundError:
+        if payload is None:
+            raise
+        f = store.open(store.put_stream(lambda sink: pdf_generator.write_programme_pdf(payload, sink)))
+    with f:
+        return f.read()
+
+
+# Pool de rendu des PDF : un seul pour toutes les sessions
+@st.cache_resource
+def pdf_job_queue():
+    return pdf_jobs.PdfJobQueue(artifact_store())
+
+
+# Graphe de calcul de l'onglet Programme : un par session, seuls les nœuds
+# dont une entrée a changé sont recalculés à chaque exécution de la page
+if "programme_graph" not in st.session_state:
+    st.session_state.programme_graph = programme_graph.ProgrammeGraph()
+graphe = st.session_state.programme_graph
+graphe.begin_run()
+
+
+@st.fragment(run_every=1.0)
+def suivi_pdf(job_id):
+    """Attente du PDF sans bloquer la page ; relance l'application quand il est prêt."""
+    statut = pdf_job_queue().status(job_id)
+    if statut in ("en_attente", "en_cours"):
+        st.info("⏳ Génération du programme alimentaire en cours..." if statut == "en_cours"
+                else "⏳ Programme alimentaire en file d'attente...")
+    else:
+        st.rerun()
 
-df = load_data()
 
 # ============================================================
 # SIDEBAR : Profil & BMR
@@ -168,14 +210,10 @@ if bmr_formula == "Muller":
     )
 
 # Calcul du BMR selon la formule choisie
-if bmr_formula == "Harris-Benedict":
-    bmr = data_manager.calc_bmr_harris_benedict(gender, weight, height, age)
-elif bmr_formula == "Black et al (1996)":
-    bmr = data_manager.calc_bmr_black(gender, weight, height, age)
-elif bmr_formula == "Muller":
-    bmr = data_manager.calc_bmr_muller(gender, weight, age, body_fat_pct)
-
-tdee = bmr * activity_factor
+graphe.set_inputs(sexe=gender, age=age, poids=weight, taille=height, facteur_activite=activity_factor,
+                  formule_bmr=bmr_formula, masse_grasse=body_fat_pct)
+bmr = graphe.get("bmr")
+tdee = graphe.get("tdee")
 
 st.sidebar.info(f"**Formule :** {bmr_formula}\n\n**BMR :** {int(bmr)} kcal\n\n**TDEE :** {int(tdee)} kcal")
 
@@ -192,7 +230,8 @@ st.caption("Générateur de Programme Alimentaire par Équivalences")
 
 # Chargement des réglages praticien
 settings = data_manager.get_settings()
-portions = settings.get("portions", data_manager.DEFAULT_SETTINGS["portions"])
+graphe.set_inputs(client_ref=client_name, kcal_cible=target_cals, settings=settings, food_db=food_db)
+portions = graphe.get("portions")
 
 # Système d'Onglets
 if SHOW_AI_TAB:
@@ -272,7 +311,8 @@ with tab_programme:
         "lipides_pct": patient_lip_pct,
         "glucides_pct_min": patient_glu_min,
     }
-    macros = data_manager.compute_macros_targets(weight, target_cals, patient_ratios)
+    graphe.set_inputs(objectifs=st.session_state.objectifs, ratios=patient_ratios)
+    macros = graphe.get("macros")
 
     df_macros = pd.DataFrame([
         {"Macro": "Protéines", "Grammes": f"{macros['proteines']['g']:.1f} g",
@@ -290,22 +330,52 @@ with tab_programme:
     else:
         st.success("✅ Répartition cohérente avec les cibles cliniques.")
 
+    with st.expander("📈 Sensibilité : macros selon le poids et les calories"):
+        col_s1, col_s2 = st.columns(2)
+        plage_poids = col_s1.slider("Poids (kg)", 30, 200, (50, 150), step=5, key="grid_poids")
+        plage_kcal = col_s2.slider("Calories (kcal)", 800, 4000, (1200, 3000), step=100, key="grid_kcal")
+        indicateurs = {
+            "Glucides (% kcal)": "glu_pct",
+            "Protéines (% kcal)": "prot_pct",
+            "Protéines (g)": "prot_g",
+            "Glucides (g)": "glu_g",
+            "Lipides (g)": "lip_g",
+            "Nombre d'alertes": "n_alertes",
+        }
+        indicateur = st.selectbox("Indicateur", list(indicateurs), key="grid_indicateur")
+        grille = macro_grid(tuple(sorted(patient_ratios.items())), plage_poids, plage_kcal)
+        colonne = indicateurs[indicateur]
+        carte = alt.Chart(grille).mark_rect().encode(
+            x=alt.X("weight:O", title="Poids (kg)", axis=alt.Axis(values=list(range(plage_poids[0], plage_poids[1] + 1, 10)))),
+            y=alt.Y("kcal:O", title="Calories (kcal)", sort="descending",
+                    axis=alt.Axis(values=list(range(plage_kcal[0], plage_kcal[1] + 1, 200)))),
+            color=alt.Color(f"{colonne}:Q", title=indicateur),
+            tooltip=["weight", "kcal", "prot_g", "prot_pct", "lip_g", "glu_g", "glu_pct", "n_alertes"],
+        )
+        point = {"weight": round(weight), "kcal": int(round(target_cals / 25) * 25)}
+        if plage_poids[0] <= point["weight"] <= plage_poids[1] and plage_kcal[0] <= point["kcal"] <= plage_kcal[1]:
+            carte += alt.Chart(pd.DataFrame([point])).mark_point(
+                shape="cross", size=200, color="black", filled=True
+            ).encode(x="weight:O", y=alt.Y("kcal:O", sort="descending"))
+        st.altair_chart(carte, use_container_width=True)
+        st.caption("Croix : patient actuel. Alertes : protéines hors 1,2-1,5 g/kg, lipides > 34 %, glucides sous le minimum.")
+
     st.markdown("---")
 
     # --- Section Petit-Déjeuner ---
     st.subheader("🌅 Petit-Déjeuner")
     
-    options_pdj = settings.get("options_pdj", data_manager.DEFAULT_SETTINGS["options_pdj"])
+    options_pdj = graphe.get("options_pdj")
     
     st.write("**Options au choix pour varier :**")
     
     # Permettre de sélectionner/désélectionner les options PDJ
     selected_pdj = []
-    for i, opt in enumerate(options_pdj):
+    for i, (opt, m_opt) in enumerate(zip(options_pdj, graphe.get("macros_pdj"))):
         label = f"Option {i+1}" + (" (plaisir)" if i == len(options_pdj)-1 else "")
         if st.checkbox(label, value=True, key=f"pdj_{i}"):
             selected_pdj.append(opt)
-        st.caption(f"  → {opt}")
+        st.caption(f"  → {opt}  ·  ≈ {m_opt['kcal']:.0f} kcal (P {m_opt['prot']:.0f} / G {m_opt['carb']:.0f} / L {m_opt['lip']:.0f} g)")
     
     st.info("💡 Ces options peuvent être à emporter. Les options \"plaisir\" doivent être occasionnelles.")
     
@@ -334,12 +404,11 @@ with tab_programme:
                 value=int(portions.get("proteines_oeufs", 3)), 
                 step=1, key="dej_oeufs"
             )
+        graphe.set_inputs(dej_viande=portion_viande, dej_poisson=portion_poisson, dej_oeufs=portion_oeufs)
         with col_p2:
             st.write("**Table d'équivalences protéines**")
             st.caption("Par catégorie : UNE portion par catégorie, puis choix libre de l'aliment.")
-            equiv_prot = data_manager.generate_protein_equivalences(
-                portion_viande, portion_poisson, portion_oeufs
-            )
+            equiv_prot = graphe.get("equiv_dej_proteines")
             if equiv_prot:
                 df_equiv_p = pd.DataFrame(equiv_prot)
                 df_equiv_p.columns = ["Catégorie", "Aliment", "Poids", "Kcal"]
@@ -356,7 +425,8 @@ with tab_programme:
             )
         with col_f2:
             st.write("**Table d'équivalences féculents**")
-            equiv_fec = data_manager.generate_equivalences("Féculents", portion_feculents)
+            graphe.set_inputs(dej_feculents=portion_feculents)
+            equiv_fec = graphe.get("equiv_dej_feculents")
             if equiv_fec:
                 df_equiv_f = pd.DataFrame(equiv_fec)
                 df_equiv_f.columns = ["Aliment", "Poids (g)", "Kcal"]
@@ -378,7 +448,8 @@ with tab_programme:
             )
         with col_l2:
             st.write("**Table d'équivalences légumes**")
-            equiv_leg = data_manager.generate_equivalences("Légumes", portion_legumes)
+            graphe.set_inputs(dej_legumes=portion_legumes, dej_crudites=portion_crudites)
+            equiv_leg = graphe.get("equiv_dej_legumes")
             if equiv_leg:
                 df_equiv_l = pd.DataFrame(equiv_leg)
                 df_equiv_l.columns = ["Aliment", "Poids (g)", "Kcal"]
@@ -396,7 +467,8 @@ with tab_programme:
             )
         with col_mg2:
             st.write("**Table d'équivalences matières grasses**")
-            equiv_mg = data_manager.generate_equivalences("Matières Grasses", portion_mg)
+            graphe.set_inputs(dej_mg=portion_mg)
+            equiv_mg = graphe.get("equiv_dej_mg")
             if equiv_mg:
                 df_equiv_mg = pd.DataFrame(equiv_mg)
                 df_equiv_mg.columns = ["Aliment", "Poids (g)", "Kcal"]
@@ -411,13 +483,13 @@ with tab_programme:
     # --- Section Collation ---
     st.subheader("☕ Collation - Après-midi")
     
-    options_collation = settings.get("options_collation", data_manager.DEFAULT_SETTINGS["options_collation"])
+    options_collation = graphe.get("options_collation")
     
     selected_collation = []
-    for i, opt in enumerate(options_collation):
+    for i, (opt, m_opt) in enumerate(zip(options_collation, graphe.get("macros_collation"))):
         if st.checkbox(f"Option {i+1}", value=True, key=f"col_{i}"):
             selected_collation.append(opt)
-        st.caption(f"  → {opt}")
+        st.caption(f"  → {opt}  ·  ≈ {m_opt['kcal']:.0f} kcal (P {m_opt['prot']:.0f} / G {m_opt['carb']:.0f} / L {m_opt['lip']:.0f} g)")
     
     st.info("☕ Accompagner votre collation d'une boisson chaude (thé, tisane sans sucre) ou d'eau.")
     
@@ -449,9 +521,9 @@ with tab_programme:
         with col_dp2:
             st.write("**Équivalences protéines**")
             st.caption("Par catégorie : UNE portion par catégorie, puis choix libre de l'aliment.")
-            equiv_prot_d = data_manager.generate_protein_equivalences(
-                diner_portion_viande, diner_portion_poisson, diner_portion_oeufs
-            )
+            graphe.set_inputs(din_viande=diner_portion_viande, din_poisson=diner_portion_poisson,
+                              din_oeufs=diner_portion_oeufs)
+            equiv_prot_d = graphe.get("equiv_din_proteines")
             if equiv_prot_d:
                 df_ep_d = pd.DataFrame(equiv_prot_d)
                 df_ep_d.columns = ["Catégorie", "Aliment", "Poids", "Kcal"]
@@ -468,7 +540,8 @@ with tab_programme:
             )
         with col_df2:
             st.write("**Équivalences féculents**")
-            equiv_fec_d = data_manager.generate_equivalences("Féculents", diner_portion_feculents)
+            graphe.set_inputs(din_feculents=diner_portion_feculents)
+            equiv_fec_d = graphe.get("equiv_din_feculents")
             if equiv_fec_d:
                 df_ef_d = pd.DataFrame(equiv_fec_d)
                 df_ef_d.columns = ["Aliment", "Poids (g)", "Kcal"]
@@ -490,7 +563,8 @@ with tab_programme:
             )
         with col_dmg2:
             st.write("**Équivalences matières grasses**")
-            equiv_mg_d = data_manager.generate_equivalences("Matières Grasses", diner_portion_mg)
+            graphe.set_inputs(din_mg=diner_portion_mg)
+            equiv_mg_d = graphe.get("equiv_din_mg")
             if equiv_mg_d:
                 df_emg_d = pd.DataFrame(equiv_mg_d)
                 df_emg_d.columns = ["Aliment", "Poids (g)", "Kcal"]
@@ -522,7 +596,7 @@ with tab_programme:
     
     # --- Section Hydratation ---
     st.subheader("💧 Hydratation")
-    hydratation = settings.get("hydratation", data_manager.DEFAULT_SETTINGS["hydratation"])
+    hydratation = graphe.get("hydratation")
     st.write(f"**Objectif :** Boire au moins {hydratation.get('objectif_litres', 1.5)}-2L par jour")
     st.write(f"**Répartition :** {hydratation.get('repartition', '')}")
     st.write(f"**Café/Thé noir :** Limiter à {hydratation.get('max_cafe_the', 3)} tasses par jour. Privilégier tisanes et infusions.")
@@ -533,7 +607,7 @@ with tab_programme:
     st.subheader("📖 Listes de Référence")
     
     with st.expander("🥜 Légumineuses"):
-        equiv_leg_sec = data_manager.generate_equivalences("Légumineuses", int(portions.get("legumineuses_cuites", 160)))
+        equiv_leg_sec = graphe.get("equiv_legumineuses")
         if equiv_leg_sec:
             df_ls = pd.DataFrame(equiv_leg_sec)
             df_ls.columns = ["Aliment", "Poids (g)", "Kcal"]
@@ -558,7 +632,7 @@ with tab_programme:
         st.caption("Pour les fruits séchés : même quantité en frais que séché.")
     
     with st.expander("🥛 Produits Laitiers"):
-        equiv_lait = data_manager.generate_equivalences("Produits Laitiers", int(portions.get("fromage_blanc", 100)))
+        equiv_lait = graphe.get("equiv_laitiers")
         if equiv_lait:
             df_lait = pd.DataFrame(equiv_lait)
             df_lait.columns = ["Aliment", "Poids (g)", "Kcal"]
@@ -573,30 +647,8 @@ with tab_programme:
         "avec les cibles journalières. PDJ et collation doivent combler le reste."
     )
 
-    dej_payload_tmp = {
-        "proteines": {"portion_viande_g": portion_viande},
-        "feculents": {"portion_g": portion_feculents},
-        "legumes":   {"portion_cuits_g": portion_legumes},
-        "matieres_grasses": {"portion_g": portion_mg},
-    }
-    din_payload_tmp = {
-        "proteines": {"portion_viande_g": diner_portion_viande},
-        "feculents": {"portion_g": diner_portion_feculents},
-        "legumes":   {"portion_cuits_g": int(portions.get("legumes_cuits", 200))},
-        "matieres_grasses": {"portion_g": diner_portion_mg},
-    }
-    fourni = data_manager.estimate_programme_macros(
-        dej_payload_tmp, din_payload_tmp,
-        portion_fruit_g=int(portions.get("fruits", 100)),
-        portion_laitier_g=int(portions.get("fromage_blanc", 100)),
-    )
-
-    cibles = {
-        "prot": macros["proteines"]["g"],
-        "carb": macros["glucides"]["g"],
-        "lip":  macros["lipides"]["g"],
-        "kcal": macros["proteines"]["kcal"] + macros["glucides"]["kcal"] + macros["lipides"]["kcal"],
-    }
+    fourni = graphe.get("fourni")
+    cibles = graphe.get("cibles")
 
     def _delta_fmt(fourni_val, cible_val):
         delta = fourni_val - cible_val
@@ -635,6 +687,105 @@ with tab_programme:
             f"{abs(reste_kcal):.0f} kcal. Réduire certaines portions."
         )
 
+    # Couples PDJ + collation les plus proches du reste à combler
+    if reste_kcal > 0:
+        couples = graphe.get("couples")
+        if couples:
+            st.write("**🥣 Meilleures combinaisons PDJ + collation pour le reste**")
+            st.dataframe(pd.DataFrame([
+                {"PDJ": f"Option {c['pdj'] + 1}", "Collation": f"Option {c['collation'] + 1}",
+                 "Kcal": f"{c['fourni']['kcal']:.0f}", "Prot (g)": f"{c['fourni']['prot']:.1f}",
+                 "Gluc (g)": f"{c['fourni']['carb']:.1f}", "Lip (g)": f"{c['fourni']['lip']:.1f}",
+                 "Écart kcal": f"{c['ecarts']['kcal']:+.0f}"}
+                for c in couples
+            ]), use_container_width=True, hide_index=True)
+            journee = graphe.get("journee")
+            st.caption(
+                f"Journée complète avec la 1re combinaison : {journee['kcal']:.0f} kcal · "
+                f"prot {journee['prot']:.1f} g · gluc {journee['carb']:.1f} g · lip {journee['lip']:.1f} g. "
+                "Macros des options estimées à partir de leur texte (mesures ménagères, Ciqual)."
+            )
+
+            def _preselectionner_options(couples):
+                pdj = {c["pdj"] for c in couples}
+                collations = {c["collation"] for c in couples}
+                for i in range(len(options_pdj)):
+                    st.session_state[f"pdj_{i}"] = i in pdj
+                for i in range(len(options_collation)):
+                    st.session_state[f"col_{i}"] = i in collations
+
+            st.button("Ne cocher que ces options", on_click=_preselectionner_options, args=(couples,),
+                      key="apply_snacks")
+
+    # Portions optimisées : solveur déj/dîner sur les cibles macros
+    st.write("**🧮 Portions optimisées**")
+    part_repas_pct = st.slider(
+        "Part des cibles journalières couverte par déjeuner + dîner (%)",
+        min_value=40, max_value=90, value=int(solver.DEFAULT_PART_REPAS * 100), step=5,
+        key="part_repas", help="Le reste est laissé au petit-déjeuner et à la collation."
+    )
+    graphe.set_inputs(part_repas_pct=part_repas_pct)
+    solution = graphe.get("solution")
+    labels_groupes = {"proteines": "Protéines (viande)", "feculents": "Féculents cuits",
+                      "legumes": "Légumes cuits", "matieres_grasses": "Matières grasses"}
+    st.dataframe(pd.DataFrame([
+        {"Groupe": label, "Déjeuner (g)": f"{solution['dejeuner'][g]:.0f}", "Dîner (g)": f"{solution['diner'][g]:.0f}"}
+        for g, label in labels_groupes.items()
+    ]), use_container_width=True, hide_index=True)
+    st.caption(
+        f"Écarts à {part_repas_pct} % des cibles : "
+        f"prot {solution['ecarts']['prot']:+.1f} g · gluc {solution['ecarts']['carb']:+.1f} g · "
+        f"lip {solution['ecarts']['lip']:+.1f} g · {solution['ecarts']['kcal']:+.0f} kcal"
+        + ("" if solution["optimal"] else " · meilleure solution trouvée dans le temps imparti")
+    )
+    if not solution["faisable"]:
+        st.warning("⚠️ Aucune combinaison de portions ne respecte les limites cliniques (lipides ≤ 34 %, glucides minimum) avec ces bornes.")
+
+    def _appliquer_portions(sol):
+        widget_keys = {
+            ("dejeuner", "proteines"): "dej_viande", ("dejeuner", "feculents"): "dej_feculents",
+            ("dejeuner", "legumes"): "dej_legumes", ("dejeuner", "matieres_grasses"): "dej_mg",
+            ("diner", "proteines"): "din_viande", ("diner", "feculents"): "din_feculents",
+            ("diner", "matieres_grasses"): "din_mg",
+        }
+        for (repas, groupe), key in widget_keys.items():
+            st.session_state[key] = int(round(sol[repas][groupe]))
+
+    st.button("Appliquer ces portions", on_click=_appliquer_portions, args=(solution,), key="apply_solver")
+
+    # Adhérence : journées simulées à partir des choix libres du patient.
+    # Contenu exécuté seulement expander ouvert (programme_graph.A_LA_DEMANDE)
+    with st.expander("🎲 Simulation des choix du patient", key="simu_ouvert", on_change="rerun") as simu:
+        st.caption(
+            "Chaque journée tire au hasard un aliment dans chaque table d'équivalences "
+            "(protéine, féculent, légumes, matière grasse, dessert) et une option PDJ / collation."
+        )
+        n_jours = st.select_slider("Journées simulées", options=[10_000, 50_000, 100_000], value=100_000,
+                                   key="simu_n")
+        graphe.set_inputs(simu_n=n_jours)
+        if simu.open:
+            jours = graphe.get("simulation_jours")
+            resume = graphe.get("simulation_resume")
+            labels_macros = {"prot": "Protéines (g)", "carb": "Glucides (g)", "lip": "Lipides (g)", "kcal": "Kcal"}
+            st.dataframe(pd.DataFrame([
+                {"Macro": labels_macros[m], "Cible": s["cible"], "Moyenne": s["moyenne"],
+                 "p5": s["p5"], "p95": s["p95"]}
+                for m, s in resume["macros"].items()
+            ]), use_container_width=True, hide_index=True)
+            st.caption(
+                f"Lipides > {simulation.LIPIDES_PLAFOND_PCT} % des kcal : {resume['p_lipides_plafond']:.0%} des journées, "
+                f"{resume['p_semaine_lipides_plafond']:.0%} des semaines · "
+                f"glucides sous le plancher : {resume['p_glucides_plancher']:.0%} · "
+                f"kcal au-dessus de la cible : {resume['p_kcal_depasse']:.0%}"
+            )
+            st.altair_chart(
+                alt.Chart(pd.DataFrame({"kcal": jours[:5000, 3]})).mark_bar().encode(
+                    alt.X("kcal:Q", bin=alt.Bin(maxbins=40), title="Kcal de la journée"),
+                    alt.Y("count()", title="Journées"),
+                ),
+                use_container_width=True,
+            )
+
     st.markdown("---")
 
     # --- Section Fréquences + Conseils ---
@@ -642,7 +793,7 @@ with tab_programme:
     
     # Fréquences protéines
     with st.expander("🔄 Fréquences Protéines"):
-        freq = settings.get("frequences_proteines", data_manager.DEFAULT_SETTINGS["frequences_proteines"])
+        freq = graphe.get("frequences_proteines")
         freq_data = [
             {"Type": "Viandes blanches", "Fréquence": freq.get("viandes_blanches", "5 fois/semaine")},
             {"Type": "Viandes rouges", "Fréquence": freq.get("viandes_rouges", "max 2 fois/semaine")},
@@ -651,9 +802,25 @@ with tab_programme:
             {"Type": "Végétarien", "Fréquence": freq.get("vegetarien", "min 3-4 fois/semaine")},
         ]
         st.dataframe(pd.DataFrame(freq_data), use_container_width=True, hide_index=True)
+
+        st.write("**📅 Semaine type** (protéine de chaque déjeuner / dîner)")
+        graine = st.number_input("Tirage n°", min_value=0, value=0, step=1, key="semaine_seed",
+                                 help="Changer le numéro pour proposer une autre semaine.")
+        graphe.set_inputs(semaine_graine=int(graine))
+        semaine = graphe.get("semaine")
+        if semaine:
+            semaine = pd.DataFrame(semaine)
+            st.dataframe(
+                semaine.pivot(index="jour", columns="repas", values="aliment")
+                .reindex(index=list(scheduler.JOURS), columns=list(scheduler.REPAS))
+                .rename(columns={"dejeuner": "Déjeuner", "diner": "Dîner"}),
+                use_container_width=True,
+            )
+        else:
+            st.warning("⚠️ Aucune semaine ne respecte ces fréquences avec les portions actuelles.")
     
     # Conseils
-    conseils = settings.get("conseils_generaux", data_manager.DEFAULT_SETTINGS["conseils_generaux"])
+    conseils = graphe.get("conseils_generaux")
     st.text_area("Conseils à inclure dans le programme", value=conseils, height=200, key="conseils_display", disabled=True)
     
     st.markdown("---")
@@ -661,98 +828,70 @@ with tab_programme:
     # --- GÉNÉRATION DU PDF ---
     st.subheader("📤 Générer le Programme Alimentaire")
     
-    # Construction du payload
-    payload = {
-        "client_ref": client_name,
-        "bmr": round(bmr, 1),
-        "tdee": round(tdee, 1),
-        "formule_bmr": bmr_formula,
-        "objectifs": st.session_state.objectifs,
-        "macros": macros,
-        "poids_kg": weight,
-        "petit_dejeuner": {
-            "options": selected_pdj
-        },
-        "dejeuner": {
-            "proteines": {
-                "portion_viande_g": portion_viande,
-                "portion_poisson_g": portion_poisson,
-                "portion_oeufs": portion_oeufs,
-                "equivalences_par_categorie": data_manager.generate_protein_equivalences(
-                    portion_viande, portion_poisson, portion_oeufs
-                ),
-            },
-            "feculents": {
-                "portion_g": portion_feculents,
-                "equivalences": data_manager.generate_equivalences("Féculents", portion_feculents)
-            },
-            "legumes": {
-                "portion_cuits_g": portion_legumes,
-                "portion_crudites_g": portion_crudites,
-                "equivalences": data_manager.generate_equivalences("Légumes", portion_legumes)
-            },
-            "matieres_grasses": {
-                "portion_g": portion_mg,
-                "equivalences": data_manager.generate_equivalences("Matières Grasses", portion_mg)
-            },
-            "dessert": "1 fruit"
-        },
-        "collation": {
-            "options": selected_collation
-        },
-        "diner": {
-            "proteines": {
-                "portion_viande_g": diner_portion_viande,
-                "portion_poisson_g": diner_portion_poisson,
-                "portion_oeufs": diner_portion_oeufs,
-                "equivalences_par_categorie": data_manager.generate_protein_equivalences(
-                    diner_portion_viande, diner_portion_poisson, diner_portion_oeufs
-                ),
-            },
-            "feculents": {
-                "portion_g": diner_portion_feculents,
-                "equivalences": data_manager.generate_equivalences("Féculents", diner_portion_feculents)
-            },
-            "legumes": {
-                "portion_cuits_g": int(portions.get("legumes_cuits", 200)),
-                "portion_crudites_g": int(portions.get("legumes_crus", 150)),
-            },
-            "matieres_grasses": {
-                "portion_g": diner_portion_mg,
-                "equivalences": data_manager.generate_equivalences("Matières Grasses", diner_portion_mg)
-            },
-            "dessert": "100g fromage blanc/Skyr/yaourt grecque"
-        },
-        "hydratation": hydratation,
-        "frequences_proteines": freq,
-        "conseils_generaux": conseils,
-        "listes_reference": {
-            "legumineuses": data_manager.generate_equivalences("Légumineuses", int(portions.get("legumineuses_cuites", 160))),
-            "fruits_equivalences": "1 fruit ≈ 100g = 1 pomme, 1 poire, 1 banane, 2 clémentines, 1 orange, 10-15 raisins, etc."
-        }
-    }
-    
+    # Le payload est un nœud du graphe : construit à la première lecture
+    # (aperçu, export), puis seulement quand une de ses entrées change
+    graphe.set_inputs(pdj_choisies=selected_pdj, collation_choisies=selected_collation)
+
+    # Aperçu : mêmes sections que le PDF (programme_model) ; le HTML n'est
+    # refait que si le payload change et l'expander ouvert, le PDF n'est
+    # rendu qu'à l'export
+    with st.expander("👁️ Aperçu du programme", expanded=True, key="apercu_ouvert", on_change="rerun") as ouvert:
+        if ouvert.open:
+            with st.container(height=650):
+                st.html(graphe.get("apercu"))
+
     if st.button("🚀 Générer le PDF", type="primary"):
-        with st.spinner("Génération du programme alimentaire..."):
-            try:
-                pdf_bytes = bytes(pdf_generator.generate_programme_pdf(payload))
-                st.session_state.pdf_data = pdf_bytes
-                st.session_state.pdf_filename = f"Programme_Alimentaire_{client_name.replace(' ', '_')}.pdf"
-                st.success("✅ Programme Alimentaire généré avec succès !")
-                st.balloons()
-            except Exception as e:
-                st.error(f"Erreur lors de la génération : {e}")
-    
-    # Bouton de téléchargement (persiste après génération)
-    if 'pdf_data' in st.session_state and st.session_state.pdf_data:
+        # Mêmes entrées = même travail : le PDF n'est pas rendu deux fois
+        st.session_state.pdf_payload = graphe.get("payload")
+        st.session_state.pdf_job = pdf_job_queue().submit(st.session_state.pdf_payload)
+        st.session_state.pdf_filename = f"Programme_Alimentaire_{client_name.replace(' ', '_')}.pdf"
+        st.session_state.pdf_handle = None
+
+    job_id = st.session_state.get("pdf_job")
+    if job_id:
+        jobs = pdf_job_queue()
+        statut = jobs.status(job_id)
+        if statut in ("en_attente", "en_cours"):
+            suivi_pdf(job_id)
+        elif statut == "termine":
+            st.session_state.pdf_handle = jobs.result(job_id)
+            st.session_state.pdf_job = None
+            st.success("✅ Programme Alimentaire généré avec succès !")
+            st.balloons()
+        elif statut == "erreur":
+            st.error(f"Erreur lors de la génération : {jobs.error(job_id)}")
+            st.session_state.pdf_job = None
+        elif st.session_state.get("pdf_payload") is not None:
+            # PDF évincé (TTL) ou travail oublié : rendu relancé
+            st.session_state.pdf_job = jobs.submit(st.session_state.pdf_payload)
+            suivi_pdf(st.session_state.pdf_job)
+        else:
+            st.error("Le PDF demandé n'est plus disponible : cliquer sur « Générer le PDF » pour le refaire.")
+            st.session_state.pdf_job = None
+
+    # Bouton de téléchargement (persiste après génération) : le fichier n'est
+    # relu sur disque qu'au clic
+    handle = st.session_state.get("pdf_handle")
+    if handle and not artifact_store().exists(handle):
+        st.session_state.pdf_handle = handle = None
+        st.info("Le PDF généré a expiré : cliquer sur « Générer le PDF » pour le refaire.")
+    if handle:
         st.download_button(
             label="📥 Télécharger le PDF",
-            data=st.session_state.pdf_data,
+            data=functools.partial(pdf_a_telecharger, handle, st.session_state.get("pdf_payload")),
             file_name=st.session_state.pdf_filename,
             mime="application/pdf",
             type="primary"
         )
 
+    with st.expander("⏱️ Temps de calcul (graphe du programme)"):
+        stats_graphe = pd.DataFrame(graphe.stats())
+        st.caption(f"{int(stats_graphe['recalcule'].sum())} nœud(s) recalculé(s) sur {len(stats_graphe)} à cette exécution.")
+        st.dataframe(stats_graphe.rename(columns={
+            "noeud": "Nœud", "recalculs": "Recalculs", "caches": "En cache",
+            "dernier_ms": "Dernier (ms)", "total_ms": "Total (ms)", "recalcule": "Recalculé",
+        }), use_container_width=True, hide_index=True)
+
 
 # ============================================================
 # TAB 2 : ASSISTANT IA
@@ -821,15 +960,32 @@ if tab_ia is not None:
     st.subheader("🔎 Recherche Ciqual")
     st.write("Rechercher un aliment dans la base Ciqual pour voir ses valeurs nutritionnelles.")
     
-    if not df.empty:
-        food_search = st.selectbox("Rechercher un aliment", options=[""] + df['alim_nom_fr'].tolist(), key="ciqual_search")
+    if food_db is not None and len(food_db):
+        food_query = st.text_input(
+            "Rechercher un aliment", key="ciqual_query",
+            placeholder="Ex : riz cuit, pomme, saumon…"
+        )
+        food_search = None
+        if food_query:
+            resultats = food_db.search(food_query, k=15)
+            if resultats:
+                food_search = st.selectbox("Résultats", options=resultats, key="ciqual_search")
+            else:
+                st.caption("Aucun aliment trouvé.")
         if food_search:
-            food_data = df[df['alim_nom_fr'] == food_search].iloc[0]
+            food_data = food_db.get(food_search)
             col_n1, col_n2, col_n3, col_n4 = st.columns(4)
-            col_n1.metric("Énergie", f"{food_data['Energie_kcal_100g']:.0f} kcal/100g")
-            col_n2.metric("Protéines", f"{food_data['Proteines_Jones_g_100g']:.1f} g/100g")
-            col_n3.metric("Glucides", f"{food_data['Glucides_g_100g']:.1f} g/100g")
-            col_n4.metric("Lipides", f"{food_data['Lipides_g_100g']:.1f} g/100g")
+            col_n1.metric("Énergie", f"{food_data['kcal']:.0f} kcal/100g")
+            col_n2.metric("Protéines", f"{food_data['prot']:.1f} g/100g")
+            col_n3.metric("Glucides", f"{food_data['carb']:.1f} g/100g")
+            col_n4.metric("Lipides", f"{food_data['lip']:.1f} g/100g")
+
+            st.write("**Aliments au profil macro proche (même groupe, iso-kcal pour 100 g)**")
+            equiv_proches = data_manager.generate_ciqual_equivalences(food_db, food_search, 100, k=10)
+            if len(equiv_proches) > 1:
+                df_proches = pd.DataFrame(equiv_proches)
+                df_proches.columns = ["Aliment", "Poids (g)", "Kcal"]
+                st.dataframe(df_proches, use_container_width=True, hide_index=True)
 
 
 # ============================================================
@@ -888,6 +1044,22 @@ with tab_config:
                 value=int(macros_cfg.get("glucides_pct_min", 40)), step=1
             )
 
+        # --- Bornes du solveur de portions ---
+        st.markdown("### 🧮 Bornes des Portions (solveur)")
+        st.caption("Portions minimale et maximale (g) que le solveur peut proposer au déjeuner et au dîner.")
+        bornes_cfg = settings.get("bornes_portions", data_manager.DEFAULT_SETTINGS["bornes_portions"])
+        labels_bornes = {"proteines": "Protéines", "feculents": "Féculents cuits",
+                         "legumes": "Légumes cuits", "matieres_grasses": "Matières grasses"}
+        new_bornes = {}
+        for col_b, (groupe_b, label_b) in zip(st.columns(len(labels_bornes)), labels_bornes.items()):
+            b_min, b_max = bornes_cfg.get(groupe_b, data_manager.DEFAULT_SETTINGS["bornes_portions"][groupe_b])
+            with col_b:
+                new_min = st.number_input(f"{label_b} min (g)", min_value=0, value=int(b_min), step=5,
+                                          key=f"borne_min_{groupe_b}")
+                new_max = st.number_input(f"{label_b} max (g)", min_value=0, value=int(b_max), step=5,
+                                          key=f"borne_max_{groupe_b}")
+            new_bornes[groupe_b] = [new_min, max(new_min, new_max)]
+
         # --- Hydratation ---
         st.markdown("### 💧 Hydratation")
         col_h1, col_h2 = st.columns(2)
@@ -947,6 +1119,7 @@ with tab_config:
                     "repartition": hydratation.get("repartition", "")
                 },
                 "frequences_proteines": settings.get("frequences_proteines", data_manager.DEFAULT_SETTINGS["frequences_proteines"]),
+                "bornes_portions": new_bornes,
                 "macros_cibles": {
                     "proteines_g_par_kg": new_prot_ratio,
                     "lipides_pct": new_lip_pct,
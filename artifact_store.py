@@ -0,0 +1,172 @@
+"""
+Stockage temporaire des fichiers générés — NutriSolver
+
+Les PDF ne restent plus en mémoire dans st.session_state : ils sont écrits
+sur disque, nommés par leur empreinte SHA-256 (deux PDF identiques ne font
+qu'un fichier), et la session ne garde que ce nom (« handle »). Le fichier
+n'est relu qu'au clic sur le bouton de téléchargement ; open() et path()
+permettent de le servir en flux sans le charger en mémoire.
+
+Éviction :
+  - TTL : un fichier non consulté depuis ttl_s secondes est supprimé ;
+  - taille : au-delà de max_bytes, les moins récemment consultés partent
+    en premier (LRU, date de dernier accès portée par le mtime).
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+DEFAULT_ROOT = os.path.join(tempfile.gettempdir(), "nutrisolver_artifacts")
+DEFAULT_TTL_S = 3600
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_HANDLE_RE = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+
+
+class _Empreinte:
+    """Fichier en écriture dont le SHA-256 est calculé au passage."""
+
+    def __init__(self, f):
+        self.f = f
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return self.f.write(data)
+
+
+class ArtifactStore:
+    """
+    Dossier de fichiers adressés par contenu.
+
+    Args:
+        root: dossier (créé au besoin) ; plusieurs processus peuvent le partager.
+        ttl_s: durée de vie depuis le dernier accès.
+        max_bytes: taille totale au-delà de laquelle les plus anciens sont supprimés.
+    """
+
+    def __init__(self, root=DEFAULT_ROOT, ttl_s=DEFAULT_TTL_S, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, handle):
+        if not isinstance(handle, str) or not _HANDLE_RE.match(handle):
+            raise ValueError(f"Handle invalide : {handle!r}")
+        return os.path.join(self.root, handle)
+
+    def put(self, data, suffix="pdf"):
+        """Écrit `data` (bytes) et renvoie son handle "<sha256>.<suffix>"."""
+        handle = f"{hashlib.sha256(data).hexdigest()}.{suffix}"
+        path = self._path(handle)
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            # Écriture atomique : un lecteur ne voit jamais un fichier partiel
+            fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        self.evict()
+        return handle
+
+    def put_stream(self, write, suffix="pdf"):
+        """
+        Comme put, pour un contenu produit en flux : write(f) écrit dans un
+        fichier temporaire, l'empreinte est calculée au fil de l'écriture.
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                empreinte = _Empreinte(f)
+                write(empreinte)
+            handle = f"{empreinte.sha256.hexdigest()}.{suffix}"
+            path = self._path(handle)
+            if os.path.exists(path):
+                os.remove(tmp)
+                os.utime(path)
+            else:
+                os.replace(tmp, path)
+        except BaseException:
+            self._remove(tmp)
+            raise
+        self.evict()
+        return handle
+
+    def exists(self, handle):
+        return os.path.exists(self._path(handle))
+
+    def path(self, handle):
+        """
+        Chemin du fichier, pour les appelants qui le servent en flux (accès
+        compté pour le TTL / LRU). FileNotFoundError s'il a expiré ; le
+        fichier peut encore être évincé ensuite, préférer open().
+        """
+        path = self._path(handle)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Fichier expiré ou évincé : {handle}") from None
+        return path
+
+    def open(self, handle):
+        """
+        Fichier ouvert en lecture binaire (à fermer par l'appelant) ; une
+        éviction ultérieure ne l'interrompt pas. FileNotFoundError s'il a expiré.
+        """
+        path = self._path(handle)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Fichier expiré ou évincé : {handle}") from None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # évincé entre-temps : le fichier ouvert reste lisible
+        return f
+
+    def read(self, handle):
+        """Contenu du fichier (accès compté pour le TTL / LRU), None s'il a expiré."""
+        try:
+            with self.open(handle) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def evict(self, now=None):
+        """Supprime les fichiers expirés puis, si besoin, les moins récemment consultés."""
+        now = time.time() if now is None else now
+        fichiers = []
+        for entry in os.scandir(self.root):
+            if not entry.is_file():
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            # Restes d'écritures interrompues : même règle de TTL
+            if now - st.st_mtime > self.ttl_s:
+                self._remove(entry.path)
+            elif _HANDLE_RE.match(entry.name):
+                fichiers.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(taille for _, taille, _ in fichiers)
+        for _, taille, path in sorted(fichiers):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= taille
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        tailles = [e.stat().st_size for e in os.scandir(self.root) if _HANDLE_RE.match(e.name)]
+        return {"fichiers": len(tailles), "octets": sum(tailles)}
@@ -0,0 +1,185 @@
+"""
+Génération de PDF par lots — NutriSolver
+
+Usage :
+    python batch_pdf.py payloads.jsonl --out programmes.zip
+    python batch_pdf.py payloads.jsonl --out programmes/ [--workers 8]
+
+Chaque ligne du fichier JSONL est un payload de generate_programme_pdf
+(celui que construit l'onglet Programme), ou {"id": ..., "payload": {...}}.
+Les PDF sont rendus en parallèle sur tous les cœurs et écrits au fil de
+l'eau dans l'archive zip ou le dossier de sortie : au plus 2 x workers
+documents sont en cours à la fois, la mémoire reste bornée quelle que soit
+la taille du lot. Chaque processus écrit son PDF en flux
+(pdf_generator.write_programme_pdf) dans le dossier de sortie, ou pour une
+archive dans un dossier temporaire voisin d'où le processus principal le
+recopie dans le zip (ZipFile.write, par blocs) : les octets du PDF ne
+passent jamais en mémoire d'un seul tenant. Les lignes en échec (JSON invalide, erreur de rendu) sont
+consignées dans <sortie>.erreurs.jsonl, les autres documents sont produits.
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pdf_generator
+
+
+def _init_worker():
+    """Police lue une fois par processus (cf. pdf_generator._police)."""
+    pdf_generator._police()
+
+
+def _nom_fichier(ligne, payload, doc_id=None):
+    nom = str(doc_id or payload.get("client_ref", "Patient"))
+    nom = re.sub(r"[^\w.-]+", "_", nom).strip("_") or "Patient"
+    return f"{ligne:05d}_Programme_Alimentaire_{nom}.pdf"
+
+
+def render_line(ligne, texte, dossier):
+    """
+    Rend une ligne du fichier dans `dossier` (exécuté dans un processus du
+    pool) ; le PDF y est écrit en flux par le processus lui-même.
+
+    Returns:
+        (ligne, nom du fichier, None) ou
+        (ligne, None, {"erreur", "trace"}) en cas d'échec.
+    """
+    path = None
+    try:
+        entree = json.loads(texte)
+        if not isinstance(entree, dict):
+            raise ValueError("la ligne n'est pas un objet JSON")
+        payload = entree.get("payload", entree)
+        if not isinstance(payload, dict):
+            raise ValueError("'payload' n'est pas un objet JSON")
+        nom = _nom_fichier(ligne, payload, entree.get("id"))
+        path = os.path.join(dossier, nom)
+        pdf_generator.write_programme_pdf(payload, path)
+        return ligne, nom, None
+    except Exception as e:
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+        return ligne, None, {"erreur": f"{type(e).__name__}: {e}", "trace": traceback.format_exc()}
+
+
+def _lignes(path):
+    """(numéro, texte) des lignes non vides, lues une à une."""
+    with open(path, encoding="utf-8") as f:
+        for i, texte in enumerate(f, 1):
+            if texte.strip():
+                yield i, texte
+
+
+class _Sortie:
+    """
+    Destination des PDF : archive zip (écrite au fil de l'eau) ou dossier.
+    Les processus écrivent dans `dossier` ; pour une archive c'est un
+    dossier temporaire à côté du zip, vidé à mesure que les PDF y entrent.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.zip = None
+        if path.lower().endswith(".zip"):
+            self.zip = zipfile.ZipFile(path, "w", zipfile.ZIP_STORED)  # PDF déjà compressés
+            self.dossier = tempfile.mkdtemp(prefix=".pdf-", dir=os.path.dirname(os.path.abspath(path)))
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.dossier = path
+
+    def write(self, nom):
+        if self.zip is None:
+            return  # déjà écrit par le processus de rendu
+        fichier = os.path.join(self.dossier, nom)
+        self.zip.write(fichier, nom)
+        os.remove(fichier)
+
+    def close(self):
+        if self.zip is not None:
+            self.zip.close()
+            shutil.rmtree(self.dossier, ignore_errors=True)
+
+
+def _progression(faits, total, erreurs, debut, fin=False):
+    ecoule = time.perf_counter() - debut
+    debit = faits / ecoule if ecoule else 0.0
+    reste = (total - faits) / debit if debit else 0.0
+    print(f"\r{faits}/{total} PDF · {erreurs} erreur(s) · {debit:.1f} PDF/s · reste ~{reste:.0f} s",
+          end="\n" if fin else "", file=sys.stderr, flush=True)
+
+
+def run_batch(entree, sortie, workers=None, journal=None):
+    """
+    Rend toutes les lignes de `entree` vers `sortie` (.zip ou dossier).
+
+    Returns:
+        {"total", "ok", "erreurs", "secondes", "journal"}.
+    """
+    workers = workers or os.cpu_count() or 1
+    journal = journal or f"{sortie.rstrip('/').rstrip(os.sep)}.erreurs.jsonl"
+    total = sum(1 for _ in _lignes(entree))
+    ok = erreurs = 0
+    debut = dernier = time.perf_counter()
+    dest = _Sortie(sortie)
+    try:
+        with open(journal, "w", encoding="utf-8") as log, \
+                ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            lignes = _lignes(entree)
+            en_cours = set()
+            while True:
+                # Fenêtre bornée : au plus 2 documents en attente par processus
+                for ligne, texte in lignes:
+                    en_cours.add(pool.submit(render_line, ligne, texte, dest.dossier))
+                    if len(en_cours) >= 2 * workers:
+                        break
+                if not en_cours:
+                    break
+                finis, en_cours = wait(en_cours, return_when=FIRST_COMPLETED)
+                for future in finis:
+                    ligne, nom, echec = future.result()
+                    if echec is None:
+                        dest.write(nom)
+                        ok += 1
+                    else:
+                        log.write(json.dumps({"ligne": ligne, **echec}, ensure_ascii=False) + "\n")
+                        log.flush()
+                        erreurs += 1
+                if time.perf_counter() - dernier > 0.5:
+                    dernier = time.perf_counter()
+                    _progression(ok + erreurs, total, erreurs, debut)
+    finally:
+        dest.close()
+    _progression(ok + erreurs, total, erreurs, debut, fin=True)
+    if not erreurs:
+        os.remove(journal)
+    return {"total": total, "ok": ok, "erreurs": erreurs,
+            "secondes": round(time.perf_counter() - debut, 2), "journal": journal if erreurs else None}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génération de programmes PDF par lots")
+    parser.add_argument("entree", help="fichier JSONL, un payload generate_programme_pdf par ligne")
+    parser.add_argument("--out", required=True, help="archive .zip ou dossier de sortie")
+    parser.add_argument("--workers", type=int, default=None, help="processus (défaut : tous les cœurs)")
+    parser.add_argument("--log", default=None, help="journal des échecs (défaut : <out>.erreurs.jsonl)")
+    args = parser.parse_args(argv)
+
+    bilan = run_batch(args.entree, args.out, args.workers, args.log)
+    print(f"{bilan['ok']}/{bilan['total']} PDF écrits dans {args.out} en {bilan['secondes']} s")
+    if bilan["erreurs"]:
+        print(f"{bilan['erreurs']} échec(s), détail dans {bilan['journal']}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
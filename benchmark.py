@@ -0,0 +1,495 @@
+"""
+Benchmarks NutriSolver
+
+Usage :
+    python benchmark.py solveur [--budget-ms 50]
+    python benchmark.py semaines [--n 1000]
+    python benchmark.py cohorte [--n 100000]
+    python benchmark.py simulation [--n 100000]
+    python benchmark.py pdf [--n 20]
+    python benchmark.py pdf-regression [--n 5] [--seuil 0.25] [--seuil-taille 0.02] [--update]
+    python benchmark.py programme [--n 50]
+
+ - solveur : solve_portions_granular sur une grille poids x kcal
+   (50-150 kg x 1200-3000 kcal) ; latence moyenne / p95 / max, part des
+   patients résolus à l'optimum dans le budget, faisabilité clinique.
+ - semaines : WeeklyScheduler sur la même grille ; semaines distinctes
+   générées par seconde, patients sans semaine réalisable.
+ - cohorte : compute_cohort (BMR, TDEE, macros vectorisés) contre la boucle
+   sur les fonctions scalaires, pour chaque formule ; patients par seconde
+   et contrôle d'égalité exacte des résultats.
+ - simulation : simulate_days + summarize (choix libres du patient dans les
+   tables d'équivalences) pour les portions par défaut ; durée pour n
+   journées et probabilité de dépasser le plafond de lipides.
+ - pdf : generate_programme_pdf sur un programme complet (réglages par
+   défaut) ; premier PDF du processus (police et sections à rendre), puis
+   regénération identique, après modification du nom (couverture seule) ou
+   du déjeuner ; taille et nombre de polices embarquées.
+ - pdf-regression : generate_programme_pdf sur une matrice de payloads
+   synthétiques (options courtes / longues, conseils longs, tables
+   d'équivalences de plusieurs centaines de lignes) ; pages et octets,
+   meilleur temps sur n rendus (cache des sections vidé) et pic mémoire
+   (tracemalloc), comparés à pdf_baseline.json. Code de sortie 1 si le
+   nombre de pages change ou si la taille dépasse la référence de plus de
+   --seuil-taille (déterministes), ou si le temps ou la mémoire régressent
+   au-delà de --seuil. Le temps n'est pas comparé en ms mais rapporté à
+   un rendu d'étalonnage (fpdf seul, sans pdf_generator) alterné avec les
+   rendus mesurés : la référence vaut d'une machine à l'autre. La mémoire
+   n'est comparée qu'à versions de Python et de fpdf2 égales à celles de
+   la référence. --update réécrit la référence après un changement voulu.
+ - programme : graphe de l'onglet Programme (programme_graph) lu comme à
+   chaque exécution de la page (sans les nœuds A_LA_DEMANDE des expanders
+   fermés) ; premier calcul, exécution sans changement, puis changement
+   d'une portion, du nom, des ratios macros, et d'une portion avec
+   simulation et aperçu ouverts ; nœuds recalculés par cas et nœuds les
+   plus coûteux.
+"""
+
+import argparse
+import copy
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+import fpdf
+import numpy as np
+import pandas as pd
+
+import data_manager
+import html_preview
+import pdf_generator
+import programme_graph
+import scheduler
+import simulation
+import solver
+
+POIDS_KG = np.arange(50, 151, 10)
+CIBLES_KCAL = np.arange(1200, 3001, 200)
+PDF_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdf_baseline.json")
+
+
+def _percentiles(samples_ms):
+    a = np.asarray(samples_ms)
+    return f"moy {a.mean():7.2f} ms | p95 {np.percentile(a, 95):7.2f} ms | max {a.max():7.2f} ms"
+
+
+def bench_solveur(budget_ms):
+    ratios = data_manager.DEFAULT_SETTINGS["macros_cibles"]
+    temps, optimal, faisable, noeuds = [], 0, 0, []
+    for poids in POIDS_KG:
+        for kcal in CIBLES_KCAL:
+            macros = data_manager.compute_macros_targets(float(poids), float(kcal), ratios)
+            t = time.perf_counter()
+            sol = solver.solve_portions_granular(macros, budget_ms=budget_ms)
+            temps.append((time.perf_counter() - t) * 1000)
+            optimal += sol["optimal"]
+            faisable += sol["faisable"]
+            noeuds.append(sol["noeuds"])
+    n = len(temps)
+    print(f"solveur granulaire — {n} patients, budget {budget_ms} ms")
+    print(f"  latence  : {_percentiles(temps)}")
+    print(f"  optimum  : {optimal}/{n}  ·  faisable : {faisable}/{n}  ·  nœuds moy. {np.mean(noeuds):.0f}")
+    return temps
+
+
+def bench_semaines(n):
+    ratios = data_manager.DEFAULT_SETTINGS["macros_cibles"]
+    debits, irrealisables = [], 0
+    for poids in POIDS_KG:
+        for kcal in CIBLES_KCAL:
+            macros = data_manager.compute_macros_targets(float(poids), float(kcal), ratios)
+            planning = scheduler.WeeklyScheduler(limites_jour=scheduler.daily_limits(macros), seed=0)
+            t = time.perf_counter()
+            semaines = sum(1 for _ in planning.weeks(n))
+            if semaines:
+                debits.append(semaines / (time.perf_counter() - t))
+            else:
+                irrealisables += 1
+    a = np.asarray(debits)
+    print(f"planificateur — {len(POIDS_KG) * len(CIBLES_KCAL)} patients, {n} semaines chacun")
+    print(f"  débit    : moy {a.mean():7.0f} /s | min {a.min():7.0f} /s")
+    print(f"  sans semaine réalisable : {irrealisables}")
+    return debits
+
+
+def _cohorte(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "gender": rng.choice(["H", "F"], n),
+        "weight": np.round(rng.uniform(40, 180, n) * 2) / 2,
+        "height_cm": rng.integers(145, 206, n),
+        "age": rng.integers(16, 95, n),
+        "body_fat_pct": np.round(rng.uniform(8, 50, n), 1),
+        "activity_factor": rng.choice([1.2, 1.375, 1.55, 1.725, 1.9], n),
+    })
+
+
+def _scalaire(patient, formule, ratios):
+    if formule == "Harris-Benedict":
+        bmr = data_manager.calc_bmr_harris_benedict(patient["gender"], patient["weight"], patient["height_cm"], patient["age"])
+    elif formule == "Black et al (1996)":
+        bmr = data_manager.calc_bmr_black(patient["gender"], patient["weight"], patient["height_cm"], patient["age"])
+    else:
+        bmr = data_manager.calc_bmr_muller(patient["gender"], patient["weight"], patient["age"], patient["body_fat_pct"])
+    tdee = bmr * patient["activity_factor"]
+    return bmr, tdee, data_manager.compute_macros_targets(patient["weight"], tdee, ratios)
+
+
+def bench_cohorte(n):
+    ratios = data_manager.DEFAULT_SETTINGS["macros_cibles"]
+    patients = _cohorte(n)
+    n_scal = min(n, 20000)
+    records = patients.head(n_scal).to_dict("records")
+    print(f"cohorte — {n} patients (boucle scalaire sur {n_scal})")
+    for formule in data_manager.BMR_FORMULES:
+        t = time.perf_counter()
+        out = data_manager.compute_cohort(patients, formule)
+        t_vec = time.perf_counter() - t
+
+        t = time.perf_counter()
+        scal = [_scalaire(p, formule, ratios) for p in records]
+        t_scal = time.perf_counter() - t
+
+        ecarts = 0
+        for (bmr, tdee, m), row in zip(scal, out.head(n_scal).itertuples()):
+            ecarts += (bmr != row.bmr) + (tdee != row.tdee)
+            for nom, prefixe in (("proteines", "prot"), ("lipides", "lip"), ("glucides", "glu")):
+                ecarts += sum(m[nom][k] != getattr(row, f"{prefixe}_{k}") for k in ("g", "kcal", "pct"))
+        print(f"  {formule:<20}: vectorisé {n / t_vec:>12,.0f} /s | scalaire {n_scal / t_scal:>10,.0f} /s"
+              f" | écarts {ecarts}")
+
+
+def bench_simulation(n):
+    settings = data_manager.DEFAULT_SETTINGS
+    p = settings["portions"]
+    repas = {"viande": p["proteines_viande"], "poisson": p["proteines_poisson"], "oeufs": p["proteines_oeufs"],
+             "feculents": p["feculents_cuits"], "legumes": p["legumes_cuits"], "matieres_grasses": p["matieres_grasses_g"]}
+    t = time.perf_counter()
+    tables = simulation.choice_tables(repas, repas, p["fruits"], p["fromage_blanc"],
+                                      settings["options_pdj"], settings["options_collation"])
+    t_tables = time.perf_counter() - t
+    macros = data_manager.compute_macros_targets(70.0, 2000.0, settings["macros_cibles"])
+    durees = []
+    for seed in range(3):
+        t = time.perf_counter()
+        resume = simulation.summarize(simulation.simulate_days(tables, n, seed=seed), macros)
+        durees.append(time.perf_counter() - t)
+    kcal = resume["macros"]["kcal"]
+    print(f"simulation — {n} journées, {len(tables)} choix par jour (tables {t_tables * 1000:.1f} ms)")
+    print(f"  durée    : {min(durees) * 1000:7.1f} ms ({n / min(durees):,.0f} journées/s)")
+    print(f"  kcal     : moy {kcal['moyenne']:.0f} | p5 {kcal['p5']:.0f} | p95 {kcal['p95']:.0f} (cible {kcal['cible']:.0f})")
+    print(f"  lipides > {simulation.LIPIDES_PLAFOND_PCT} % : {resume['p_lipides_plafond']:.1%} des journées,"
+          f" {resume['p_semaine_lipides_plafond']:.1%} des semaines")
+
+
+def _payload_pdf(poids=70.0, kcal=2000.0):
+    settings = data_manager.DEFAULT_SETTINGS
+    p = settings["portions"]
+
+    def repas(crudites=True):
+        return {
+            "proteines": {
+                "portion_viande_g": p["proteines_viande"], "portion_poisson_g": p["proteines_poisson"],
+                "portion_oeufs": p["proteines_oeufs"],
+                "equivalences_par_categorie": data_manager.get_protein_equivalences(
+                    p["proteines_viande"], p["proteines_poisson"], p["proteines_oeufs"]),
+            },
+            "feculents": {"portion_g": p["feculents_cuits"],
+                          "equivalences": data_manager.get_equivalences("Féculents", p["feculents_cuits"])},
+            "legumes": {"portion_cuits_g": p["legumes_cuits"], "portion_crudites_g": p["legumes_crus"],
+                        "equivalences": data_manager.get_equivalences("Légumes", p["legumes_cuits"]) if crudites else []},
+            "matieres_grasses": {"portion_g": p["matieres_grasses_g"],
+                                 "equivalences": data_manager.get_equivalences("Matières Grasses", p["matieres_grasses_g"])},
+        }
+
+    return {
+        "client_ref": "Patient Benchmark", "bmr": 1650.0, "tdee": kcal, "formule_bmr": "Harris-Benedict",
+        "objectifs": ["Rééquilibrer l'alimentation", "Boire suffisamment d'eau min 1.5L"],
+        "macros": data_manager.compute_macros_targets(poids, kcal, settings["macros_cibles"]), "poids_kg": poids,
+        "petit_dejeuner": {"options": settings["options_pdj"]},
+        "dejeuner": {**repas(), "dessert": "1 fruit"},
+        "collation": {"options": settings["options_collation"]},
+        "diner": {**repas(crudites=False), "dessert": "100g fromage blanc/Skyr/yaourt grecque"},
+        "hydratation": settings["hydratation"],
+        "frequences_proteines": settings["frequences_proteines"],
+        "conseils_generaux": settings["conseils_generaux"],
+        "listes_reference": {"legumineuses": data_manager.get_equivalences("Légumineuses", p["legumineuses_cuites"])},
+    }
+
+
+def bench_pdf(n):
+    payload = _payload_pdf()
+    pdf_generator._police.cache_clear()
+    pdf_generator.invalidate_section_cache()
+    t = time.perf_counter()
+    pdf = bytes(pdf_generator.generate_programme_pdf(payload))
+    premier = (time.perf_counter() - t) * 1000
+
+    def mesure(modifier):
+        temps = []
+        for i in range(n):
+            data = modifier(i)
+            t = time.perf_counter()
+            pdf_generator.generate_programme_pdf(data)
+            temps.append((time.perf_counter() - t) * 1000)
+        return temps
+
+    identiques = mesure(lambda i: payload)
+    nom = mesure(lambda i: {**payload, "client_ref": f"Patient {i}"})
+    dejeuner = mesure(lambda i: {**payload, "dejeuner": {**payload["dejeuner"], "dessert": f"{i} fruit"}})
+    apercu = []
+    for i in range(n):
+        t = time.perf_counter()
+        html_preview.render_html({**payload, "client_ref": f"Patient {i}"})
+        apercu.append((time.perf_counter() - t) * 1000)
+    print(f"pdf — programme complet, {n} générations par cas")
+    print(f"  premier        : {premier:7.2f} ms (police + toutes les sections)")
+    print(f"  identique      : {_percentiles(identiques)}")
+    print(f"  nom modifié    : {_percentiles(nom)}")
+    print(f"  déjeuner modif.: {_percentiles(dejeuner)}")
+    print(f"  aperçu HTML    : {_percentiles(apercu)}")
+    print(f"  taille   : {len(pdf) / 1024:.1f} Ko · polices embarquées : {pdf.count(b'/FontFile2')}"
+          f" · cache sections {pdf_generator.section_cache_stats()}"
+          f" · cache largeurs {pdf_generator.text_width_cache_stats()}")
+    return identiques
+
+
+def _lignes_synthetiques(equivalences, n):
+    """n lignes d'équivalences (noms longs, façon Ciqual) à partir d'une table réelle."""
+    return [{**row, "nom": f"{row['nom']}, préparation n°{i // len(equivalences) + 1}, cuit à l'eau, sans sel ajouté"}
+            for i, row in zip(range(n), equivalences * (n // len(equivalences) + 1))]
+
+
+def _matrice_pdf():
+    """{cas: payload} de la suite de régression PDF."""
+    base = _payload_pdf()
+    options = _payload_pdf()
+    options["petit_dejeuner"]["options"] = base["petit_dejeuner"]["options"][:1]
+    options["collation"]["options"] = base["collation"]["options"][:1]
+    longues = copy.deepcopy(base)
+    longues["petit_dejeuner"]["options"] = base["petit_dejeuner"]["options"] * 8
+    longues["collation"]["options"] = base["collation"]["options"] * 10
+    conseils = copy.deepcopy(base)
+    conseils["conseils_generaux"] = "\n".join(
+        f"- Conseil {i} : " + "privilégier les aliments peu transformés et de saison, " * 4 for i in range(60))
+    equivalences = copy.deepcopy(base)
+    for repas in ("dejeuner", "diner"):
+        r = equivalences[repas]
+        r["feculents"]["equivalences"] = _lignes_synthetiques(r["feculents"]["equivalences"], 200)
+        r["matieres_grasses"]["equivalences"] = _lignes_synthetiques(r["matieres_grasses"]["equivalences"], 100)
+        r["proteines"]["equivalences_par_categorie"] = _lignes_synthetiques(
+            r["proteines"]["equivalences_par_categorie"], 200)
+    complet = copy.deepcopy(equivalences)
+    complet.update(petit_dejeuner=longues["petit_dejeuner"], collation=longues["collation"],
+                   conseils_generaux=conseils["conseils_generaux"])
+    return {
+        "standard": base,
+        "vide": {},
+        "options_courtes": options,
+        "options_longues": longues,
+        "conseils_longs": conseils,
+        "equivalences_nombreuses": equivalences,
+        "complet": complet,
+    }
+
+
+def _mesure_pdf(payload, n):
+    """
+    {temps_ms, temps_rel, memoire_ko, pages, octets} d'un rendu sans cache de
+    sections ; chaque rendu est précédé d'un rendu d'étalonnage, temps_rel
+    rapporte les meilleurs temps des deux (même charge de la machine).
+    """
+    temps, etalon = [], []
+    for _ in range(n):
+        etalon.append(_etalonnage_pdf())
+        pdf_generator.invalidate_section_cache()
+        t = time.perf_counter()
+        pdf = bytes(pdf_generator.generate_programme_pdf(payload))
+        temps.append((time.perf_counter() - t) * 1000)
+    pdf_generator.invalidate_section_cache()
+    tracemalloc.start()
+    try:
+        pdf_generator.generate_programme_pdf(payload)
+        _, pic = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "temps_ms": round(min(temps), 1),
+        "temps_rel": round(min(temps) / min(etalon), 3),
+        "memoire_ko": round(pic / 1024, 1),
+        "pages": len(re.findall(rb"/Type /Page\b", pdf)),
+        "octets": len(pdf),
+    }
+
+
+def _etalonnage_pdf():
+    """
+    Temps (ms) du rendu d'un document fixe par l'API publique de fpdf
+    (police standard, texte et tableau, sans pdf_generator) : unité des
+    temps de la suite de régression, pour comparer des mesures prises sur
+    des machines différentes.
+    """
+    texte = "Privilégier les aliments peu transformés et de saison. " * 12
+    t = time.perf_counter()
+    pdf = fpdf.FPDF()
+    pdf.set_font("Helvetica", size=10)
+    for page in range(4):
+        pdf.add_page()
+        pdf.multi_cell(0, 5, f"{page} {texte}")
+        for ligne in range(25):
+            for col in range(4):
+                pdf.cell(45, 6, f"ligne {ligne} colonne {col}", border=1)
+            pdf.ln()
+    bytes(pdf.output())
+    return (time.perf_counter() - t) * 1000
+
+
+def bench_pdf_regression(n, seuil, seuil_taille, baseline=PDF_BASELINE, update=False):
+    """
+    Suite de régression PDF (cf. _matrice_pdf) ; True si aucun cas ne régresse.
+    """
+    pdf_generator._police()
+    etalon = min(_etalonnage_pdf() for _ in range(5))
+    mesures = {cas: _mesure_pdf(payload, n) for cas, payload in _matrice_pdf().items()}
+
+    contexte = {"fpdf": fpdf.__version__, "python": sys.version.split()[0]}
+    reference, meme_contexte = {}, False
+    if os.path.exists(baseline) and not update:
+        with open(baseline, encoding="utf-8") as f:
+            contenu = json.load(f)
+        reference = contenu.get("cas", {})
+        meme_contexte = all(contenu.get(k) == v for k, v in contexte.items())
+    gardes = [("temps_rel", seuil), ("octets", seuil_taille)]
+    if meme_contexte:
+        gardes.append(("memoire_ko", seuil))
+
+    echecs = []
+    print(f"pdf-regression — {n} rendus par cas, étalonnage {etalon:.1f} ms, "
+          f"seuil {seuil:.0%} (temps, mémoire), {seuil_taille:.0%} (octets)")
+    if reference and not meme_contexte:
+        print("  mémoire non comparée : versions de Python / fpdf2 différentes de la référence")
+    print(f"  {'cas':<24} {'temps ms':>9} {'x étalon':>9} {'mémoire Ko':>11} {'pages':>6} {'octets':>9}"
+          "   écart / référence")
+    for cas, m in mesures.items():
+        ref = reference.get(cas)
+        ecarts = []
+        if ref:
+            for cle, limite in gardes:
+                rel = m[cle] / ref[cle] - 1 if ref[cle] else 0.0
+                ecarts.append(f"{cle} {rel:+.0%}")
+                if rel > limite:
+                    echecs.append(f"{cas} : {cle} {ref[cle]} -> {m[cle]} ({rel:+.0%})")
+            if m["pages"] != ref["pages"]:
+                echecs.append(f"{cas} : pages {ref['pages']} -> {m['pages']}")
+        print(f"  {cas:<24} {m['temps_ms']:9.1f} {m['temps_rel']:9.2f} {m['memoire_ko']:11.1f} {m['pages']:6d} "
+              f"{m['octets']:9d}   " + (" · ".join(ecarts) if ref else "(pas de référence)"))
+
+    if update or not os.path.exists(baseline):
+        # Pas de temps absolus dans la référence : ils ne valent que pour une machine
+        cas = {nom: {k: m[k] for k in ("temps_rel", "memoire_ko", "pages", "octets")} for nom, m in mesures.items()}
+        with open(baseline, "w", encoding="utf-8") as f:
+            json.dump({**contexte, "cas": cas}, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"  référence écrite : {baseline}")
+    for echec in echecs:
+        print(f"  RÉGRESSION {echec}")
+    return not echecs
+
+
+def _entrees_programme():
+    """Entrées de programme_graph pour les réglages par défaut (widgets à leur valeur initiale)."""
+    settings = data_manager.get_settings()
+    p = settings["portions"]
+    return {
+        "client_ref": "Patient 1", "sexe": "H", "age": 30, "poids": 70.0, "taille": 175,
+        "facteur_activite": 1.55, "formule_bmr": "Harris-Benedict", "masse_grasse": None,
+        "kcal_cible": 2000, "ratios": settings["macros_cibles"], "settings": settings,
+        "objectifs": ["Manger à bonne quantité - suivre le programme"], "food_db": None,
+        "pdj_choisies": settings["options_pdj"], "collation_choisies": settings["options_collation"],
+        "dej_viande": p["proteines_viande"], "dej_poisson": p["proteines_poisson"], "dej_oeufs": p["proteines_oeufs"],
+        "dej_feculents": p["feculents_cuits"], "dej_legumes": p["legumes_cuits"], "dej_crudites": p["legumes_crus"],
+        "dej_mg": p["matieres_grasses_g"],
+        "din_viande": p["proteines_viande"], "din_poisson": p["proteines_poisson"], "din_oeufs": p["proteines_oeufs"],
+        "din_feculents": p["feculents_cuits"], "din_mg": p["matieres_grasses_g"],
+        "part_repas_pct": int(solver.DEFAULT_PART_REPAS * 100), "simu_n": 100_000, "semaine_graine": 0,
+    }
+
+
+def bench_programme(n):
+    entrees = _entrees_programme()
+    graphe = programme_graph.ProgrammeGraph()
+
+    page = [noeud for noeud in programme_graph.NODES if noeud not in programme_graph.A_LA_DEMANDE]
+
+    def execution(noeuds=page, **changes):
+        graphe.begin_run()
+        t = time.perf_counter()
+        graphe.set_inputs(**{**entrees, **changes})
+        for noeud in noeuds:
+            graphe.get(noeud)
+        return (time.perf_counter() - t) * 1000
+
+    premier = execution()
+    print(f"programme — graphe de l'onglet Programme, {len(page)} nœuds lus à chaque exécution "
+          f"(+ {len(programme_graph.A_LA_DEMANDE)} à la demande), {n} exécutions par cas")
+    print(f"  premier calcul : {premier:8.2f} ms")
+    cas = {
+        "sans changement": lambda i: {},
+        "portion MG déj.": lambda i: {"dej_mg": 10 + i % 2},
+        "nom du patient": lambda i: {"client_ref": f"Patient {i}"},
+        "ratios macros": lambda i: {"ratios": {**entrees["ratios"], "lipides_pct": 30 + i % 2}},
+        "MG + expanders": lambda i: {"dej_mg": 10 + i % 2, "noeuds": programme_graph.NODES},
+    }
+    for nom, changes in cas.items():
+        temps = [execution(**changes(i)) for i in range(n)]
+        print(f"  {nom:<16}: {_percentiles(temps)} · {len(graphe.recomputed())} nœud(s) recalculé(s)")
+    couteux = sorted(graphe.stats(), key=lambda s: -s["total_ms"])[:5]
+    print("  plus coûteux   : " + " · ".join(f"{s['noeud']} {s['total_ms']:.0f} ms/{s['recalculs']}" for s in couteux))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks NutriSolver")
+    sub = parser.add_subparsers(dest="cible", required=True)
+    p_solv = sub.add_parser("solveur", help="solveur de portions granulaire (branch-and-bound)")
+    p_solv.add_argument("--budget-ms", type=float, default=solver.DEFAULT_BUDGET_MS)
+    p_sem = sub.add_parser("semaines", help="planificateur de semaines (fréquences protéines)")
+    p_sem.add_argument("--n", type=int, default=1000)
+    p_coh = sub.add_parser("cohorte", help="BMR / TDEE / macros vectorisés sur une cohorte")
+    p_coh.add_argument("--n", type=int, default=100000)
+    p_sim = sub.add_parser("simulation", help="simulation d'adhérence (choix libres des équivalences)")
+    p_sim.add_argument("--n", type=int, default=100000)
+    p_pdf = sub.add_parser("pdf", help="génération du PDF (police en cache)")
+    p_pdf.add_argument("--n", type=int, default=20)
+    p_reg = sub.add_parser("pdf-regression", help="matrice de PDF comparée à pdf_baseline.json")
+    p_reg.add_argument("--n", type=int, default=5)
+    p_reg.add_argument("--seuil", type=float, default=0.25, help="hausse relative tolérée (temps, mémoire)")
+    p_reg.add_argument("--seuil-taille", type=float, default=0.02, help="hausse relative tolérée (octets)")
+    p_reg.add_argument("--baseline", default=PDF_BASELINE)
+    p_reg.add_argument("--update", action="store_true", help="réécrire la référence")
+    p_prog = sub.add_parser("programme", help="graphe de calcul de l'onglet Programme")
+    p_prog.add_argument("--n", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    if args.cible == "solveur":
+        bench_solveur(args.budget_ms)
+    elif args.cible == "semaines":
+        bench_semaines(args.n)
+    elif args.cible == "cohorte":
+        bench_cohorte(args.n)
+    elif args.cible == "simulation":
+        bench_simulation(args.n)
+    elif args.cible == "pdf":
+        bench_pdf(args.n)
+    elif args.cible == "pdf-regression":
+        if not bench_pdf_regression(args.n, args.seuil, args.seuil_taille, args.baseline, args.update):
+            return 1
+    elif args.cible == "programme":
+        bench_programme(args.n)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
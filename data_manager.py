@@ -1,8 +1,19 @@
 import pandas as pd
+import numpy as np
+import hashlib
 import json
 import os
+import re
+import sys
+import glob
+import bisect
+import heapq
+import unicodedata
+from collections import defaultdict
+from functools import cached_property, lru_cache
 
 SETTINGS_FILE = "settings.json"
+CIQUAL_FILE = "Ciqual.xlsx"
 
 # --- Paramètres par défaut enrichis (Programme Alimentaire) ---
 DEFAULT_SETTINGS = {
@@ -51,6 +62,13 @@ DEFAULT_SETTINGS = {
         "lipides_pct": 30,           # plafond Tracy : 33-34 %
         "glucides_pct_min": 40,      # plancher Tracy
     },
+    # Bornes [min, max] (g) des portions déj/dîner pour le solveur de portions
+    "bornes_portions": {
+        "proteines": [80, 200],
+        "feculents": [0, 300],
+        "legumes": [100, 400],
+        "matieres_grasses": [0, 25],
+    },
     # Fréquences protéines
     "frequences_proteines": {
         "viandes_blanches": "5 fois/semaine",
@@ -187,57 +205,512 @@ EQUIVALENCES = {
 }
 
 
-def load_and_clean_ciqual(file_path="Ciqual.xlsx"):
+# --- Cache binaire du classeur Ciqual ---
+# Le parsing openpyxl du classeur prend plusieurs secondes : on le fait une
+# seule fois et on stocke la table brute, colonne par colonne, dans un .npz
+# posé à côté du classeur (ex. Ciqual.3f2a9c0b1d4e5f60.npz). Le nom contient
+# le hash du contenu du xlsx : si le classeur change, le cache est reconstruit.
+
+def _file_digest(file_path, chunk_size=1 << 20):
+    """SHA-256 du contenu d'un fichier (lecture par blocs)."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _ciqual_cache_path(file_path, digest):
+    base, _ = os.path.splitext(file_path)
+    return f"{base}.{digest[:16]}.npz"
+
+
+def _remove_stale_ciqual_caches(file_path, digest):
+    """
+    Supprime les caches d'anciennes versions du classeur : <base>.<16 hex>.npz
+    et leur index voisins <base>.<16 hex>.knn.npz. Ceux de `digest` sont gardés.
+    """
+    base, _ = os.path.splitext(file_path)
+    motif = re.compile(rf"{re.escape(os.path.basename(base))}\.([0-9a-f]{{16}})(\.knn)?\.npz")
+    for path in glob.glob(f"{glob.escape(base)}.*.npz"):
+        m = motif.fullmatch(os.path.basename(path))
+        if m and m.group(1) != digest[:16]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # déjà supprimé par un autre processus
+
+
+def _write_ciqual_cache(df, cache_path):
+    """Écrit le DataFrame brut en colonnes numpy (sans pickle), de façon atomique."""
+    arrays = {"__columns__": np.array([str(c) for c in df.columns])}
+    for i, col in enumerate(df.columns):
+        values = df[col]
+        if pd.api.types.is_numeric_dtype(values):
+            arrays[f"c{i}"] = values.to_numpy()
+        else:
+            missing = values.isna().to_numpy()
+            arrays[f"c{i}"] = np.where(missing, "", values.astype(str).to_numpy()).astype(str)
+            arrays[f"m{i}"] = missing
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, cache_path)
+
+
+def _read_ciqual_cache(cache_path):
+    with np.load(cache_path, allow_pickle=False) as npz:
+        columns = npz["__columns__"].tolist()
+        data = {}
+        for i, col in enumerate(columns):
+            values = npz[f"c{i}"]
+            if f"m{i}" in npz.files:
+                values = np.where(npz[f"m{i}"], None, values.astype(object))
+            data[col] = values
+    return pd.DataFrame(data, columns=columns)
+
+
+def read_ciqual_table(file_path=CIQUAL_FILE):
+    """
+    Retourne la table Ciqual brute (mêmes colonnes que pd.read_excel).
+    Utilise le cache binaire s'il correspond au contenu actuel du classeur,
+    sinon parse le xlsx, (re)construit le cache et supprime les caches périmés.
+    Lève FileNotFoundError si le classeur est absent.
+    """
+    digest = _file_digest(file_path)
+    cache_path = _ciqual_cache_path(file_path, digest)
+    if os.path.exists(cache_path):
+        try:
+            df = _read_ciqual_cache(cache_path)
+            df.attrs["cache_path"] = cache_path
+            return df
+        except Exception as e:
+            print(f"Cache Ciqual illisible ({cache_path}), reconstruction : {e}")
+
+    df = pd.read_excel(file_path)
+    df.attrs["cache_path"] = cache_path
+    try:
+        _write_ciqual_cache(df, cache_path)
+        _remove_stale_ciqual_caches(file_path, digest)
+    except OSError as e:
+        print(f"Impossible d'écrire le cache Ciqual : {e}")
+    return df
+
+
+# Colonnes Ciqual utilisées -> noms internes (table de renommage unique)
+CIQUAL_COLUMNS = {
+    'alim_code': 'code',
+    'alim_nom_fr': 'name',
+    'alim_grp_nom_fr': 'ciqual_group',
+    'Energie,\nRèglement\nUE N°\n1169\n2011 (kcal\n100 g)': 'kcal',
+    'Protéines,\nN x\nfacteur de\nJones (g\n100 g)': 'prot',
+    'Glucides\n(g\n100 g)': 'carb',
+    'Lipides\n(g\n100 g)': 'lip',
+}
+NUTRIENTS = ("kcal", "prot", "carb", "lip")
+
+
+# Statut de chaque valeur Ciqual après normalisation (matrice int8)
+VALUE_EXACT = 0     # valeur numérique publiée
+VALUE_TRACE = 1     # 'traces' -> 0
+VALUE_BOUNDED = 2   # '< x' -> x (borne supérieure)
+VALUE_MISSING = 3   # '-', vide ou illisible -> 0
+
+
+def normalize_ciqual_values(df, columns):
+    """
+    Normalise en une passe vectorisée les cellules Ciqual des colonnes données
+    ('-', 'traces', '< 0,5', '12,3', nombres). Retourne (values, status) :
+    deux matrices (n_lignes, n_colonnes), float32 et int8 (VALUE_*).
+    Une colonne absente est entièrement marquée VALUE_MISSING.
+    """
+    n = len(df)
+    present = [c for c in columns if c in df.columns]
+    values = np.zeros((n, len(columns)), dtype=np.float32)
+    status = np.full((n, len(columns)), VALUE_MISSING, dtype=np.int8)
+    if not present or not n:
+        return values, status
+
+    # Toutes les cellules à plat (colonne après colonne). Ciqual répète
+    # énormément les mêmes chaînes ('-', '< 0,5', 'traces'...) : on factorise,
+    # on analyse une seule fois chaque valeur distincte puis on redistribue.
+    cells = df[present].to_numpy(dtype=object).ravel(order="F")
+    codes, uniques = pd.factorize(cells, use_na_sentinel=True)
+    text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    trace = text.str.lower().eq("traces").to_numpy()
+    bounded = text.str.startswith("<").to_numpy()
+    numbers = pd.to_numeric(
+        text.str.lstrip("<").str.strip().str.replace(",", ".", regex=False),
+        errors="coerce",
+    ).to_numpy(dtype=np.float64)
+
+    parsed = ~np.isnan(numbers)
+    unique_status = np.full(len(uniques), VALUE_MISSING, dtype=np.int8)
+    unique_status[parsed] = VALUE_EXACT
+    unique_status[parsed & bounded] = VALUE_BOUNDED
+    unique_status[trace] = VALUE_TRACE
+    unique_values = np.where(parsed, numbers, 0.0)
+
+    # Sentinelle -1 (cellule vide) -> dernière case : manquant, 0
+    unique_status = np.append(unique_status, VALUE_MISSING)
+    unique_values = np.append(unique_values, 0.0)
+    flat_status = unique_status[codes]
+    flat_values = unique_values[codes]
+
+    idx = [columns.index(c) for c in present]
+    values[:, idx] = flat_values.reshape((n, len(present)), order="F")
+    status[:, idx] = flat_status.reshape((n, len(present)), order="F")
+    return values, status
+
+
+def fold_text(text):
+    """Minuscules, sans accents ni ponctuation : 'Œufs brouillés' -> 'oeufs brouilles'."""
+    text = str(text).casefold().replace("œ", "oe").replace("æ", "ae")
+    text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", text).split())
+
+
+def _trigrams(word, partial=False):
+    """Trigrammes d'un mot bordé d'espaces ; partial=True : mot en cours de frappe."""
+    padded = f" {word}" if partial else f" {word} "
+    return {padded[i:i + 3] for i in range(max(len(padded) - 2, 1))}
+
+
+class FoodSearchIndex:
+    """
+    Index de recherche « typeahead » sur les noms d'aliments.
+
+    Les noms sont normalisés par fold_text (casse et accents). Deux structures :
+      - listes de lignes par trigramme (tolère fautes et mots dans le désordre),
+      - liste triée des mots, pour les correspondances par préfixe.
+    Classement : couverture des trigrammes de la requête, bonus si chaque mot
+    de la requête est le préfixe d'un mot du nom, puis si le nom commence par
+    la requête, et enfin noms les plus courts d'abord.
+    """
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        folded = [fold_text(n) for n in self.names]
+        self._folded = folded
+        self._lengths = np.array([len(f) for f in folded], dtype=np.float32)
+
+        postings = defaultdict(list)
+        words = set()
+        for i, name in enumerate(folded):
+            grams = set()
+            for w in name.split():
+                grams |= _trigrams(w)
+                words.add((w, i))
+            for g in grams:
+                postings[g].append(i)
+        self._postings = {g: np.array(rows, dtype=np.int32) for g, rows in postings.items()}
+        words = sorted(words)
+        self._words = [w for w, _ in words]
+        self._word_rows = np.array([i for _, i in words], dtype=np.int32)
+
+    def _prefix_rows(self, token):
+        lo = bisect.bisect_left(self._words, token)
+        hi = bisect.bisect_left(self._words, token + "\uffff")
+        return self._word_rows[lo:hi]
+
+    def search(self, query, k=10, min_score=0.0):
+        """
+        Retourne les indices de lignes des k meilleurs résultats (meilleur
+        d'abord). min_score : score de correspondance minimal, part des
+        trigrammes de la requête présents dans le nom (0-1), plus 1 si chaque
+        mot de la requête est le début d'un mot du nom.
+        """
+        tokens = fold_text(query).split()
+        n = len(self.names)
+        if not tokens or not n:
+            return []
+
+        grams = set()
+        for j, t in enumerate(tokens):
+            grams |= _trigrams(t, partial=(j == len(tokens) - 1))
+        lists = [self._postings[g] for g in grams if g in self._postings]
+        hits = np.bincount(np.concatenate(lists), minlength=n) if lists else np.zeros(n)
+
+        all_prefix = np.ones(n, dtype=bool)
+        for t in tokens:
+            mask = np.zeros(n, dtype=bool)
+            mask[self._prefix_rows(t)] = True
+            all_prefix &= mask
+
+        candidates = np.flatnonzero((hits > 0) | all_prefix)
+        if min_score > 0:
+            candidates = candidates[hits[candidates] / len(grams) + all_prefix[candidates] >= min_score]
+        if not len(candidates):
+            return []
+        score = (hits[candidates] / len(grams) + all_prefix[candidates]
+                 - self._lengths[candidates] * 1e-3)
+
+        # Bonus « commence par la requête » sur une présélection seulement
+        pre = min(len(candidates), max(4 * k, 50))
+        top = candidates[np.argpartition(-score, pre - 1)[:pre]] if pre < len(candidates) else candidates
+        top_score = dict(zip(candidates.tolist(), score.tolist()))
+        folded_query = " ".join(tokens)
+        ranked = sorted(
+            top.tolist(),
+            key=lambda i: -(top_score[i] + 0.5 * self._folded[i].startswith(folded_query)),
+        )
+        return ranked[:k]
+
+
+def _build_kdtree(points, leaf_size):
+    """
+    KD-tree en tableaux : perm (ordre des points), nodes (lo, hi, dim, gauche,
+    droite ; dim = -1 pour une feuille) et split (valeur de coupe par nœud).
+    """
+    perm = np.arange(len(points), dtype=np.int32)
+    nodes, split = [], []
+    stack = [(0, len(points), None)]
+    while stack:
+        lo, hi, parent = stack.pop()
+        node = len(nodes)
+        if parent is not None:
+            nodes[parent[0]][3 + parent[1]] = node
+        if hi - lo <= leaf_size:
+            nodes.append([lo, hi, -1, -1, -1])
+            split.append(0.0)
+            continue
+        sub = points[perm[lo:hi]]
+        dim = int(np.argmax(sub.max(axis=0) - sub.min(axis=0)))
+        mid = (hi - lo) // 2
+        order = np.argpartition(sub[:, dim], mid)
+        perm[lo:hi] = perm[lo:hi][order]
+        nodes.append([lo, hi, dim, -1, -1])
+        split.append(float(points[perm[lo + mid], dim]))
+        stack.append((lo + mid, hi, (node, 1)))
+        stack.append((lo, lo + mid, (node, 0)))
+    return perm, np.array(nodes, dtype=np.int32), np.array(split, dtype=np.float32)
+
+
+class MacroNeighbourIndex:
+    """
+    Plus proches voisins sur les profils (prot, carb, lip, kcal) pour 100 g.
+
+    Les profils sont centrés-réduits (écart-type de chaque variable sur toute
+    la table) puis indexés par un KD-tree global et un KD-tree par groupe
+    Ciqual, pour restreindre la recherche à un groupe sans filtrage a posteriori.
+    """
+
+    FEATURES = ("prot", "carb", "lip", "kcal")
+    LEAF_SIZE = 16
+    ALL_GROUPS = -1
+
+    def __init__(self, points, trees):
+        self.points = np.ascontiguousarray(points, dtype=np.float32)
+        self.trees = trees  # {code groupe ou ALL_GROUPS: (perm, nodes, split)}
+        self._nodes = {key: (t[0], t[1].tolist(), t[2].tolist()) for key, t in trees.items()}
+
+    @staticmethod
+    def _profiles(db):
+        raw = np.column_stack([db.column(f) for f in MacroNeighbourIndex.FEATURES]).astype(np.float32)
+        std = raw.std(axis=0)
+        return raw, np.where(std > 0, 1.0 / std, 1.0).astype(np.float32)
+
+    @classmethod
+    def build(cls, db):
+        raw, scale = cls._profiles(db)
+        points = raw * scale
+        trees = {cls.ALL_GROUPS: _build_kdtree(points, cls.LEAF_SIZE)}
+        for code in np.unique(db.group_codes).tolist():
+            rows = np.flatnonzero(db.group_codes == code).astype(np.int32)
+            perm, nodes, split = _build_kdtree(points[rows], cls.LEAF_SIZE)
+            trees[code] = (rows[perm], nodes, split)
+        return cls(points, trees)
+
+    def save(self, path):
+        arrays = {"points": self.points, "keys": np.array(list(self.trees), dtype=np.int32)}
+        for j, (perm, nodes, split) in enumerate(self.trees.values()):
+            arrays[f"perm{j}"], arrays[f"nodes{j}"], arrays[f"split{j}"] = perm, nodes, split
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as npz:
+            trees = {
+                int(key): (npz[f"perm{j}"], npz[f"nodes{j}"], npz[f"split{j}"])
+                for j, key in enumerate(npz["keys"].tolist())
+            }
+            return cls(npz["points"], trees)
+
+    def query(self, row, k=10, group=None):
+        """
+        k lignes les plus proches de la ligne `row` (elle-même exclue),
+        dans tout Ciqual ou dans le groupe de code `group`.
+        Retourne [(ligne, distance)] triés par distance croissante.
+        """
+        key = self.ALL_GROUPS if group is None else int(group)
+        if key not in self._nodes:
+            return []
+        perm, nodes, split = self._nodes[key]
+        target = self.points[row]
+        best = []  # tas max (distance² négative, ligne)
+        stack = [(0, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if len(best) == k and bound >= -best[0][0]:
+                continue
+            lo, hi, dim, left, right = nodes[node]
+            if dim < 0:
+                rows = perm[lo:hi]
+                d2 = ((self.points[rows] - target) ** 2).sum(axis=1)
+                for r, d in zip(rows.tolist(), d2.tolist()):
+                    if r == row:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, r))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, r))
+                continue
+            diff = float(target[dim]) - split[node]
+            near, far = (left, right) if diff < 0 else (right, left)
+            stack.append((far, max(bound, diff * diff)))
+            stack.append((near, bound))
+        return [(r, float(np.sqrt(-d))) for d, r in sorted(best, reverse=True)]
+
+
+class FoodDatabase:
+    """
+    Table Ciqual partagée, en lecture seule.
+
+    Les nutriments sont stockés dans une seule matrice float32 contiguë
+    (une ligne par aliment, colonnes dans l'ordre de NUTRIENTS), avec la
+    matrice int8 `status` (VALUE_*) de même forme. Les noms sont
+    internés, les groupes sont codés (group_codes -> groups) et deux
+    dictionnaires donnent la ligne d'un aliment par nom ou par code en O(1).
+    """
+
+    def __init__(self, codes, names, group_codes, groups, nutrients, status=None):
+        self.codes = np.ascontiguousarray(codes, dtype=np.int64)
+        self.names = tuple(sys.intern(str(n)) for n in names)
+        self.group_codes = np.ascontiguousarray(group_codes, dtype=np.int16)
+        self.groups = tuple(groups)
+        self.nutrients = np.ascontiguousarray(nutrients, dtype=np.float32)
+        self.nutrients.flags.writeable = False
+        if status is None:
+            status = np.zeros(self.nutrients.shape, dtype=np.int8)
+        self.status = np.ascontiguousarray(status, dtype=np.int8)
+        self.status.flags.writeable = False
+        self._row_by_name = {n: i for i, n in enumerate(self.names)}
+        self._row_by_code = {int(c): i for i, c in enumerate(self.codes)}
+        self.cache_path = None  # cache .npz d'origine (persistance des index)
+
+    @classmethod
+    def from_table(cls, df):
+        """Construit la base depuis la table brute (colonnes du classeur Ciqual)."""
+        df = df.rename(columns={k: v for k, v in CIQUAL_COLUMNS.items() if k in df.columns})
+        n = len(df)
+        codes = df["code"].to_numpy() if "code" in df.columns else np.arange(n)
+        names = ([" ".join(str(x).split()) for x in df["name"].fillna("Inconnu")]
+                 if "name" in df.columns else ["Inconnu"] * n)
+        raw_groups = df["ciqual_group"] if "ciqual_group" in df.columns else pd.Series([None] * n)
+        groups = pd.Categorical(
+            [" ".join(str(g).split()) if not pd.isna(g) else "Inconnu" for g in raw_groups]
+        )
+        nutrients, status = normalize_ciqual_values(df, list(NUTRIENTS))
+        return cls(codes, names, groups.codes, groups.categories, nutrients, status)
+
+    @classmethod
+    def load(cls, file_path=CIQUAL_FILE):
+        """Charge la base depuis le classeur (via le cache binaire)."""
+        df = read_ciqual_table(file_path)
+        db = cls.from_table(df)
+        db.cache_path = df.attrs.get("cache_path")
+        return db
+
+    def __len__(self):
+        return len(self.names)
+
+    def row(self, key):
+        """Index de ligne pour un nom d'aliment (str) ou un code Ciqual (int), sinon None."""
+        if isinstance(key, str):
+            return self._row_by_name.get(key)
+        try:
+            return self._row_by_code.get(int(key))
+        except (TypeError, ValueError):
+            return None
+
+    def group(self, i):
+        return self.groups[self.group_codes[i]]
+
+    def column(self, nutrient):
+        """Vue (sans copie) sur une colonne de nutriment."""
+        return self.nutrients[:, NUTRIENTS.index(nutrient)]
+
+    def get(self, key):
+        """Retourne {code, name, ciqual_group, kcal, prot, carb, lip} ou None."""
+        i = self.row(key)
+        if i is None:
+            return None
+        food = {"code": int(self.codes[i]), "name": self.names[i], "ciqual_group": self.group(i)}
+        food.update((k, round(v, 3)) for k, v in zip(NUTRIENTS, self.nutrients[i].tolist()))
+        return food
+
+    @cached_property
+    def search_index(self):
+        """Index de recherche sur les noms (construit au premier accès)."""
+        return FoodSearchIndex(self.names)
+
+    @cached_property
+    def neighbour_index(self):
+        """
+        Index des profils macro (MacroNeighbourIndex). Persisté à côté du
+        cache Ciqual (Ciqual.<hash>.knn.npz) et rechargé tel quel ensuite.
+        """
+        knn_path = self.cache_path[:-len(".npz")] + ".knn.npz" if self.cache_path else None
+        if knn_path and os.path.exists(knn_path):
+            try:
+                index = MacroNeighbourIndex.load(knn_path)
+                if len(index.points) == len(self):
+                    return index
+            except Exception as e:
+                print(f"Index voisins illisible ({knn_path}), reconstruction : {e}")
+        index = MacroNeighbourIndex.build(self)
+        if knn_path:
+            try:
+                index.save(knn_path)
+            except OSError as e:
+                print(f"Impossible d'écrire l'index voisins : {e}")
+        return index
+
+    def nearest(self, key, k=10, same_group=True):
+        """Noms des k aliments au profil macro le plus proche (même groupe Ciqual par défaut)."""
+        i = self.row(key)
+        if i is None:
+            return []
+        group = int(self.group_codes[i]) if same_group else None
+        return [self.names[r] for r, _ in self.neighbour_index.query(i, k, group)]
+
+    def search(self, query, k=10, min_score=0.0):
+        """Recherche tolérante (accents, casse, préfixes) : noms des k meilleurs aliments."""
+        return [self.names[i] for i in self.search_index.search(query, k, min_score)]
+
+    def to_frame(self):
+        """Copie pandas : colonnes name, kcal, prot, carb, lip, ciqual_group."""
+        df = pd.DataFrame(self.nutrients.astype(float), columns=list(NUTRIENTS))
+        df.insert(0, "name", list(self.names))
+        df["ciqual_group"] = pd.Categorical.from_codes(self.group_codes, self.groups)
+        return df
+
+
+def load_and_clean_ciqual(file_path=CIQUAL_FILE):
     """
     Charge le fichier Ciqual, renomme les colonnes et nettoie les données.
     Retourne un DataFrame avec les colonnes: name, kcal, prot, carb, lip, ciqual_group
+    (copie de FoodDatabase ; préférer FoodDatabase.load pour un usage partagé).
     """
     if not os.path.exists(file_path):
         print(f"Fichier non trouvé: {file_path}")
         return pd.DataFrame()
 
     try:
-        df = pd.read_excel(file_path)
-        
-        rename_map = {
-            'alim_nom_fr': 'name',
-            'alim_grp_nom_fr': 'ciqual_group',
-            'Energie,\nRèglement\nUE N°\n1169\n2011 (kcal\n100 g)': 'kcal',
-            'Protéines,\nN x\nfacteur de\nJones (g\n100 g)': 'prot',
-            'Glucides\n(g\n100 g)': 'carb',
-            'Lipides\n(g\n100 g)': 'lip'
-        }
-        
-        cols_to_rename = {k: v for k, v in rename_map.items() if k in df.columns}
-        df = df.rename(columns=cols_to_rename)
-        
-        expected_cols = ['name', 'kcal', 'prot', 'carb', 'lip', 'ciqual_group']
-        
-        for col in expected_cols:
-            if col not in df.columns:
-                df[col] = "Inconnu" if col in ['name', 'ciqual_group'] else 0.0
-
-        df = df[expected_cols]
-
-        def clean_val(x):
-            if pd.isna(x): return 0.0
-            if isinstance(x, (int, float)): return float(x)
-            if isinstance(x, str):
-                x = x.strip()
-                if x in ['-', 'traces']: return 0.0
-                if x.startswith('<'):
-                    x = x.replace('<', '').strip()
-                try:
-                    return float(x.replace(',', '.'))
-                except ValueError:
-                    return 0.0
-            return 0.0
-
-        for col in ['kcal', 'prot', 'carb', 'lip']:
-            df[col] = df[col].apply(clean_val)
-            
-        return df
-
+        return FoodDatabase.load(file_path).to_frame()
     except Exception as e:
         print(f"Erreur critique lors du chargement des données Ciqual: {e}")
         return pd.DataFrame()
@@ -320,6 +793,98 @@ def generate_equivalences(groupe, portion_g):
     return results
 
 
+def equivalence_arrays(groupe, portions_g):
+    """
+    Cœur numérique de generate_equivalences pour un groupe et M portions.
+    Retourne (noms, ref_kcal, poids, kcal) : noms des alternatives retenues,
+    kcal de la référence (M,), poids et kcal des alternatives (M, n_alt) ;
+    None si le groupe est inconnu.
+    """
+    if groupe not in EQUIVALENCES:
+        return None
+    group_data = EQUIVALENCES[groupe]
+    p = np.asarray(portions_g, dtype=np.float64)
+    portion_kcal = (group_data["ref_kcal_100g"] * p) / 100
+    ref_kcal = np.rint(portion_kcal).astype(np.int64)
+
+    if group_data.get("use_explicit_weights"):
+        alts = group_data["alternatives"]
+        ref_portion = group_data.get("ref_portion_g")
+        # sans ref_portion_g, la portion sert de référence : échelle 1
+        scale = p / ref_portion if ref_portion else np.ones_like(p)
+        alt_poids = np.array([a["poids_g"] for a in alts], dtype=np.float64)
+        alt_kcal = np.array([a.get("kcal_100g") or 0 for a in alts], dtype=np.float64)
+        poids = alt_poids[None, :] * scale[:, None]
+        kcal = np.where(alt_kcal > 0, np.rint((alt_kcal * poids) / 100), 0).astype(np.int64)
+    else:
+        alts = [a for a in group_data["alternatives"] if a["kcal_100g"] > 0]
+        alt_kcal = np.array([a["kcal_100g"] for a in alts], dtype=np.float64)
+        poids = np.rint(((portion_kcal[:, None] * 100) / alt_kcal[None, :]) / 5).astype(np.int64) * 5
+        kcal = np.rint((alt_kcal * poids) / 100).astype(np.int64)
+    return [a["nom"] for a in alts], ref_kcal, poids, kcal
+
+
+def generate_equivalences_batch(groupes, portions_g):
+    """
+    Version vectorisée de generate_equivalences pour N requêtes à la fois.
+    groupes et portions_g sont deux séquences (ou tableaux) de même longueur ;
+    retourne la liste des N tables, dans l'ordre des requêtes, identiques à
+    celles de generate_equivalences (arrondi à 5 g, use_explicit_weights).
+    Les calculs sont faits par groupe en une passe numpy (equivalence_arrays) ;
+    seule la mise en forme des lignes reste en Python.
+    """
+    groupes = np.asarray(groupes, dtype=object)
+    portions = list(portions_g)
+    if len(groupes) != len(portions):
+        raise ValueError("groupes et portions_g doivent avoir la même longueur")
+    tables = [[] for _ in portions]
+
+    for groupe in dict.fromkeys(groupes.tolist()):
+        idx = np.flatnonzero(groupes == groupe).tolist()
+        arrays = equivalence_arrays(groupe, [portions[i] for i in idx])
+        if arrays is None:
+            continue
+        noms, ref_kcal, poids, kcal = arrays
+        ref_nom = f"{EQUIVALENCES[groupe]['ref_aliment']} (réf.)"
+        ref_kcal, poids_rows, kcal_rows = ref_kcal.tolist(), poids.tolist(), kcal.tolist()
+        if EQUIVALENCES[groupe].get("use_explicit_weights"):
+            poids_rows = [[round(w, 1) for w in row] for row in poids_rows]
+        for r, i in enumerate(idx):
+            tables[i] = [{"nom": ref_nom, "poids_g": round(portions[i], 1), "kcal": ref_kcal[r]}] + [
+                {"nom": nom, "poids_g": w, "kcal": k}
+                for nom, w, k in zip(noms, poids_rows[r], kcal_rows[r])
+            ]
+    return tables
+
+
+def generate_ciqual_equivalences(food_db, ref, portion_g, k=10, same_group=True):
+    """
+    Table d'équivalences iso-kcal construite à partir de Ciqual : l'aliment de
+    référence (nom ou code) puis ses k plus proches voisins en profil macro.
+    Même format et même arrondi à 5 g que generate_equivalences.
+    """
+    ref_food = food_db.get(ref)
+    if ref_food is None:
+        return []
+    portion_kcal = (ref_food["kcal"] * portion_g) / 100
+
+    results = [{
+        "nom": f"{ref_food['name']} (réf.)",
+        "poids_g": round(portion_g, 1),
+        "kcal": round(portion_kcal)
+    }]
+    for nom in food_db.nearest(ref, k=k, same_group=same_group):
+        kcal_100g = food_db.get(nom)["kcal"]
+        if kcal_100g > 0:
+            poids_equiv = round((portion_kcal * 100) / kcal_100g / 5) * 5
+            results.append({
+                "nom": nom,
+                "poids_g": poids_equiv,
+                "kcal": round((kcal_100g * poids_equiv) / 100)
+            })
+    return results
+
+
 def compute_macros_targets(weight_kg, target_cals, ratios):
     """
     Calcule la répartition macros en g et % pour un objectif calorique.
@@ -375,21 +940,21 @@ PROTEINES_BY_CATEGORY = [
         "categorie": "Viandes",
         "portion_source": "viande",
         "aliments": [
-            {"nom": "Poulet (blanc)", "kcal_100g": 110},
-            {"nom": "Dinde", "kcal_100g": 104},
-            {"nom": "Bœuf (5% MG)", "kcal_100g": 137},
-            {"nom": "Veau", "kcal_100g": 143},
+            {"nom": "Poulet (blanc)", "kcal_100g": 110, "prot_100g": 23.0},
+            {"nom": "Dinde", "kcal_100g": 104, "prot_100g": 22.0},
+            {"nom": "Bœuf (5% MG)", "kcal_100g": 137, "prot_100g": 21.0},
+            {"nom": "Veau", "kcal_100g": 143, "prot_100g": 20.0},
         ],
     },
     {
         "categorie": "Poissons & fruits de mer",
         "portion_source": "poisson",
         "aliments": [
-            {"nom": "Cabillaud / Colin", "kcal_100g": 80},
-            {"nom": "Saumon", "kcal_100g": 208},
-            {"nom": "Maquereau", "kcal_100g": 205},
-            {"nom": "Thon (conserve nature)", "kcal_100g": 116},
-            {"nom": "Crevettes", "kcal_100g": 99},
+            {"nom": "Cabillaud / Colin", "kcal_100g": 80, "prot_100g": 18.0},
+            {"nom": "Saumon", "kcal_100g": 208, "prot_100g": 20.0},
+            {"nom": "Maquereau", "kcal_100g": 205, "prot_100g": 19.0},
+            {"nom": "Thon (conserve nature)", "kcal_100g": 116, "prot_100g": 26.0},
+            {"nom": "Crevettes", "kcal_100g": 99, "prot_100g": 21.0},
         ],
     },
     {
@@ -397,15 +962,15 @@ PROTEINES_BY_CATEGORY = [
         "portion_source": "oeufs",
         "aliments": [
             # 1 œuf ≈ 60 g, 84 kcal
-            {"nom": "Œufs (unité ~60 g)", "kcal_unit": 84, "g_unit": 60},
+            {"nom": "Œufs (unité ~60 g)", "kcal_unit": 84, "g_unit": 60, "prot_unit": 7.5},
         ],
     },
     {
         "categorie": "Végétarien",
         "portion_source": "viande",
         "aliments": [
-            {"nom": "Tofu", "kcal_100g": 76},
-            {"nom": "Tempeh", "kcal_100g": 192},
+            {"nom": "Tofu", "kcal_100g": 76, "prot_100g": 8.0},
+            {"nom": "Tempeh", "kcal_100g": 192, "prot_100g": 19.0},
         ],
     },
 ]
@@ -442,6 +1007,74 @@ def generate_protein_equivalences(portion_viande_g, portion_poisson_g, portion_o
     return out
 
 
+# --- Mémoïsation des tables d'équivalences ---
+# Les tables dépendent de (groupe, portion) et du catalogue EQUIVALENCES /
+# PROTEINES_BY_CATEGORY (constantes du module, ni les réglages ni Ciqual ne les
+# modifient). La version du catalogue fait partie de la clé : après une
+# modification de ces tables dans le processus, appeler
+# invalidate_equivalence_cache. Les résultats sont partagés entre appelants :
+# ils sont donc rendus en lecture seule (tuple de FrozenRow).
+EQUIVALENCE_CACHE_SIZE = 512
+_catalog_version = 0
+
+
+class FrozenRow(dict):
+    """Ligne de table en lecture seule (reste un dict pour pandas, json, pickle)."""
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Table d'équivalences mémoïsée : lecture seule (copier avec dict(row))")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+    __ior__ = _readonly
+
+    def __reduce__(self):
+        return (FrozenRow, (dict(self),))
+
+
+def _freeze(table):
+    return tuple(FrozenRow(row) for row in table)
+
+
+@lru_cache(maxsize=EQUIVALENCE_CACHE_SIZE, typed=True)
+def _equivalences_memo(groupe, portion_g, version):
+    return _freeze(generate_equivalences(groupe, portion_g))
+
+
+@lru_cache(maxsize=EQUIVALENCE_CACHE_SIZE, typed=True)
+def _protein_equivalences_memo(portion_viande_g, portion_poisson_g, portion_oeufs_n, version):
+    return _freeze(generate_protein_equivalences(portion_viande_g, portion_poisson_g, portion_oeufs_n))
+
+
+def get_equivalences(groupe, portion_g):
+    """generate_equivalences mémoïsée (LRU) ; retourne un tuple de lignes en lecture seule."""
+    return _equivalences_memo(groupe, portion_g, _catalog_version)
+
+
+def get_protein_equivalences(portion_viande_g, portion_poisson_g, portion_oeufs_n):
+    """generate_protein_equivalences mémoïsée (LRU) ; tuple de lignes en lecture seule."""
+    return _protein_equivalences_memo(portion_viande_g, portion_poisson_g, portion_oeufs_n, _catalog_version)
+
+
+def invalidate_equivalence_cache():
+    """Passe à une nouvelle version du catalogue et vide les tables mémoïsées."""
+    global _catalog_version
+    _catalog_version += 1
+    _equivalences_memo.cache_clear()
+    _protein_equivalences_memo.cache_clear()
+
+
+def equivalence_cache_stats():
+    """Compteurs hits / misses / taille des deux caches d'équivalences."""
+    stats = {"version": _catalog_version}
+    for name, memo in (("equivalences", _equivalences_memo), ("proteines", _protein_equivalences_memo)):
+        info = memo.cache_info()
+        stats[name] = {"hits": info.hits, "misses": info.misses,
+                       "size": info.currsize, "maxsize": info.maxsize}
+    return stats
+
+
 def _macros_for(groupe, portion_g):
     """Retourne {prot, carb, lip, kcal} pour une portion de l'aliment de référence d'un groupe."""
     if groupe not in EQUIVALENCES:
@@ -457,12 +1090,48 @@ def _macros_for(groupe, portion_g):
     }
 
 
-def estimate_programme_macros(dejeuner, diner, portion_fruit_g=100, portion_laitier_g=100):
+# --- Mesures ménagères (options PDJ / collation, cf. option_parser) ---
+# Aliments cités dans options_pdj / options_collation :
+# macros pour 100 g (prot, carb, lip, kcal), poids d'une unité (1 fruit,
+# 1 œuf, 1 poignée...) et d'une cuillère à soupe. Valeurs moyennes Ciqual.
+MESURES_MENAGERES = {
+    "fromage blanc":         {"macros_100g": (7.5, 4.0, 3.0, 73), "unite_g": 100, "cas_g": 30},
+    "skyr":                  {"macros_100g": (10.0, 4.0, 0.2, 58), "unite_g": 100, "cas_g": 30},
+    "yaourt":                {"macros_100g": (4.2, 5.5, 1.5, 53), "unite_g": 125, "cas_g": 30},
+    "flocons d'avoine":      {"macros_100g": (13.5, 58.7, 7.0, 367), "unite_g": 35, "cas_g": 10},
+    "granola":               {"macros_100g": (9.0, 64.0, 15.0, 440), "unite_g": 50, "cas_g": 12},
+    "muesli":                {"macros_100g": (10.0, 60.0, 7.0, 365), "unite_g": 50, "cas_g": 12},
+    "graines":               {"macros_100g": (20.0, 8.0, 35.0, 450), "unite_g": 10, "cas_g": 10},
+    "oléagineux":            {"macros_100g": (20.0, 7.0, 55.0, 610), "unite_g": 15, "cas_g": 10},
+    "fruit":                 {"macros_100g": (0.6, 12.0, 0.2, 55), "unite_g": 100, "cas_g": 15},
+    "compote":               {"macros_100g": (0.3, 15.0, 0.1, 65), "unite_g": 100, "cas_g": 15},
+    "pain":                  {"macros_100g": (9.0, 45.0, 1.5, 240), "unite_g": 30, "cas_g": 10},
+    "beurre de cacahuètes":  {"macros_100g": (25.0, 13.0, 50.0, 600), "unite_g": 15, "cas_g": 15},
+    "fromage frais":         {"macros_100g": (7.0, 3.0, 20.0, 220), "unite_g": 20, "cas_g": 20},
+    "fromage":               {"macros_100g": (25.0, 0.5, 28.0, 360), "unite_g": 30, "cas_g": 10},
+    "œuf":                   {"macros_100g": (12.5, 0.5, 10.0, 140), "unite_g": 60, "cas_g": 15},
+    "saumon":                {"macros_100g": (22.0, 0.0, 9.0, 170), "unite_g": 50, "cas_g": 15},
+    "avocat":                {"macros_100g": (2.0, 2.0, 20.0, 200), "unite_g": 150, "cas_g": 15},
+    "viennoiserie":          {"macros_100g": (8.0, 45.0, 20.0, 400), "unite_g": 60, "cas_g": 15},
+    "brioche":               {"macros_100g": (8.0, 50.0, 13.0, 350), "unite_g": 60, "cas_g": 15},
+    "barre de céréales":     {"macros_100g": (7.0, 65.0, 16.0, 440), "unite_g": 25, "cas_g": 15},
+    "biscuits secs":         {"macros_100g": (7.0, 75.0, 12.0, 440), "unite_g": 8, "cas_g": 15},
+    "madeleine":             {"macros_100g": (6.0, 55.0, 24.0, 460), "unite_g": 25, "cas_g": 15},
+}
+# Synonymes (texte replié, cf. fold_text) -> entrée de MESURES_MENAGERES
+SYNONYMES_MESURES = {"oeuf": "œuf", "truite": "saumon", "noix": "oléagineux", "amandes": "oléagineux"}
+
+
+def estimate_programme_macros(dejeuner, diner, portion_fruit_g=100, portion_laitier_g=100,
+                              pdj=None, collation=None):
     """
     Estime les macros journalières fournies par la structure déj + dîner :
     prot / féculents / légumes / matières grasses + dessert fruit (déj) +
-    dessert laitier (dîner). PDJ, collation, pain et intercalaires ne sont
-    pas comptés (options pré-validées côté Tracy).
+    dessert laitier (dîner). Pain et intercalaires ne sont pas comptés.
+
+    pdj / collation : macros {prot, carb, lip, kcal} de l'option retenue
+    (option_parser.option_macros), ajoutées pour obtenir la journée complète ;
+    None pour ne compter que déjeuner + dîner.
     """
     totals = {"prot": 0.0, "carb": 0.0, "lip": 0.0, "kcal": 0.0}
     group_map = {"proteines": "Protéines", "feculents": "Féculents",
@@ -486,6 +1155,10 @@ def estimate_programme_macros(dejeuner, diner, portion_fruit_g=100, portion_lait
     for k in totals:
         totals[k] += dessert_fruit[k] + dessert_laitier[k]
 
+    for option in (pdj, collation):
+        for k in totals:
+            totals[k] += (option or {}).get(k, 0.0)
+
     return {k: round(v, 1) for k, v in totals.items()}
 
 
@@ -514,3 +1187,181 @@ def calc_bmr_muller(gender, weight, age, body_fat_pct):
     lbm = weight - fm                    # Lean Body Mass
     sex_val = 1 if gender == "H" else 0
     return (13.587 * lbm) + (9.613 * fm) + (198 * sex_val) - (3.351 * age) + 674
+
+
+# --- Versions tableaux (cohortes de patients) ---
+# Mêmes formules que les fonctions scalaires, terme à terme et dans le même
+# ordre d'opérations : résultats identiques au bit près. Les puissances
+# passent par np.float_power (pow de la libm, comme l'opérateur ** de Python ;
+# np.power vectorisé peut différer d'un ulp).
+BMR_FORMULES = ("Harris-Benedict", "Black et al (1996)", "Muller")
+
+
+def _is_homme(gender):
+    return np.asarray(gender) == "H"
+
+
+def calc_bmr_harris_benedict_array(gender, weight, height_cm, age):
+    weight, height_cm, age = (np.asarray(v, dtype=np.float64) for v in (weight, height_cm, age))
+    homme = 88.362 + (13.397 * weight) + (4.799 * height_cm) - (5.677 * age)
+    femme = 447.593 + (9.247 * weight) + (3.098 * height_cm) - (4.330 * age)
+    return np.where(_is_homme(gender), homme, femme)
+
+
+def calc_bmr_black_array(gender, weight, height_cm, age):
+    weight, height_cm, age = (np.asarray(v, dtype=np.float64) for v in (weight, height_cm, age))
+    height_m = height_cm / 100
+    w, h, a = np.float_power(weight, 0.48), np.float_power(height_m, 0.50), np.float_power(age, -0.13)
+    # ((coef * w) * h) * a : même associativité que la version scalaire
+    coef = np.where(_is_homme(gender), 1.083, 0.963)
+    bmr_mj = coef * w * h * a
+    return bmr_mj * 239
+
+
+def calc_bmr_muller_array(gender, weight, age, body_fat_pct):
+    weight, age, body_fat_pct = (np.asarray(v, dtype=np.float64) for v in (weight, age, body_fat_pct))
+    fm = weight * (body_fat_pct / 100)
+    lbm = weight - fm
+    sex_val = _is_homme(gender).astype(np.int64)
+    return (13.587 * lbm) + (9.613 * fm) + (198 * sex_val) - (3.351 * age) + 674
+
+
+def _round_like_python(x, ndigits):
+    """round(x, ndigits) de Python sur un tableau (np.round diffère près des demis)."""
+    x = np.asarray(x, dtype=np.float64)
+    out = np.round(x, ndigits)
+    scaled = x * 10.0 ** ndigits
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_half.any():
+        # Cas ambigus (poids au demi-kilo x 1,3 g/kg...) : round() de Python,
+        # une fois par valeur distincte
+        uniques, inverse = np.unique(x[near_half], return_inverse=True)
+        out[near_half] = np.array([round(v, ndigits) for v in uniques.tolist()])[inverse]
+    return out
+
+
+def compute_macros_targets_array(weight_kg, target_cals, ratios):
+    """
+    compute_macros_targets sur des tableaux (ratios : scalaires ou tableaux
+    par patient). Retourne {"proteines"|"lipides"|"glucides": {"g", "kcal",
+    "pct"}, "ratios": {...}, "warnings": {nom: masque booléen}} ; les arrondis
+    sont ceux de la version scalaire (g et pct à 0,1, kcal entier).
+    """
+    weight_kg = np.asarray(weight_kg, dtype=np.float64)
+    target_cals = np.asarray(target_cals, dtype=np.float64)
+    prot_g_per_kg = np.asarray(ratios.get("proteines_g_par_kg", 1.3), dtype=np.float64)
+    lip_pct = np.asarray(ratios.get("lipides_pct", 30), dtype=np.float64)
+    glu_min_pct = np.asarray(ratios.get("glucides_pct_min", 40), dtype=np.float64)
+
+    prot_g = weight_kg * prot_g_per_kg
+    prot_kcal = prot_g * 4
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prot_pct = np.where(target_cals != 0, prot_kcal / target_cals * 100, 0.0)
+
+    lip_kcal = target_cals * lip_pct / 100
+    lip_g = lip_kcal / 9
+
+    glu_pct = 100 - prot_pct - lip_pct
+    glu_kcal = target_cals * glu_pct / 100
+    glu_g = glu_kcal / 4
+
+    def _macro(g, kcal, pct):
+        return {
+            "g": _round_like_python(g, 1),
+            "kcal": np.rint(kcal).astype(np.int64),
+            "pct": _round_like_python(pct, 1),
+        }
+
+    shape = np.broadcast(weight_kg, target_cals, prot_g_per_kg, lip_pct, glu_min_pct).shape
+    return {
+        "proteines": _macro(prot_g, prot_kcal, prot_pct),
+        "lipides": _macro(lip_g, lip_kcal, np.broadcast_to(lip_pct, shape)),
+        "glucides": _macro(glu_g, glu_kcal, glu_pct),
+        "ratios": {
+            "proteines_g_par_kg": np.broadcast_to(prot_g_per_kg, shape),
+            "lipides_pct": np.broadcast_to(lip_pct, shape),
+            "glucides_pct_min": np.broadcast_to(glu_min_pct, shape),
+        },
+        "warnings": {
+            "proteines_basses": np.broadcast_to(prot_g_per_kg < 1.2, shape),
+            "proteines_hautes": np.broadcast_to(prot_g_per_kg > 1.5, shape),
+            "lipides_hauts": np.broadcast_to(lip_pct > 34, shape),
+            "glucides_bas": glu_pct < glu_min_pct,
+        },
+    }
+
+
+def compute_cohort(patients, formule="Harris-Benedict", activity_factor=1.55, ratios=None):
+    """
+    BMR, TDEE et macros d'une cohorte en une passe vectorisée.
+
+    Args:
+        patients: DataFrame (ou dict de tableaux) avec gender ("H"/"F"),
+            weight, height_cm, age ; body_fat_pct pour Muller ; optionnels :
+            activity_factor, target_cals (défaut : TDEE) et les ratios
+            proteines_g_par_kg / lipides_pct / glucides_pct_min par patient.
+        formule: une de BMR_FORMULES.
+        activity_factor: facteur d'activité si absent des colonnes.
+        ratios: ratios par défaut (DEFAULT_SETTINGS["macros_cibles"]).
+
+    Returns:
+        DataFrame : bmr, tdee, target_cals, {prot,lip,glu}_{g,kcal,pct} et
+        une colonne booléenne par avertissement de compute_macros_targets.
+    """
+    df = pd.DataFrame(patients)
+    n = len(df)
+    if formule == "Harris-Benedict":
+        bmr = calc_bmr_harris_benedict_array(df["gender"], df["weight"], df["height_cm"], df["age"])
+    elif formule == "Black et al (1996)":
+        bmr = calc_bmr_black_array(df["gender"], df["weight"], df["height_cm"], df["age"])
+    elif formule == "Muller":
+        bmr = calc_bmr_muller_array(df["gender"], df["weight"], df["age"], df["body_fat_pct"])
+    else:
+        raise ValueError(f"Formule BMR inconnue : {formule!r} (attendu : {', '.join(BMR_FORMULES)})")
+
+    factor = df["activity_factor"].to_numpy(np.float64) if "activity_factor" in df else activity_factor
+    tdee = bmr * factor
+    target = df["target_cals"].to_numpy(np.float64) if "target_cals" in df else tdee
+
+    ratios = {**DEFAULT_SETTINGS["macros_cibles"], **(ratios or {})}
+    ratios = {k: (df[k].to_numpy(np.float64) if k in df else v) for k, v in ratios.items()}
+    m = compute_macros_targets_array(df["weight"].to_numpy(np.float64), target, ratios)
+
+    out = {"bmr": np.broadcast_to(bmr, n), "tdee": np.broadcast_to(tdee, n),
+           "target_cals": np.broadcast_to(target, n)}
+    for nom, prefixe in (("proteines", "prot"), ("lipides", "lip"), ("glucides", "glu")):
+        for k, v in m[nom].items():
+            out[f"{prefixe}_{k}"] = np.broadcast_to(v, n)
+    for nom, masque in m["warnings"].items():
+        out[f"alerte_{nom}"] = np.broadcast_to(masque, n)
+    return pd.DataFrame(out, index=df.index)
+
+
+def macro_grid(weights_kg, target_cals, ratios):
+    """
+    Table "what-if" de compute_macros_targets sur la grille poids x kcal
+    (toutes les combinaisons, en une passe vectorisée).
+
+    Returns:
+        DataFrame long (une ligne par couple) : weight, kcal,
+        {prot,lip,glu}_{g,kcal,pct}, une colonne booléenne par alerte et
+        n_alertes.
+    """
+    w = np.asarray(weights_kg, dtype=np.float64)[:, None]
+    k = np.asarray(target_cals, dtype=np.float64)[None, :]
+    m = compute_macros_targets_array(w, k, ratios)
+    shape = np.broadcast(w, k).shape
+    out = {
+        "weight": np.broadcast_to(w, shape).ravel(),
+        "kcal": np.broadcast_to(k, shape).ravel(),
+    }
+    for nom, prefixe in (("proteines", "prot"), ("lipides", "lip"), ("glucides", "glu")):
+        for key, v in m[nom].items():
+            out[f"{prefixe}_{key}"] = np.broadcast_to(v, shape).ravel()
+    alertes = np.zeros(shape, dtype=np.int64)
+    for nom, masque in m["warnings"].items():
+        masque = np.broadcast_to(masque, shape)
+        out[f"alerte_{nom}"] = masque.ravel()
+        alertes += masque
+    out["n_alertes"] = alertes.ravel()
+    return pd.DataFrame(out)
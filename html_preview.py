@@ -0,0 +1,107 @@
+"""
+Aperçu HTML du programme — NutriSolver
+
+Traduit les blocs de programme_model en HTML pour l'aperçu de l'onglet
+Programme : mêmes sections, mêmes textes et mêmes tableaux que le PDF,
+mais sans police à embarquer ni mise en page. Le rendu prend quelques ms,
+l'aperçu suit donc chaque modification ; generate_programme_pdf reste
+réservé à l'export.
+"""
+
+import html
+
+import programme_model
+
+# Largeur utile d'une page A4 du PDF (210 mm - marges de 15 mm)
+LARGEUR_PAGE_MM = 180
+
+CSS = """
+<style>
+.ns-programme { font-family: "DejaVu Sans", Verdana, sans-serif; font-size: 13px; color: #282828; }
+.ns-programme .ns-page { background: #fff; border: 1px solid #ddd; border-radius: 4px;
+    padding: 18px 22px; margin-bottom: 14px; }
+.ns-programme .ns-titre { color: #00A651; font-size: 26px; font-weight: bold; text-align: center; margin: 4px 0; }
+.ns-programme .ns-patient { color: #646464; font-size: 15px; text-align: center; }
+.ns-programme .ns-infos { color: #646464; font-size: 11px; font-style: italic; text-align: center; }
+.ns-programme hr { border: 0; border-top: 1px solid #c8c8c8; margin: 12px 0; }
+.ns-programme .ns-section { background: #00A651; color: #fff; font-weight: bold; font-size: 16px;
+    padding: 5px 10px; margin: 10px 0 6px; }
+.ns-programme .ns-sous-titre { color: #00A651; font-weight: bold; margin: 8px 0 4px; }
+.ns-programme p { margin: 0 0 6px; white-space: pre-wrap; }
+.ns-programme ul { margin: 0 0 8px; }
+.ns-programme .ns-option { font-weight: bold; margin-top: 4px; }
+.ns-programme .ns-option-texte { color: #505050; font-size: 12px; margin-left: 18px; }
+.ns-programme .ns-ou { color: #828282; font-size: 11px; font-style: italic; margin-left: 18px; }
+.ns-programme .ns-encadre { color: #B8961E; font-style: italic; font-size: 12px; margin: 4px 0 8px; }
+.ns-programme table { border-collapse: collapse; margin-bottom: 10px; font-size: 12px; }
+.ns-programme th, .ns-programme td { border: 1px solid #999; padding: 2px 8px; text-align: left; }
+.ns-programme th { background: #ECF0F1; }
+.ns-programme tbody tr:nth-child(odd) { background: #F9F9F9; }
+</style>
+"""
+
+
+def _e(texte):
+    return html.escape(str(texte))
+
+
+def _couverture(titre, patient, infos, date):
+    return (f'<div class="ns-titre">{_e(titre)}</div><div class="ns-patient">{_e(patient)}</div>'
+            f'<div class="ns-infos">{_e(infos)}<br>{_e(date)}</div><hr>')
+
+
+def _puces(items):
+    return "<ul>" + "".join(f"<li>{_e(programme_model.puce(i))}</li>" for i in items) + "</ul>"
+
+
+def _options(items, prefixe="Option"):
+    return "".join(f'<div class="ns-option">{_e(prefixe)} {i}</div><div class="ns-option-texte">{_e(t)}</div>'
+                   for i, t in enumerate(items, 1))
+
+
+def _alternatives(items):
+    return '<div class="ns-ou">OU</div>'.join(f"<div>- {_e(t)}</div>" for t in items)
+
+
+def _tableau(titre, entetes, lignes, largeurs):
+    total = sum(largeurs)
+    cols = "".join(f'<col style="width:{w / total * 100:.1f}%">' for w in largeurs)
+    tete = "".join(f"<th>{_e(t)}</th>" for t in entetes)
+    corps = "".join("<tr>" + "".join(f"<td>{_e(c)}</td>" for c in ligne) + "</tr>" for ligne in lignes)
+    return ((f'<div class="ns-sous-titre">{_e(titre)}</div>' if titre else "")
+            + f'<table style="width:{min(100.0, total / LARGEUR_PAGE_MM * 100):.0f}%">'
+            + f"<colgroup>{cols}</colgroup><thead><tr>{tete}</tr></thead><tbody>{corps}</tbody></table>")
+
+
+_RENDU = {
+    "couverture": _couverture,
+    "section": lambda titre: f'<div class="ns-section">{_e(titre)}</div>',
+    "sous_titre": lambda titre: f'<div class="ns-sous-titre">{_e(titre)}</div>',
+    "texte": lambda texte: f"<p>{_e(texte)}</p>",
+    "puces": _puces,
+    "options": _options,
+    "alternatives": _alternatives,
+    "encadre": lambda texte: f'<div class="ns-encadre">&gt;&gt; {_e(texte)}</div>',
+    "tableau": _tableau,
+    "espace": lambda mm: f'<div style="height:{mm}mm"></div>',
+}
+
+
+def render_section(nom, blocs):
+    """HTML d'une section (une « page » du PDF)."""
+    corps = "".join(_RENDU[type_bloc](*args) for type_bloc, *args in blocs)
+    return f'<div class="ns-page" id="ns-{_e(nom)}">{corps}</div>'
+
+
+def render_html(data):
+    """
+    Aperçu HTML complet du programme (feuille de style comprise).
+
+    Args:
+        data: payload de generate_programme_pdf.
+
+    Returns:
+        str — fragment HTML, à afficher avec st.html.
+    """
+    pages = "".join(render_section(nom, blocs) for nom, blocs in programme_model.sections(data))
+    return f'{CSS}<div class="ns-programme">{pages}</div>'
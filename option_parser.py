@@ -0,0 +1,203 @@
+"""
+Lecture des options PDJ / collation — NutriSolver
+
+Les options de settings sont du texte libre :
+    "100g fromage blanc/Skyr + 30-40g flocons d'avoine + 1 càs graines + 1 fruit"
+
+parse_option les découpe en composants (aliment, quantité, unité) :
+  - composants séparés par "+" ; pour "A ou B" et "A/B", A est retenu et B
+    gardé dans "alternatives" ;
+  - quantité en tête ("100g", "30-40g" -> 35, "½", "2 càs") ; un poids
+    entre parenthèses ("1 poignée oléagineux (15g)") l'emporte ;
+  - les autres parenthèses sont des remarques ("(plaisir)", "(au plat…)").
+
+resolve_item convertit un composant en grammes et macros, d'abord par les
+mesures ménagères de data_manager (MESURES_MENAGERES : 1 fruit, 1 càs de
+graines...), sinon par la base Ciqual (recherche tolérante de FoodDatabase,
+au-dessus de CIQUAL_MIN_SCORE : un mot inconnu reste non résolu plutôt que
+d'apporter les macros d'un aliment sans rapport).
+
+option_macros met le résultat en cache, par empreinte du texte normalisé :
+une option déjà vue coûte une consultation de dictionnaire. Le cache est
+borné (OPTION_CACHE_MAX, les plus anciennes entrées partent en premier).
+"""
+
+import hashlib
+import re
+from functools import lru_cache
+
+import data_manager
+
+MACROS = ("prot", "carb", "lip", "kcal")
+
+# Unités reconnues -> forme canonique
+UNITES = {
+    "g": "g", "gr": "g", "ml": "ml", "cl": "cl",
+    "càs": "càs", "cas": "càs", "c.à.s": "càs", "cs": "càs",
+    "càc": "càc", "cac": "càc", "c.à.c": "càc", "cc": "càc",
+    "poignée": "poignée", "poignee": "poignée", "tranche": "tranche", "tranches": "tranche",
+    "carré": "carré", "carre": "carré", "carrés": "carré", "pot": "pot", "verre": "verre",
+}
+# Poids (g) des mesures pour un aliment trouvé dans Ciqual ; "unité" :
+# "1 aliment" sans mesure. Les aliments de MESURES_MENAGERES ont leur
+# propre poids d'unité et de cuillère.
+MESURE_G = {"càs": 15, "càc": 5, "poignée": 15, "tranche": 35, "carré": 5, "pot": 125,
+            "verre": 200, "unité": 100}
+_ML_PAR_UNITE = {"g": 1, "ml": 1, "cl": 10}
+# Score minimal d'une correspondance Ciqual (cf. FoodSearchIndex.search) :
+# chaque mot est un début de mot du nom, ou 75 % des trigrammes s'y trouvent
+CIQUAL_MIN_SCORE = 0.75
+
+_NOMBRE = r"(?:\d+(?:[.,]\d+)?|½|¼|¾)"
+_QUANTITE_RE = re.compile(
+    rf"^\s*(?P<n>{_NOMBRE})(?:\s*-\s*(?P<n2>{_NOMBRE}))?\s*"
+    rf"(?P<unite>{'|'.join(sorted(map(re.escape, UNITES), key=len, reverse=True))})?(?![\w])\s*"
+)
+_GRAMMES_RE = re.compile(rf"\((?P<n>{_NOMBRE})\s*(?P<unite>g|ml|cl)\)")
+_PARENTHESES_RE = re.compile(r"\([^)]*\)")
+_ARTICLE_RE = re.compile(r"^(?:de\s+|d['’]\s*)")
+
+
+def _nombre(texte):
+    return {"½": 0.5, "¼": 0.25, "¾": 0.75}.get(texte) or float(texte.replace(",", "."))
+
+
+def parse_option(option):
+    """
+    Découpe une option en composants :
+    [{"texte", "aliment", "quantite", "unite", "grammes", "alternatives"}, ...]
+    unite : forme canonique de UNITES, "unité" à défaut ; grammes : poids
+    explicite ("(15g)", "100g", "(20 cl)"), sinon None (déduit à la résolution).
+    """
+    items = []
+    for composant in str(option).split("+"):
+        composant = composant.strip()
+        if not composant:
+            continue
+        choix = [c.strip() for c in re.split(r"\bou\b", composant) if c.strip()]
+        texte = choix[0]
+        explicite = _GRAMMES_RE.search(texte)
+        texte_nu = _PARENTHESES_RE.sub("", texte).strip()
+
+        quantite, unite = 1.0, "unité"
+        m = _QUANTITE_RE.match(texte_nu.lower())
+        if m:
+            quantite = _nombre(m.group("n"))
+            if m.group("n2"):
+                quantite = (quantite + _nombre(m.group("n2"))) / 2
+            unite = UNITES.get(m.group("unite") or "", "unité")
+            texte_nu = texte_nu[m.end():]
+
+        variantes = [v.strip() for v in _ARTICLE_RE.sub("", texte_nu.strip()).split("/") if v.strip()]
+        grammes = None
+        if explicite:
+            grammes = _nombre(explicite.group("n")) * _ML_PAR_UNITE[explicite.group("unite")]
+        elif unite in _ML_PAR_UNITE:
+            grammes = quantite * _ML_PAR_UNITE[unite]
+        items.append({
+            "texte": composant,
+            "aliment": variantes[0] if variantes else texte_nu.strip(),
+            "quantite": quantite,
+            "unite": unite,
+            "grammes": grammes,
+            "alternatives": variantes[1:] + choix[1:],
+        })
+    return items
+
+
+def _mesure(aliment):
+    """Entrée de MESURES_MENAGERES citée dans le nom (la plus tôt, puis la plus longue)."""
+    plie = data_manager.fold_text(aliment)
+    mots = {data_manager.fold_text(k): k for k in data_manager.MESURES_MENAGERES}
+    mots.update(data_manager.SYNONYMES_MESURES)
+    trouves = [(m.start(), -len(mot), mot) for mot in mots
+               for m in [re.search(rf"\b{re.escape(mot)}", plie)] if m]
+    if not trouves:
+        return None, None
+    nom = mots[min(trouves)[2]]
+    return nom, data_manager.MESURES_MENAGERES[nom]
+
+
+def resolve_item(item, food_db=None):
+    """
+    Complète un composant de parse_option avec "source" ("mesure", "ciqual"
+    ou None si inconnu), "reference" (nom retenu), "grammes" et "macros".
+    """
+    nom, mesure = _mesure(item["aliment"])
+    if mesure is not None:
+        macros_100g = dict(zip(MACROS, mesure["macros_100g"]))
+        source = "mesure"
+    else:
+        food = None
+        if food_db is not None:
+            noms = food_db.search(item["aliment"], k=1, min_score=CIQUAL_MIN_SCORE)
+            food = food_db.get(noms[0]) if noms else None
+        if food is None:
+            return {**item, "source": None, "reference": None, "grammes": item["grammes"] or 0.0,
+                    "macros": dict.fromkeys(MACROS, 0.0)}
+        nom = food["name"]
+        macros_100g = {k: food[k] for k in MACROS}
+        source = "ciqual"
+
+    grammes = item["grammes"]
+    if grammes is None:
+        if source == "ciqual":
+            par_unite = MESURE_G[item["unite"]]
+        else:
+            par_unite = {"càs": mesure["cas_g"], "càc": mesure["cas_g"] / 3}.get(item["unite"], mesure["unite_g"])
+        grammes = item["quantite"] * par_unite
+    macros = {k: macros_100g[k] * grammes / 100 for k in MACROS}
+    return {**item, "source": source, "reference": nom, "grammes": grammes, "macros": macros}
+
+
+# --- Cache des macros par option ---
+OPTION_CACHE_MAX = 4096
+_cache = {}
+_stats = {"hits": 0, "misses": 0}
+
+
+def option_key(option, food_db=None):
+    """
+    Empreinte d'une option : texte brut à la casse et aux espaces près (la
+    ponctuation, "+" ou "/", change le sens de l'option) + base Ciqual utilisée.
+    """
+    base = getattr(food_db, "cache_path", None) or ("ciqual" if food_db is not None else "")
+    return _option_key(str(option), base)
+
+
+@lru_cache(maxsize=4096)
+def _option_key(option, base):
+    texte = " ".join(option.casefold().split())
+    return hashlib.sha1(f"{base}\0{texte}".encode("utf-8")).hexdigest()
+
+
+def option_macros(option, food_db=None):
+    """
+    Macros {prot, carb, lip, kcal} d'une option PDJ / collation (lecture
+    seule), calculées une fois par texte puis servies depuis le cache.
+    """
+    key = option_key(option, food_db)
+    macros = _cache.get(key)
+    if macros is not None:
+        _stats["hits"] += 1
+        return macros
+    _stats["misses"] += 1
+    totals = dict.fromkeys(MACROS, 0.0)
+    for item in parse_option(option):
+        for k, v in resolve_item(item, food_db)["macros"].items():
+            totals[k] += v
+    macros = data_manager.FrozenRow((k, round(v, 1)) for k, v in totals.items())
+    if len(_cache) >= OPTION_CACHE_MAX:
+        _cache.pop(next(iter(_cache)), None)
+    _cache[key] = macros
+    return macros
+
+
+def invalidate_cache():
+    """Vide le cache (après modification de MESURES_MENAGERES)."""
+    _cache.clear()
+    _stats.update(hits=0, misses=0)
+
+
+def cache_stats():
+    return {**_stats, "size": len(_cache)}
@@ -10,12 +10,29 @@ Reproduit le format utilisé par Tracy :
  Page 7: Oléagineux + Graines
  Page 8: Fruits
  Page 9-10: Conseils Généraux
+
+Le contenu des sections vient de programme_model (blocs partagés avec
+l'aperçu HTML de l'application). Chaque page (ou groupe de pages) est une
+section rendue à part et mise en cache selon ses blocs : regénérer après
+une modification ne redessine que les sections touchées, puis réassemble
+le document. write_programme_pdf écrit ce document en flux dans un fichier
+(ou tout objet muni de write) au lieu d'en renvoyer les octets.
 """
 
+import copy
+import hashlib
+import json
+from functools import lru_cache, partial
+from io import BytesIO
+
+from fontTools.ttLib import TTFont
 from fpdf import FPDF
+from fpdf.enums import PDFResourceType
+from fpdf.fonts import SubsetMap
+from fpdf.output import OutputProducer
 import data_manager
 import os
-from datetime import datetime
+import programme_model
 
 # Chemin du font Unicode
 FONT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -24,26 +41,112 @@ FONT_PATH = os.path.join(FONT_DIR, "DejaVuSans.ttf")
 FONT_NAME = "DejaVu"
 
 
+@lru_cache(maxsize=None)
+def _police():
+    """
+    Police DejaVu lue une seule fois par processus : (octets du fichier,
+    TTFFont modèle avec cmap, largeurs et descripteur déjà calculés).
+    """
+    with open(FONT_PATH, "rb") as f:
+        octets = f.read()
+    modele = FPDF()
+    modele.add_font(FONT_NAME, "", FONT_PATH)
+    return octets, modele.fonts[FONT_NAME.lower()]
+
+
+class _SousEnsemble(SubsetMap):
+    """
+    Sous-ensemble de glyphes dont le code dans le PDF est le point de code
+    Unicode (au lieu de l'ordre d'apparition) : le contenu d'une page ne
+    dépend pas du document, il peut être rejoué dans un autre.
+    """
+
+    def pick_glyph(self, glyph):
+        char_id = self._char_id_per_glyph.get(glyph)
+        if glyph is not None and char_id is None:
+            if len(glyph.unicode) == 1 and glyph.unicode[0] <= 0xFFFF:
+                char_id = glyph.unicode[0]
+            else:
+                # Hors plan de base : codes libres en partant de la fin
+                pris = set(self._char_id_per_glyph.values())
+                char_id = next(c for c in range(0xFFFF, 0, -1) if c not in pris)
+            self._char_id_per_glyph[glyph] = char_id
+        return char_id
+
+
+# Largeurs de texte mesurées, partagées par tous les documents du processus
+# (la police est commune, cf. _police) : {(famille, style, taille, texte): mm}
+TEXT_WIDTH_CACHE_MAX = 65536
+_largeurs = {}
+_largeurs_stats = {"hits": 0, "misses": 0}
+
+
+def text_width_cache_stats():
+    return {**_largeurs_stats, "size": len(_largeurs)}
+
+
 class ProgrammePDF(FPDF):
-    """PDF personnalisé pour le Programme Alimentaire."""
+    """
+    PDF personnalisé pour le Programme Alimentaire.
+
+    entete / pied : dessiner l'en-tête et le numéro de page ;
+    premiere_page : numéro, dans le programme, de la première page du
+    document (une section rendue à part ne commence pas à la page 1).
+    """
 
     def __init__(self):
         super().__init__()
         self.set_auto_page_break(auto=True, margin=20)
-        # Enregistrer la police Unicode
-        self.add_font(FONT_NAME, "", FONT_PATH, uni=True)
-        self.add_font(FONT_NAME, "B", FONT_PATH, uni=True)
-        self.add_font(FONT_NAME, "I", FONT_PATH, uni=True)
+        self._add_police()
+        self.entete = True
+        self.pied = True
+        self.premiere_page = 1
+
+    def _add_police(self):
+        """
+        Enregistre la police Unicode à partir du modèle partagé (_police) :
+        métriques communes, état propre au document (sous-ensemble des
+        glyphes utilisés, TTFont que le sous-ensemble modifie à l'export).
+        """
+        octets, modele = _police()
+        font = copy.copy(modele)
+        font.i = len(self.fonts) + 1
+        font.ttfont = TTFont(BytesIO(octets), recalcTimestamp=False, lazy=True)
+        font.subset = _SousEnsemble(font)
+        font.missing_glyphs = []
+        font.biggest_size_pt = 0
+        self.fonts[font.fontkey] = font
+
+    def set_font(self, family=None, style="", size=0):
+        # DejaVuSans.ttf n'a qu'une graisse : gras et italique s'affichaient
+        # déjà en romain. Une seule police est donc enregistrée et embarquée
+        # (auparavant trois copies du même sous-ensemble).
+        if (family or self.font_family or "").lower() == FONT_NAME.lower() and isinstance(style, str):
+            style = style.upper().replace("B", "").replace("I", "")
+        super().set_font(family, style, size)
+
+    def _default_file_id(self, buffer):
+        # Écriture en flux (write_programme_pdf) : même /ID que pdf.output(),
+        # calculé sur les octets déjà écrits
+        if not isinstance(buffer, _Flux):
+            return super()._default_file_id(buffer)
+        id_hash = buffer.md5.copy()
+        if self.creation_date:
+            id_hash.update(self.creation_date.strftime("%Y%m%d%H%M%S").encode("utf8"))
+        hash_hex = id_hash.hexdigest().upper()
+        return f"<{hash_hex}><{hash_hex}>"
 
     # --- En-tête et pied ---
     def header(self):
-        if self.page_no() > 1:
+        if self.entete and self.premiere_page + self.page_no() - 1 > 1:
             self.set_font(FONT_NAME, "I", 8)
             self.set_text_color(130, 130, 130)
             self.cell(0, 6, "Programme Alimentaire", align="L")
             self.ln(8)
 
     def footer(self):
+        if not self.pied:
+            return
         self.set_y(-15)
         self.set_font(FONT_NAME, "I", 8)
         self.set_text_color(130, 130, 130)
@@ -79,9 +182,7 @@ class ProgrammePDF(FPDF):
         self.set_font(FONT_NAME, "", 10)
         self.set_text_color(40, 40, 40)
         for item in items:
-            txt = item.strip()
-            if txt.startswith("- "):
-                txt = txt[2:]
+            txt = programme_model.puce(item)
             self.multi_cell(0, 5.5, f"  - {txt}", new_x="LMARGIN", new_y="NEXT")
         self.ln(2)
 
@@ -99,100 +200,146 @@ class ProgrammePDF(FPDF):
             self.ln(1)
         self.ln(2)
 
-    def equivalence_table(self, title, equivalences):
-        """Tableau d'équivalences."""
-        if not equivalences:
+    # --- Mise en page des tableaux ---
+    def text_width(self, text):
+        """get_string_width mémorisé par (police, style, taille, texte)."""
+        key = (self.font_family, self.font_style, self.font_size_pt, text)
+        w = _largeurs.get(key)
+        if w is None:
+            _largeurs_stats["misses"] += 1
+            if len(_largeurs) >= TEXT_WIDTH_CACHE_MAX:
+                _largeurs.clear()
+            w = _largeurs[key] = self.get_string_width(text)
+        else:
+            _largeurs_stats["hits"] += 1
+        return w
+
+    def wrap_text(self, text, width):
+        """
+        Lignes de `text` tenant dans `width` mm : coupure aux espaces, au
+        caractère pour un mot plus long que la ligne. Les largeurs sont
+        mesurées par mot (text_width), pas par ligne candidate.
+        """
+        espace = self.text_width(" ")
+        lignes, ligne, w_ligne = [], "", 0.0
+        for mot in str(text).split(" "):
+            w_mot = self.text_width(mot)
+            if ligne and w_ligne + espace + w_mot <= width:
+                ligne, w_ligne = f"{ligne} {mot}", w_ligne + espace + w_mot
+                continue
+            if ligne:
+                lignes.append(ligne)
+            ligne, w_ligne = mot, w_mot
+            while w_ligne > width and len(ligne) > 1:
+                # Mot trop long : coupé au dernier caractère qui tient
+                coupe, w_coupe = 1, self.text_width(ligne[0])
+                while w_coupe + self.text_width(ligne[coupe]) <= width:
+                    w_coupe += self.text_width(ligne[coupe])
+                    coupe += 1
+                lignes.append(ligne[:coupe])
+                ligne = ligne[coupe:]
+                w_ligne = self.text_width(ligne)
+        lignes.append(ligne)
+        return lignes
+
+    def column_widths(self, headers, rows, col_w):
+        """
+        Largeurs des colonnes : col_w tant que tout y tient ; sinon les
+        colonnes qui débordent s'élargissent sur la place libre de la page,
+        puis sur celle des autres colonnes (réduites à leur contenu). Ce qui
+        déborde encore est renvoyé à la ligne (cf. table).
+        """
+        marge = self.text_width("  ") + 2 * self.c_margin
+        self.set_font(FONT_NAME, "B", 9)
+        besoin = [self.text_width(str(h)) + marge for h in headers]
+        self.set_font(FONT_NAME, "", 9)
+        for row in rows:
+            for i, txt in enumerate(row[:len(besoin)]):
+                besoin[i] = max(besoin[i], self.text_width(str(txt)) + marge)
+
+        if all(b <= w for b, w in zip(besoin, col_w)):
+            return list(col_w)
+        larges = [max(b, w) for b, w in zip(besoin, col_w)]
+        if sum(larges) <= self.epw:
+            return larges
+        debordent = [i for i, (b, w) in enumerate(zip(besoin, col_w)) if b > w]
+        largeurs = [min(b, w) for b, w in zip(besoin, col_w)]
+        reste = self.epw - sum(w for i, w in enumerate(largeurs) if i not in debordent)
+        total = sum(besoin[i] for i in debordent)
+        for i in debordent:
+            largeurs[i] = max(col_w[i], reste * besoin[i] / total)
+        return largeurs
+
+    def _table_row(self, row, col_w, fill, hauteur=6):
+        """Ligne du tableau ; renvoi à la ligne dans les cellules trop étroites."""
+        retrait = self.text_width("  ")
+        cellules = [
+            self.wrap_text(str(txt), w - 2 * self.c_margin - retrait)
+            if self.text_width(f"  {txt}") > w - 2 * self.c_margin else [str(txt)]
+            for w, txt in zip(col_w, row)
+        ]
+        n = max(len(c) for c in cellules)
+        if n == 1:
+            for i, (w, txt) in enumerate(zip(col_w, row)):
+                fin = {"new_x": "LMARGIN", "new_y": "NEXT"} if i == len(col_w) - 1 else {}
+                self.cell(w, hauteur, f"  {txt}", border=1, fill=fill, **fin)
             return
 
+        interligne = 4.5
+        h = max(hauteur, n * interligne + 1.5)
+        if self.will_page_break(h):
+            self.add_page()
+        x, y = self.get_x(), self.get_y()
+        for w, lignes in zip(col_w, cellules):
+            self.rect(x, y, w, h, style="DF" if fill else "D")
+            for k, ligne in enumerate(lignes):
+                self.set_xy(x, y + 0.75 + k * interligne)
+                self.cell(w, interligne, f"  {ligne}")
+            x += w
+        self.set_xy(self.l_margin, y + h)
+
+    def table(self, title, headers, rows, col_w):
+        """
+        Tableau avec en-tête grisé et lignes alternées (bloc "tableau").
+        col_w : largeurs souhaitées, élargies si le contenu déborde
+        (column_widths), cellules renvoyées à la ligne au besoin.
+        """
         if title:
             self.sub_title(title)
+        col_w = self.column_widths(headers, rows, col_w)
 
         # En-tête du tableau
-        col_w = [90, 45, 35]
         self.set_font(FONT_NAME, "B", 9)
         self.set_fill_color(236, 240, 241)
         self.set_text_color(40, 40, 40)
-        self.cell(col_w[0], 7, "  Aliment", border=1, fill=True)
-        self.cell(col_w[1], 7, "  Poids (g)", border=1, fill=True)
-        self.cell(col_w[2], 7, "  Kcal", border=1, fill=True, new_x="LMARGIN", new_y="NEXT")
+        self._table_row(headers, col_w, True, hauteur=7)
 
         # Lignes
         self.set_font(FONT_NAME, "", 9)
-        for j, row in enumerate(equivalences):
+        for j, row in enumerate(rows):
             fill = j % 2 == 0
             if fill:
                 self.set_fill_color(249, 249, 249)
-            self.cell(col_w[0], 6, f"  {row['nom']}", border=1, fill=fill)
-            self.cell(col_w[1], 6, f"  {row['poids_g']}g", border=1, fill=fill)
-            self.cell(col_w[2], 6, f"  {row['kcal']}", border=1, fill=fill, new_x="LMARGIN", new_y="NEXT")
+            self._table_row(row, col_w, fill)
 
         self.ln(4)
 
-    def protein_equivalence_table(self, title, items):
-        """Tableau protéines avec colonne Catégorie (4 colonnes)."""
-        if not items:
-            return
-        if title:
-            self.sub_title(title)
+    def _table_bloc(self, bloc):
+        if bloc is not None:
+            _, title, headers, rows, col_w = bloc
+            self.table(title, headers, rows, col_w)
 
-        col_w = [45, 65, 40, 30]
-        self.set_font(FONT_NAME, "B", 9)
-        self.set_fill_color(236, 240, 241)
-        self.set_text_color(40, 40, 40)
-        self.cell(col_w[0], 7, "  Categorie", border=1, fill=True)
-        self.cell(col_w[1], 7, "  Aliment", border=1, fill=True)
-        self.cell(col_w[2], 7, "  Poids", border=1, fill=True)
-        self.cell(col_w[3], 7, "  Kcal", border=1, fill=True, new_x="LMARGIN", new_y="NEXT")
+    def equivalence_table(self, title, equivalences):
+        """Tableau d'équivalences."""
+        self._table_bloc(programme_model.equivalence_table(title, equivalences))
 
-        self.set_font(FONT_NAME, "", 9)
-        current_cat = None
-        for j, row in enumerate(items):
-            fill = j % 2 == 0
-            if fill:
-                self.set_fill_color(249, 249, 249)
-            cat = row.get("categorie", "")
-            cat_label = cat if cat != current_cat else ""
-            current_cat = cat
-            self.cell(col_w[0], 6, f"  {cat_label}", border=1, fill=fill)
-            self.cell(col_w[1], 6, f"  {row.get('nom', '')}", border=1, fill=fill)
-            self.cell(col_w[2], 6, f"  {row.get('poids', '')}", border=1, fill=fill)
-            self.cell(col_w[3], 6, f"  {row.get('kcal', 0)}", border=1, fill=fill, new_x="LMARGIN", new_y="NEXT")
-        self.ln(4)
+    def protein_equivalence_table(self, title, items):
+        """Tableau protéines avec colonne Catégorie (4 colonnes)."""
+        self._table_bloc(programme_model.protein_equivalence_table(title, items))
 
     def macros_table(self, macros, poids_kg=None):
         """Tableau objectifs macro-nutriments (grammes + % kcal + kcal)."""
-        if not macros:
-            return
-
-        ratios = macros.get("ratios", {})
-        subtitle = "OBJECTIFS MACRO-NUTRIMENTS"
-        if poids_kg and ratios.get("proteines_g_par_kg"):
-            subtitle += (
-                f" ({poids_kg:.0f} kg x {ratios.get('proteines_g_par_kg', 1.3):.2f} g/kg prot, "
-                f"{int(ratios.get('lipides_pct', 30))}% lip)"
-            )
-        self.sub_title(subtitle)
-
-        col_w = [55, 40, 40, 35]
-        self.set_font(FONT_NAME, "B", 9)
-        self.set_fill_color(236, 240, 241)
-        self.set_text_color(40, 40, 40)
-        self.cell(col_w[0], 7, "  Macro", border=1, fill=True)
-        self.cell(col_w[1], 7, "  Grammes", border=1, fill=True)
-        self.cell(col_w[2], 7, "  % kcal", border=1, fill=True)
-        self.cell(col_w[3], 7, "  Kcal", border=1, fill=True, new_x="LMARGIN", new_y="NEXT")
-
-        self.set_font(FONT_NAME, "", 9)
-        for j, (label, key) in enumerate([("Proteines", "proteines"), ("Lipides", "lipides"), ("Glucides", "glucides")]):
-            row = macros.get(key, {})
-            fill = j % 2 == 0
-            if fill:
-                self.set_fill_color(249, 249, 249)
-            self.cell(col_w[0], 6, f"  {label}", border=1, fill=fill)
-            self.cell(col_w[1], 6, f"  {row.get('g', 0):.1f} g", border=1, fill=fill)
-            self.cell(col_w[2], 6, f"  {row.get('pct', 0):.1f} %", border=1, fill=fill)
-            self.cell(col_w[3], 6, f"  {row.get('kcal', 0)}", border=1, fill=fill, new_x="LMARGIN", new_y="NEXT")
-        self.ln(4)
+        self._table_bloc(programme_model.macros_table(macros, poids_kg))
 
     def info_box(self, text):
         """Encadre d'information."""
@@ -203,49 +350,30 @@ class ProgrammePDF(FPDF):
         self.ln(3)
 
 
-def generate_programme_pdf(data):
-    """
-    Génère le PDF du Programme Alimentaire.
-
-    Args:
-        data: dict avec les clés :
-            client_ref, bmr, tdee, formule_bmr, objectifs,
-            petit_dejeuner, dejeuner, collation, diner,
-            hydratation, frequences_proteines, conseils_generaux,
-            listes_reference
-
-    Returns:
-        bytes — le contenu du fichier PDF
-    """
-    pdf = ProgrammePDF()
-    pdf.set_margins(15, 15, 15)
-
-    # =============================================
-    # PAGE 1 : Couverture + Objectifs + PDJ
-    # =============================================
-    pdf.add_page()
+# =============================================
+# Dessin des blocs (programme_model)
+# =============================================
+# Chaque section commence sur une nouvelle page et ne dépend que de ses
+# blocs : son rendu peut être mis en cache.
 
+def _couverture(pdf, titre, patient, infos, date):
     # Titre principal
     pdf.set_font(FONT_NAME, "B", 24)
     pdf.set_text_color(0, 166, 81)  # Vert Tricky Nutrition
-    pdf.cell(0, 15, "PROGRAMME ALIMENTAIRE", align="C", new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(0, 15, titre, align="C", new_x="LMARGIN", new_y="NEXT")
     pdf.ln(3)
 
     # Nom du patient
     pdf.set_font(FONT_NAME, "", 12)
     pdf.set_text_color(100, 100, 100)
-    pdf.cell(0, 8, data.get("client_ref", "Patient"), align="C", new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(0, 8, patient, align="C", new_x="LMARGIN", new_y="NEXT")
     pdf.ln(2)
 
     # Info BMR
     pdf.set_font(FONT_NAME, "I", 9)
-    formule = data.get("formule_bmr", "Harris-Benedict")
-    bmr_val = data.get("bmr", 0)
-    tdee_val = data.get("tdee", 0)
-    pdf.cell(0, 6, f"Formule : {formule}  |  BMR : {int(bmr_val)} kcal  |  TDEE : {int(tdee_val)} kcal",
-             align="C", new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(0, 6, infos, align="C", new_x="LMARGIN", new_y="NEXT")
     pdf.set_font(FONT_NAME, "I", 8)
-    pdf.cell(0, 5, f"Genere le {datetime.now().strftime('%d/%m/%Y')}", align="C", new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(0, 5, date, align="C", new_x="LMARGIN", new_y="NEXT")
     pdf.ln(6)
 
     # Ligne de séparation
@@ -253,272 +381,224 @@ def generate_programme_pdf(data):
     pdf.line(15, pdf.get_y(), pdf.w - 15, pdf.get_y())
     pdf.ln(6)
 
-    # Objectifs
-    pdf.section_title("OBJECTIFS")
-    objectifs = data.get("objectifs", [])
-    pdf.bullet_list([f"- {o}" for o in objectifs])
-
-    # Répartition macro-nutriments
-    macros = data.get("macros")
-    if macros:
-        pdf.macros_table(macros, poids_kg=data.get("poids_kg"))
-
-    # Petit-Déjeuner
-    pdf.section_title("PETIT-DEJEUNER")
-    pdj_options = data.get("petit_dejeuner", {}).get("options", [])
-    if pdj_options:
-        pdf.numbered_list(pdj_options)
-    pdf.info_box("Ces options peuvent etre a emporter. Les options \"plaisir\" doivent etre occasionnelles.")
-
-    # Notes pain
-    pdf.sub_title("Reperes pain :")
-    pdf.body_text("50g de pain frais = 2 petites tranches = 1 grande tranche = 1/5 baguette = 2 biscottes")
-
-    # =============================================
-    # PAGE 2 : Déjeuner
-    # =============================================
-    pdf.add_page()
-    pdf.section_title("DEJEUNER")
-    pdf.body_text("Composez votre assiette avec UN des composants de chaque groupe alimentaire :")
-
-    # Protéines
-    dejeuner = data.get("dejeuner", {})
-    prot_data = dejeuner.get("proteines", {})
-    prot_cat = prot_data.get("equivalences_par_categorie", [])
-    pdf.protein_equivalence_table(
-        f"Proteines - {prot_data.get('portion_viande_g', 125)}g viande OU {prot_data.get('portion_poisson_g', 150)}g poisson OU {prot_data.get('portion_oeufs', 3)} oeufs",
-        prot_cat,
-    )
-
-    # Féculents
-    fec_data = dejeuner.get("feculents", {})
-    equiv_fec = fec_data.get("equivalences", [])
-    pdf.equivalence_table(
-        f"Feculents - portion : {fec_data.get('portion_g', 150)}g CUITS",
-        equiv_fec
-    )
-
-    # Légumes
-    leg_data = dejeuner.get("legumes", {})
-    pdf.sub_title(f"Legumes - {leg_data.get('portion_cuits_g', 200)}g cuits et/ou {leg_data.get('portion_crudites_g', 150)}g crudites")
-    equiv_leg = leg_data.get("equivalences", [])
-    if equiv_leg:
-        pdf.equivalence_table("", equiv_leg)
-    else:
-        pdf.body_text("150-200g legumes cuits (1/2 assiette) ou 100-150g crudites ou 250-300ml soupe de legumes")
-
-    # Matières grasses
-    mg_data = dejeuner.get("matieres_grasses", {})
-    equiv_mg = mg_data.get("equivalences", [])
-    if equiv_mg:
-        pdf.equivalence_table(
-            f"Matieres Grasses - portion : {mg_data.get('portion_g', 10)}g huile",
-            equiv_mg
-        )
-    else:
-        pdf.sub_title("Matieres Grasses")
-        pdf.body_text(f"{mg_data.get('portion_g', 10)}g d'huile pour la cuisson ou l'assaisonnement.")
-    pdf.body_text("Varier vos huiles (olive, colza, coco, noix, noisette...).")
-
-    # Dessert
-    pdf.sub_title("Dessert")
-    dessert_dej = dejeuner.get("dessert", "+ 1 fruit")
-    pdf.body_text(dessert_dej)
-
-    # =============================================
-    # PAGE 3 : Collation
-    # =============================================
-    pdf.add_page()
-    pdf.section_title("COLLATION - APRES-MIDI")
-
-    collation_options = data.get("collation", {}).get("options", [])
-    if collation_options:
-        for i, opt in enumerate(collation_options, 1):
-            pdf.set_font(FONT_NAME, "", 10)
-            pdf.multi_cell(0, 6, f"  - {opt}", new_x="LMARGIN", new_y="NEXT")
-            if i < len(collation_options):
-                pdf.set_font(FONT_NAME, "I", 9)
-                pdf.set_text_color(130, 130, 130)
-                pdf.cell(0, 4, "    OU", new_x="LMARGIN", new_y="NEXT")
-                pdf.set_text_color(40, 40, 40)
-        pdf.ln(3)
-
-    pdf.info_box("Accompagner d'une boisson chaude (the, tisane sans sucre) ou d'eau.")
-    pdf.ln(2)
-    pdf.body_text("Rappel : si consommation de produits sucres (biscuits, gateaux, chocolat), toujours accompagner d'1 poignee d'oleagineux ou 1 fromage blanc.")
 
-    # =============================================
-    # PAGE 4 : Dîner
-    # =============================================
-    pdf.add_page()
-    pdf.section_title("DINER")
-    pdf.body_text("Composez votre assiette avec UN des composants de chaque groupe alimentaire :")
-
-    diner = data.get("diner", {})
-    d_prot = diner.get("proteines", {})
-    d_prot_cat = d_prot.get("equivalences_par_categorie", [])
-    pdf.protein_equivalence_table(
-        f"Proteines - {d_prot.get('portion_viande_g', 125)}g viande OU {d_prot.get('portion_poisson_g', 150)}g poisson OU {d_prot.get('portion_oeufs', 3)} oeufs",
-        d_prot_cat,
-    )
-
-    d_fec = diner.get("feculents", {})
-    d_equiv_fec = d_fec.get("equivalences", [])
-    pdf.equivalence_table(
-        f"Feculents - portion : {d_fec.get('portion_g', 150)}g CUITS",
-        d_equiv_fec
-    )
-
-    d_leg = diner.get("legumes", {})
-    pdf.sub_title(f"Legumes - {d_leg.get('portion_cuits_g', 200)}g cuits / {d_leg.get('portion_crudites_g', 150)}g crudites / 250-300ml soupe")
-
-    d_mg = diner.get("matieres_grasses", {})
-    d_equiv_mg = d_mg.get("equivalences", [])
-    if d_equiv_mg:
-        pdf.equivalence_table(
-            f"Matieres Grasses - portion : {d_mg.get('portion_g', 10)}g huile",
-            d_equiv_mg
-        )
-    else:
-        pdf.sub_title("Matieres Grasses")
-        pdf.body_text(f"{d_mg.get('portion_g', 10)}g d'huile pour la cuisson ou l'assaisonnement.")
-
-    pdf.sub_title("Dessert")
-    dessert_din = diner.get("dessert", "100g fromage blanc/Skyr/yaourt grecque")
-    pdf.body_text(dessert_din)
-
-    # =============================================
-    # PAGE 5 : Répartition assiette
-    # =============================================
-    pdf.add_page()
-    pdf.section_title("REPARTITION DE L'ASSIETTE")
-    pdf.ln(4)
-    pdf.body_text("Partagez votre assiette en 3 :")
-    pdf.ln(2)
+def _alternatives(pdf, items):
+    for i, opt in enumerate(items, 1):
+        pdf.set_font(FONT_NAME, "", 10)
+        pdf.multi_cell(0, 6, f"  - {opt}", new_x="LMARGIN", new_y="NEXT")
+        if i < len(items):
+            pdf.set_font(FONT_NAME, "I", 9)
+            pdf.set_text_color(130, 130, 130)
+            pdf.cell(0, 4, "    OU", new_x="LMARGIN", new_y="NEXT")
+            pdf.set_text_color(40, 40, 40)
+    pdf.ln(3)
 
-    pdf.sub_title("Option 1")
-    pdf.bullet_list([
-        "- 1/2 assiette : Legumes",
-        "- 1/4 assiette : Feculents",
-        "- 1/4 assiette : Proteines animales ou vegetales"
-    ])
-
-    pdf.sub_title("Option 2")
-    pdf.bullet_list([
-        "- 1/3 assiette : Legumes",
-        "- 1/3 assiette : Feculents",
-        "- 1/3 assiette : Proteines animales ou vegetales"
-    ])
-
-    # =============================================
-    # PAGE 6 : Hydratation + Légumineuses
-    # =============================================
-    pdf.add_page()
-    pdf.section_title("HYDRATATION")
-    hydratation = data.get("hydratation", {})
-    hydra_rules = [
-        f"- Repartir la consommation tout au long de la journee. Min. 8 verres (250ml) d'eau par jour.",
-        f"- Repartition suggeree : {hydratation.get('repartition', '')}",
-        f"- Limiter la consommation de cafe et the noir a {hydratation.get('max_cafe_the', 3)} tasses par jour. Privilegier les tisanes.",
-        f"- Objectif : Boire au moins {hydratation.get('objectif_litres', 1.5)}-2L par jour"
-    ]
-    pdf.bullet_list(hydra_rules)
-
-    # Légumineuses
-    pdf.section_title("LEGUMINEUSES")
-    listes = data.get("listes_reference", {})
-    equiv_legum = listes.get("legumineuses", [])
-    if equiv_legum:
-        pdf.equivalence_table("Equivalences legumineuses", equiv_legum)
-    pdf.body_text("Haricots secs (rouge, blanc, coco, noir...), Lentilles (corail, vert, beluga...), Pois chiches, Feves, Pois casses, Flageolets, Edamame.")
-    pdf.info_box("Bien les tremper si secs (min 8h). En conserve, bien les rincer avant consommation.")
-
-    # =============================================
-    # PAGE 7 : Oléagineux + Graines
-    # =============================================
-    pdf.add_page()
-    pdf.section_title("FRUITS A COQUE / OLEAGINEUX (grilles, sans sel)")
-    pdf.body_text("Amande, Noix, Noix de pecan, Noisette, Noix de macadamia, Pistache, Noix de cajou, Noix de Bresil, Chataigne")
 
-    pdf.section_title("GRAINES")
-    pdf.body_text("Tournesol, Courge, Lin (broye avant de consommer), Chia, Chanvre")
+_DESSIN = {
+    "couverture": _couverture,
+    "section": ProgrammePDF.section_title,
+    "sous_titre": ProgrammePDF.sub_title,
+    "texte": ProgrammePDF.body_text,
+    "puces": ProgrammePDF.bullet_list,
+    "options": ProgrammePDF.numbered_list,
+    "alternatives": _alternatives,
+    "encadre": ProgrammePDF.info_box,
+    "tableau": ProgrammePDF.table,
+    "espace": ProgrammePDF.ln,
+}
 
-    # =============================================
-    # PAGE 8 : Fruits
-    # =============================================
-    pdf.add_page()
-    pdf.section_title("FRUITS")
-    pdf.sub_title("Equivalences : 1 fruit = environ 100g")
-    pdf.body_text(
-        "100g compote sans sucres ajoutes, 1 pomme, 1 poire, 1 banane, 2 clementines, "
-        "2 mandarines, 1 orange, 1 pamplemousse, 10-15 raisins, 3 abricots (petits), "
-        "2 dattes, 1 peche, 1 nectarine, 2 kiwis (petit), 2 poignees de myrtilles (20), "
-        "7-8 fraises, 10-15 framboises, 1/4 ananas, 1/2 mangue, 1 belle tranche de pasteque, "
-        "2-3 figues, 2-3 prunes, 1/4 melon (grand) ou 1/2 melon (petit), 15 cerises, 3-4 quetsches"
-    )
-    pdf.ln(2)
-    pdf.info_box("Pour les fruits seches : meme quantite en frais que seche. Ex. 2-3 abricots frais = 2-3 abricots seches.")
 
-    # =============================================
-    # PAGE 9-10 : Conseils Généraux
-    # =============================================
+def _dessiner(pdf, blocs):
+    """Dessine une section (liste de blocs) à partir d'une nouvelle page."""
     pdf.add_page()
-    pdf.section_title("CONSEILS GENERAUX")
-
-    conseils = data.get("conseils_generaux", "")
-    if isinstance(conseils, str):
-        lines = [l.strip() for l in conseils.split("\n") if l.strip()]
-        pdf.bullet_list(lines)
-    elif isinstance(conseils, list):
-        pdf.bullet_list(conseils)
-
-    # Fréquences protéines
-    pdf.section_title("FREQUENCES DES PROTEINES AU REPAS")
-    freq = data.get("frequences_proteines", {})
-
-    col_w = [60, 60]
-    pdf.set_font(FONT_NAME, "B", 9)
-    pdf.set_fill_color(236, 240, 241)
-    pdf.cell(col_w[0], 7, "  Type", border=1, fill=True)
-    pdf.cell(col_w[1], 7, "  Frequence", border=1, fill=True, new_x="LMARGIN", new_y="NEXT")
-
-    pdf.set_font(FONT_NAME, "", 9)
-    freq_items = [
-        ("Viandes blanches", freq.get("viandes_blanches", "5 fois/semaine")),
-        ("Viandes rouges", freq.get("viandes_rouges", "max 2 fois/semaine")),
-        ("Poissons", freq.get("poissons", "2-3 fois/semaine")),
-        ("Oeufs", freq.get("oeufs", "min 3-4 fois/semaine")),
-        ("Vegetarien", freq.get("vegetarien", "min 3-4 fois/semaine")),
+    for type_bloc, *args in blocs:
+        _DESSIN[type_bloc](pdf, *args)
+
+
+# --- Cache des sections rendues ---
+SECTION_CACHE_MAX = 512
+_sections = {}
+_section_stats = {"hits": 0, "misses": 0}
+
+
+def _etat(pdf):
+    """État graphique transmis d'une page à la suivante par add_page."""
+    return (pdf.font_family, pdf.font_style, pdf.font_size_pt, pdf.line_width,
+            pdf.draw_color, pdf.fill_color, pdf.text_color)
+
+
+def section_key(nom, blocs, etat):
+    """Empreinte d'une section : nom, blocs et état graphique à l'entrée."""
+    etat_txt = [c.serialize() if hasattr(c, "serialize") else c for c in etat]
+    texte = json.dumps([nom, blocs, etat_txt], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(texte.encode("utf-8")).hexdigest()
+
+
+def _render_section(nom, blocs, etat):
+    """
+    Dessine une section dans un document à part, à partir de l'état
+    graphique d'entrée : (pages [(contenu, polices)], glyphes, état de sortie).
+    """
+    pdf = ProgrammePDF()
+    pdf.set_margins(15, 15, 15)
+    pdf.pied = False
+    pdf.premiere_page = 1 if nom == programme_model.SECTIONS[0][0] else 2
+    family, style, size, pdf.line_width, pdf.draw_color, pdf.fill_color, pdf.text_color = etat
+    if family:
+        pdf.set_font(family, style, size)
+    _dessiner(pdf, blocs)
+
+    font = pdf.fonts[FONT_NAME.lower()]
+    polices = pdf._resource_catalog.resources_per_page
+    pages = [
+        (bytes(pdf.pages[n].contents), tuple(sorted(polices.get((n, PDFResourceType.FONT), ()))))
+        for n in range(1, pdf.page + 1)
     ]
-    for j, (label, val) in enumerate(freq_items):
-        fill = j % 2 == 0
-        if fill:
-            pdf.set_fill_color(249, 249, 249)
-        pdf.cell(col_w[0], 6, f"  {label}", border=1, fill=fill)
-        pdf.cell(col_w[1], 6, f"  {val}", border=1, fill=fill, new_x="LMARGIN", new_y="NEXT")
-    pdf.ln(6)
+    glyphes = tuple(g for g, _ in font.subset.items() if g is not None)
+    return pages, glyphes, tuple(font.missing_glyphs), _etat(pdf)
+
+
+def _section(nom, blocs, etat):
+    key = section_key(nom, blocs, etat)
+    rendu = _sections.get(key)
+    if rendu is not None:
+        _section_stats["hits"] += 1
+        return rendu
+    _section_stats["misses"] += 1
+    rendu = _render_section(nom, blocs, etat)
+    if len(_sections) >= SECTION_CACHE_MAX:
+        _sections.pop(next(iter(_sections)), None)
+    _sections[key] = rendu
+    return rendu
+
+
+def invalidate_section_cache():
+    """Vide le cache des sections (après modification du gabarit)."""
+    _sections.clear()
+    _section_stats.update(hits=0, misses=0)
+
+
+def section_cache_stats():
+    return {**_section_stats, "size": len(_sections)}
+
+
+def _assembler(data):
+    """Document complet (ProgrammePDF) réassemblé à partir des sections en cache."""
+    pdf = ProgrammePDF()
+    pdf.set_margins(15, 15, 15)
+    pdf.entete = False  # déjà dans les pages des sections
+    font = pdf.fonts[FONT_NAME.lower()]
+
+    etat = _etat(pdf)
+    for nom, blocs in programme_model.sections(data):
+        pages, glyphes, manquants, etat = _section(nom, blocs, etat)
+        for contenu, polices in pages:
+            pdf.add_page()
+            pdf._out(contenu.removesuffix(b"\n"))
+            # Le contenu rejoué a changé la police courante de la page
+            pdf.current_font_is_set_on_page = False
+            for i in polices:
+                pdf._resource_catalog.add(PDFResourceType.FONT, i, pdf.page)
+        for glyphe in glyphes:
+            font.subset.pick_glyph(glyphe)
+        font.missing_glyphs.extend(u for u in manquants if u not in font.missing_glyphs)
+    return pdf
+
+
+def generate_programme_pdf(data):
+    """
+    Génère le PDF du Programme Alimentaire.
 
-    # Extras et matières grasses
-    pdf.sub_title("MATIERES GRASSES")
-    pdf.bullet_list([
-        "- Varier vos huiles vegetales",
-        "- Ne pas cuire le beurre et la margarine",
-        "- Cuisson : huile d'olive, huile de coco, huile de sesame, huile d'avocat, ghee",
-        "- Assaisonnement : huile de colza, huile de lin, huile de noix, huile de pepins de raisin"
-    ])
-
-    pdf.sub_title("EXTRAS")
-    pdf.bullet_list([
-        "- Limiter a 1 produit gras/frit 2-3 fois par semaine",
-        "- Limiter a 2-3 produits sucres par semaine",
-        "- 1 carre de chocolat noir par jour autorise (collation ou apres repas)",
-        "- Limiter boissons sucrees/gazeuses a 2 fois/semaine",
-        "- Limiter restaurants et plats livres a 2 fois par semaine",
-        "- Si dessert patisserie : reduire de ~50g les feculents cuits"
-    ])
-
-    pdf.sub_title("CONDIMENTS")
-    pdf.body_text("Pas de regles specifiques. Variez vos epices. Vinaigrette maison : 1 cas huile pour 2 cas vinaigre + assaisonnements.")
+    Chaque section (cf. programme_model.SECTIONS) est rendue à part et mise
+    en cache selon ses blocs ; le document est réassemblé à partir des pages
+    en cache, seuls les numéros de page (pied) sont redessinés. Après une
+    modification, seules les sections dont les blocs ont changé sont
+    redessinées.
 
+    Args:
+        data: dict avec les clés :
+            client_ref, bmr, tdee, formule_bmr, objectifs,
+            petit_dejeuner, dejeuner, collation, diner,
+            hydratation, frequences_proteines, conseils_generaux,
+            listes_reference
+
+    Returns:
+        bytes — le contenu du fichier PDF
+    """
     # Retourner le PDF en bytes
-    return pdf.output()
+    return _assembler(data).output()
+
+
+# --- Écriture en flux ---
+
+class _Flux:
+    """
+    Tient lieu de tampon de sortie pour OutputProducer : chaque ajout part
+    directement vers `sink`, seule la position courante (len) est gardée
+    pour la table xref.
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.position = 0
+        # Empreinte des octets écrits : /ID par défaut du document
+        self.md5 = hashlib.md5(usedforsecurity=False)
+
+    def __iadd__(self, data):
+        self.sink.write(data)
+        self.md5.update(data)
+        self.position += len(data)
+        return self
+
+    def __len__(self):
+        return self.position
+
+
+class _ProductionFlux(OutputProducer):
+    """
+    OutputProducer qui écrit chaque objet PDF dans le flux dès qu'il est
+    sérialisé, et libère le contenu de chaque page une fois écrit.
+    """
+
+    def __init__(self, fpdf, sink):
+        super().__init__(fpdf)
+        self.buffer = _Flux(sink)
+
+    def _add_pages(self, _slice=slice(0, None)):
+        page_objs = super()._add_pages(_slice)
+        for page_obj in page_objs:
+            page_obj.contents.serialize = _liberer_apres(page_obj.contents)
+        return page_objs
+
+
+def _liberer_apres(stream):
+    serialize = stream.serialize
+
+    def serialize_et_liberer(*args, **kwargs):
+        texte = serialize(*args, **kwargs)
+        stream._contents = b""
+        return texte
+
+    return serialize_et_liberer
+
+
+def write_programme_pdf(data, sink):
+    """
+    Variante de generate_programme_pdf qui écrit le PDF dans `sink` au lieu
+    de renvoyer ses octets : chemin de fichier, ou objet binaire muni de
+    write() (fichier ouvert, BytesIO, sock.makefile("wb"), entrée de zip...).
+
+    Les objets du document (pages, puis police et table xref, qui ne sont
+    connues qu'une fois toutes les pages placées) partent vers `sink` au
+    fil de la sérialisation ; le contenu d'une page est libéré dès qu'il
+    est écrit. Ni le PDF complet ni sa copie en bytes ne sont gardés en
+    mémoire.
+
+    Returns:
+        int — nombre d'octets écrits
+    """
+    if isinstance(sink, (str, os.PathLike)):
+        with open(sink, "wb") as f:
+            return write_programme_pdf(data, f)
+    pdf = _assembler(data)
+    return len(pdf.output(output_producer_class=partial(_ProductionFlux, sink=sink)))
@@ -0,0 +1,127 @@
+"""
+File de génération des PDF — NutriSolver
+
+generate_programme_pdf prend plusieurs centaines de ms : dans l'application,
+le rendu part dans un pool de processus partagé par toutes les sessions
+(PdfJobQueue, détenu par st.cache_resource) et la page interroge l'état du
+travail au lieu de rester bloquée.
+
+L'identifiant d'un travail est l'empreinte de son payload (et de la date,
+imprimée en couverture) : soumettre deux fois les mêmes entrées renvoie le
+même travail, le PDF n'est rendu qu'une fois.
+
+Les processus de rendu écrivent le PDF en flux dans un ArtifactStore
+(disque) et ne renvoient que son handle : les octets ne transitent pas par
+le serveur et le document n'est jamais entier en mémoire.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import pdf_generator
+from artifact_store import ArtifactStore
+
+# Travaux terminés gardés (les plus anciens sont oubliés au-delà)
+MAX_TERMINES = 32
+
+
+def payload_key(payload):
+    """Identifiant d'un travail : empreinte du payload et de la date du jour."""
+    texte = json.dumps([payload, date.today().isoformat()], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(texte.encode("utf-8")).hexdigest()
+
+
+def _init_worker():
+    pdf_generator._police()
+
+
+def _render(payload, store_args):
+    return ArtifactStore(*store_args).put_stream(lambda f: pdf_generator.write_programme_pdf(payload, f))
+
+
+class PdfJobQueue:
+    """
+    Pool de rendu partagé.
+
+    Args:
+        store: ArtifactStore où les PDF sont écrits (défaut : dossier temporaire).
+        workers: processus de rendu (défaut : cœurs disponibles, au plus 4).
+    """
+
+    def __init__(self, store=None, workers=None):
+        self.store = store or ArtifactStore()
+        # "spawn" : pas de fork d'un serveur Streamlit multi-thread
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers or min(4, os.cpu_count() or 1),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, payload):
+        """Soumet un payload ; renvoie l'identifiant du travail (existant si déjà soumis)."""
+        job_id = payload_key(payload)
+        with self._lock:
+            if self._a_refaire(self._jobs.get(job_id)):
+                store_args = (self.store.root, self.store.ttl_s, self.store.max_bytes)
+                self._jobs[job_id] = self._pool.submit(_render, payload, store_args)
+                self._oublier_termines()
+        return job_id
+
+    def _a_refaire(self, future):
+        """Pas de travail, travail en échec, ou PDF évincé du disque depuis."""
+        if future is None:
+            return True
+        if not future.done():
+            return False
+        return future.exception() is not None or not self.store.exists(future.result())
+
+    def _oublier_termines(self):
+        termines = [k for k, f in self._jobs.items() if f.done()]
+        for k in termines[:max(0, len(termines) - MAX_TERMINES)]:
+            del self._jobs[k]
+
+    def status(self, job_id):
+        """"en_attente", "en_cours", "termine", "erreur" ou "inconnu"."""
+        with self._lock:
+            future = self._jobs.get(job_id)
+            if future is None:
+                return "inconnu"
+            if not future.done():
+                return "en_cours" if future.running() else "en_attente"
+            if future.exception() is not None:
+                return "erreur"
+            if not self.store.exists(future.result()):
+                # PDF évincé du disque : le travail est à refaire. Sous le verrou,
+                # pour ne pas retirer un travail que submit vient de relancer.
+                self._jobs.pop(job_id, None)
+                return "inconnu"
+            return "termine"
+
+    def result(self, job_id):
+        """Handle (ArtifactStore) du PDF si le travail est terminé, sinon None."""
+        with self._lock:
+            future = self._jobs.get(job_id)
+        if future is None or not future.done() or future.exception() is not None:
+            return None
+        return future.result()
+
+    def error(self, job_id):
+        """Message d'erreur du travail, ou None."""
+        with self._lock:
+            future = self._jobs.get(job_id)
+        if future is None or not future.done() or future.exception() is None:
+            return None
+        return str(future.exception())
+
+    def stats(self):
+        with self._lock:
+            travaux = list(self._jobs)
+        statuts = [self.status(k) for k in travaux]
+        return {s: statuts.count(s) for s in ("en_attente", "en_cours", "termine", "erreur")}
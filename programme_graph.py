@@ -0,0 +1,427 @@
+"""
+Graphe de calcul de l'onglet Programme — NutriSolver
+
+Streamlit réexécute app.py en entier à chaque modification d'un widget. Les
+calculs de l'onglet Programme (BMR, macros, tables d'équivalences, cohérence,
+solveur, simulation, semaine type, payload du PDF) sont ici des nœuds purs,
+mémoïsés, reliés par leurs dépendances :
+
+    profil -> bmr -> tdee
+    poids, kcal_cible, ratios -> macros -> cibles -> couples / solution
+    portions des widgets -> tables d'équivalences -> fourni -> payload -> apercu
+
+Les dépendances d'un nœud sont les noms des paramètres de sa fonction (une
+entrée ou un autre nœud). app.py pose les entrées (valeurs des widgets) à
+chaque exécution puis lit les nœuds dont la page a besoin : seuls ceux dont
+une entrée a changé sont recalculés. Un nœud recalculé qui redonne la même
+valeur n'invalide pas ses dépendants. Le payload n'est construit que s'il
+est lu (aperçu, export) ; la simulation et l'aperçu (A_LA_DEMANDE) ne sont
+lus que si leur expander est ouvert.
+
+ProgrammeGraph.stats() donne, par nœud, les recalculs, les lectures en cache
+et les durées (`python benchmark.py programme`).
+"""
+
+import inspect
+import time
+
+import numpy as np
+
+import data_manager
+import html_preview
+import option_parser
+import scheduler
+import simulation
+import solver
+
+# Entrées posées par app.py (valeurs des widgets, réglages, base Ciqual)
+INPUTS = (
+    "client_ref", "sexe", "age", "poids", "taille", "facteur_activite", "formule_bmr", "masse_grasse",
+    "kcal_cible", "ratios", "settings", "objectifs", "food_db",
+    "pdj_choisies", "collation_choisies",
+    "dej_viande", "dej_poisson", "dej_oeufs", "dej_feculents", "dej_legumes", "dej_crudites", "dej_mg",
+    "din_viande", "din_poisson", "din_oeufs", "din_feculents", "din_mg",
+    "part_repas_pct", "simu_n", "semaine_graine",
+)
+
+
+# Nœuds lus seulement quand leur expander est ouvert (simulation de 100 000
+# journées, HTML de l'aperçu) : pas recalculés à chaque modification sinon
+A_LA_DEMANDE = ("simulation_jours", "simulation_resume", "apercu")
+
+
+def _egal(a, b):
+    """Égalité tolérante (tableaux numpy comparés élément par élément, objets non comparables : différents)."""
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, np.ndarray):
+        return a.shape == b.shape and a.dtype == b.dtype and np.array_equal(a, b)
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False
+
+
+class Graph:
+    """
+    Graphe de nœuds purs mémoïsés.
+
+    Args:
+        nodes: {nom: fonction} ; les paramètres de la fonction sont les noms
+            des entrées ou des nœuds dont elle dépend.
+        inputs: noms des entrées.
+    """
+
+    def __init__(self, nodes, inputs):
+        self._fns = dict(nodes)
+        self._deps = {nom: tuple(inspect.signature(fn).parameters) for nom, fn in self._fns.items()}
+        self._inputs = set(inputs)
+        inconnus = {d for deps in self._deps.values() for d in deps} - self._inputs - set(self._fns)
+        if inconnus:
+            raise ValueError(f"Dépendances inconnues : {sorted(inconnus)}")
+        self._values = {}
+        self._versions = {}
+        # nœud -> versions des dépendances lors du dernier calcul
+        self._vus = {}
+        self._stats = {nom: {"recalculs": 0, "caches": 0, "dernier_ms": 0.0, "total_ms": 0.0}
+                       for nom in self._fns}
+        self._execution = set()
+
+    def set_inputs(self, **values):
+        """Pose des entrées ; une entrée inchangée (égale) garde sa version."""
+        for nom, value in values.items():
+            if nom not in self._inputs:
+                raise KeyError(f"Entrée inconnue : {nom}")
+            if nom in self._values and _egal(self._values[nom], value):
+                continue
+            self._values[nom] = value
+            self._versions[nom] = self._versions.get(nom, 0) + 1
+
+    def get(self, nom):
+        """Valeur d'un nœud (ou d'une entrée), recalculée seulement si une dépendance a changé."""
+        if nom in self._inputs:
+            if nom not in self._values:
+                raise KeyError(f"Entrée non posée : {nom}")
+            return self._values[nom]
+        args = [self.get(d) for d in self._deps[nom]]
+        vus = tuple(self._versions[d] for d in self._deps[nom])
+        stats = self._stats[nom]
+        if self._vus.get(nom) == vus:
+            stats["caches"] += 1
+            return self._values[nom]
+
+        t = time.perf_counter()
+        value = self._fns[nom](*args)
+        ms = (time.perf_counter() - t) * 1000
+        stats["recalculs"] += 1
+        stats["dernier_ms"] = ms
+        stats["total_ms"] += ms
+        self._execution.add(nom)
+        self._vus[nom] = vus
+        if not (nom in self._values and _egal(self._values[nom], value)):
+            self._values[nom] = value
+            self._versions[nom] = self._versions.get(nom, 0) + 1
+        return self._values[nom]
+
+    def begin_run(self):
+        """Début d'une exécution de la page : remet à zéro la liste des nœuds recalculés."""
+        self._execution = set()
+
+    def recomputed(self):
+        """Nœuds recalculés depuis begin_run."""
+        return set(self._execution)
+
+    def stats(self):
+        """[{noeud, recalculs, caches, dernier_ms, total_ms, recalcule}] dans l'ordre des nœuds."""
+        return [{"noeud": nom, **{k: round(v, 2) for k, v in s.items()}, "recalcule": nom in self._execution}
+                for nom, s in self._stats.items()]
+
+
+# =============================================
+# Nœuds du Programme
+# =============================================
+
+def portions(settings):
+    return settings.get("portions", data_manager.DEFAULT_SETTINGS["portions"])
+
+
+def _reglage(cle):
+    def noeud(settings):
+        return settings.get(cle, data_manager.DEFAULT_SETTINGS[cle])
+    noeud.__name__ = cle
+    return noeud
+
+
+def bmr(sexe, poids, taille, age, formule_bmr, masse_grasse):
+    if formule_bmr == "Black et al (1996)":
+        return data_manager.calc_bmr_black(sexe, poids, taille, age)
+    if formule_bmr == "Muller":
+        return data_manager.calc_bmr_muller(sexe, poids, age, masse_grasse)
+    return data_manager.calc_bmr_harris_benedict(sexe, poids, taille, age)
+
+
+def tdee(bmr, facteur_activite):
+    return bmr * facteur_activite
+
+
+def macros(poids, kcal_cible, ratios):
+    return data_manager.compute_macros_targets(poids, kcal_cible, ratios)
+
+
+def macros_pdj(options_pdj, food_db):
+    return [option_parser.option_macros(o, food_db) for o in options_pdj]
+
+
+def macros_collation(options_collation, food_db):
+    return [option_parser.option_macros(o, food_db) for o in options_collation]
+
+
+# --- Tables d'équivalences ---
+
+def equiv_dej_proteines(dej_viande, dej_poisson, dej_oeufs):
+    return data_manager.get_protein_equivalences(dej_viande, dej_poisson, dej_oeufs)
+
+
+def equiv_dej_feculents(dej_feculents):
+    return data_manager.get_equivalences("Féculents", dej_feculents)
+
+
+def equiv_dej_legumes(dej_legumes):
+    return data_manager.get_equivalences("Légumes", dej_legumes)
+
+
+def equiv_dej_mg(dej_mg):
+    return data_manager.get_equivalences("Matières Grasses", dej_mg)
+
+
+def equiv_din_proteines(din_viande, din_poisson, din_oeufs):
+    return data_manager.get_protein_equivalences(din_viande, din_poisson, din_oeufs)
+
+
+def equiv_din_feculents(din_feculents):
+    return data_manager.get_equivalences("Féculents", din_feculents)
+
+
+def equiv_din_mg(din_mg):
+    return data_manager.get_equivalences("Matières Grasses", din_mg)
+
+
+def equiv_legumineuses(portions):
+    return data_manager.get_equivalences("Légumineuses", int(portions.get("legumineuses_cuites", 160)))
+
+
+def equiv_laitiers(portions):
+    return data_manager.get_equivalences("Produits Laitiers", int(portions.get("fromage_blanc", 100)))
+
+
+# --- Cohérence du programme ---
+
+def repas_macros(dej_viande, dej_feculents, dej_legumes, dej_mg, din_viande, din_feculents, din_mg, portions):
+    """(déjeuner, dîner) au format de estimate_programme_macros."""
+    dejeuner = {
+        "proteines": {"portion_viande_g": dej_viande},
+        "feculents": {"portion_g": dej_feculents},
+        "legumes": {"portion_cuits_g": dej_legumes},
+        "matieres_grasses": {"portion_g": dej_mg},
+    }
+    diner = {
+        "proteines": {"portion_viande_g": din_viande},
+        "feculents": {"portion_g": din_feculents},
+        "legumes": {"portion_cuits_g": int(portions.get("legumes_cuits", 200))},
+        "matieres_grasses": {"portion_g": din_mg},
+    }
+    return dejeuner, diner
+
+
+def fourni(repas_macros, portions):
+    return data_manager.estimate_programme_macros(
+        *repas_macros,
+        portion_fruit_g=int(portions.get("fruits", 100)),
+        portion_laitier_g=int(portions.get("fromage_blanc", 100)),
+    )
+
+
+def cibles(macros):
+    return solver.cibles_from_macros(macros)
+
+
+def couples(cibles, fourni, macros_pdj, macros_collation):
+    """Meilleurs couples PDJ + collation pour le reste à combler ([] si rien à combler)."""
+    if cibles["kcal"] - fourni["kcal"] <= 0:
+        return []
+    reste = {k: cibles[k] - fourni[k] for k in ("prot", "carb", "lip", "kcal")}
+    return solver.rank_snack_combinations(reste, macros_pdj, macros_collation, cibles, k=5)
+
+
+def journee(couples, repas_macros, portions, macros_pdj, macros_collation):
+    """Macros de la journée complète avec le meilleur couple (None sans couple)."""
+    if not couples:
+        return None
+    meilleur = couples[0]
+    return data_manager.estimate_programme_macros(
+        *repas_macros,
+        portion_fruit_g=int(portions.get("fruits", 100)),
+        portion_laitier_g=int(portions.get("fromage_blanc", 100)),
+        pdj=macros_pdj[meilleur["pdj"]],
+        collation=macros_collation[meilleur["collation"]],
+    )
+
+
+def solution(macros, settings, portions, part_repas_pct):
+    bornes = {g: tuple(b) for g, b in settings.get(
+        "bornes_portions", data_manager.DEFAULT_SETTINGS["bornes_portions"]).items()}
+    legumes_diner = int(portions.get("legumes_cuits", 200))
+    bornes[("diner", "legumes")] = (legumes_diner, legumes_diner)  # non réglable au dîner
+    return solver.solve_portions_granular(
+        macros,
+        bounds=bornes,
+        reference={
+            "proteines": portions.get("proteines_viande", 125),
+            "feculents": portions.get("feculents_cuits", 150),
+            "legumes": portions.get("legumes_cuits", 200),
+            "matieres_grasses": portions.get("matieres_grasses_g", 10),
+        },
+        part_repas=part_repas_pct / 100,
+        portion_fruit_g=int(portions.get("fruits", 100)),
+        portion_laitier_g=int(portions.get("fromage_blanc", 100)),
+    )
+
+
+def simulation_jours(dej_viande, dej_poisson, dej_oeufs, dej_feculents, dej_legumes, dej_mg,
+                     din_viande, din_poisson, din_oeufs, din_feculents, din_mg,
+                     portions, options_pdj, options_collation, food_db, simu_n):
+    tables = simulation.choice_tables(
+        {"viande": dej_viande, "poisson": dej_poisson, "oeufs": dej_oeufs,
+         "feculents": dej_feculents, "legumes": dej_legumes, "matieres_grasses": dej_mg},
+        {"viande": din_viande, "poisson": din_poisson, "oeufs": din_oeufs,
+         "feculents": din_feculents, "legumes": int(portions.get("legumes_cuits", 200)),
+         "matieres_grasses": din_mg},
+        portion_fruit_g=int(portions.get("fruits", 100)),
+        portion_laitier_g=int(portions.get("fromage_blanc", 100)),
+        options_pdj=options_pdj, options_collation=options_collation, food_db=food_db,
+    )
+    return simulation.simulate_days(tables, simu_n, seed=0)
+
+
+def simulation_resume(simulation_jours, macros):
+    return simulation.summarize(simulation_jours, macros)
+
+
+def semaine(frequences_proteines, dej_viande, dej_poisson, dej_oeufs, din_viande, din_poisson, din_oeufs,
+            macros, semaine_graine):
+    """Semaine type (liste des 14 repas), None si aucune ne respecte les fréquences."""
+    semaines = scheduler.generate_weeks(
+        1,
+        frequences=frequences_proteines,
+        portions={
+            "dejeuner": {"viande": dej_viande, "poisson": dej_poisson, "oeufs": dej_oeufs},
+            "diner": {"viande": din_viande, "poisson": din_poisson, "oeufs": din_oeufs},
+        },
+        macros=macros,
+        seed=int(semaine_graine),
+    )
+    return semaines[0] if semaines else None
+
+
+# --- Export ---
+
+def payload(client_ref, bmr, tdee, formule_bmr, objectifs, macros, poids, pdj_choisies, collation_choisies,
+            dej_viande, dej_poisson, dej_oeufs, dej_feculents, dej_legumes, dej_crudites, dej_mg,
+            din_viande, din_poisson, din_oeufs, din_feculents, din_mg,
+            equiv_dej_proteines, equiv_dej_feculents, equiv_dej_legumes, equiv_dej_mg,
+            equiv_din_proteines, equiv_din_feculents, equiv_din_mg, equiv_legumineuses,
+            portions, hydratation, frequences_proteines, conseils_generaux):
+    """Payload de generate_programme_pdf et de l'aperçu HTML."""
+    return {
+        "client_ref": client_ref,
+        "bmr": round(bmr, 1),
+        "tdee": round(tdee, 1),
+        "formule_bmr": formule_bmr,
+        "objectifs": objectifs,
+        "macros": macros,
+        "poids_kg": poids,
+        "petit_dejeuner": {
+            "options": pdj_choisies
+        },
+        "dejeuner": {
+            "proteines": {
+                "portion_viande_g": dej_viande,
+                "portion_poisson_g": dej_poisson,
+                "portion_oeufs": dej_oeufs,
+                "equivalences_par_categorie": equiv_dej_proteines,
+            },
+            "feculents": {
+                "portion_g": dej_feculents,
+                "equivalences": equiv_dej_feculents
+            },
+            "legumes": {
+                "portion_cuits_g": dej_legumes,
+                "portion_crudites_g": dej_crudites,
+                "equivalences": equiv_dej_legumes
+            },
+            "matieres_grasses": {
+                "portion_g": dej_mg,
+                "equivalences": equiv_dej_mg
+            },
+            "dessert": "1 fruit"
+        },
+        "collation": {
+            "options": collation_choisies
+        },
+        "diner": {
+            "proteines": {
+                "portion_viande_g": din_viande,
+                "portion_poisson_g": din_poisson,
+                "portion_oeufs": din_oeufs,
+                "equivalences_par_categorie": equiv_din_proteines,
+            },
+            "feculents": {
+                "portion_g": din_feculents,
+                "equivalences": equiv_din_feculents
+            },
+            "legumes": {
+                "portion_cuits_g": int(portions.get("legumes_cuits", 200)),
+                "portion_crudites_g": int(portions.get("legumes_crus", 150)),
+            },
+            "matieres_grasses": {
+                "portion_g": din_mg,
+                "equivalences": equiv_din_mg
+            },
+            "dessert": "100g fromage blanc/Skyr/yaourt grecque"
+        },
+        "hydratation": hydratation,
+        "frequences_proteines": frequences_proteines,
+        "conseils_generaux": conseils_generaux,
+        "listes_reference": {
+            "legumineuses": equiv_legumineuses,
+            "fruits_equivalences": "1 fruit ≈ 100g = 1 pomme, 1 poire, 1 banane, 2 clémentines, 1 orange, 10-15 raisins, etc."
+        }
+    }
+
+
+def apercu(payload):
+    return html_preview.render_html(payload)
+
+
+NODES = {
+    fn.__name__: fn
+    for fn in (
+        portions, _reglage("options_pdj"), _reglage("options_collation"), _reglage("hydratation"),
+        _reglage("frequences_proteines"), _reglage("conseils_generaux"),
+        bmr, tdee, macros, macros_pdj, macros_collation,
+        equiv_dej_proteines, equiv_dej_feculents, equiv_dej_legumes, equiv_dej_mg,
+        equiv_din_proteines, equiv_din_feculents, equiv_din_mg, equiv_legumineuses, equiv_laitiers,
+        repas_macros, fourni, cibles, couples, journee, solution,
+        simulation_jours, simulation_resume, semaine,
+        payload, apercu,
+    )
+}
+
+
+class ProgrammeGraph(Graph):
+    """Graphe de l'onglet Programme (un par session Streamlit)."""
+
+    def __init__(self):
+        super().__init__(NODES, INPUTS)
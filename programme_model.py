@@ -0,0 +1,305 @@
+"""
+Modèle du document — NutriSolver
+
+Le payload construit par l'onglet Programme est découpé en sections
+(SECTIONS), chacune décrite par une liste de blocs indépendants du format
+de sortie. pdf_generator dessine ces blocs dans le PDF, html_preview les
+traduit en HTML pour l'aperçu de l'application : les deux sorties lisent
+le même modèle et affichent donc les mêmes textes et les mêmes tableaux.
+
+Blocs (tuples, premier élément = type) :
+    ("couverture", titre, patient, infos, date)
+    ("section", titre)              bandeau vert
+    ("sous_titre", titre)
+    ("texte", texte)
+    ("puces", [textes])             cf. puce()
+    ("options", [textes], prefixe)  liste numérotée « Option 1 »...
+    ("alternatives", [textes])      séparés par « OU »
+    ("encadre", texte)
+    ("tableau", titre, entetes, lignes, largeurs)
+        largeurs : colonnes du PDF en mm, élargies si le contenu déborde
+        (proportions pour le HTML)
+    ("espace", mm)                  espacement vertical propre au PDF
+"""
+
+from datetime import datetime
+
+
+def puce(item):
+    """Texte d'un élément de liste à puces (sans le tiret éventuel)."""
+    txt = item.strip()
+    if txt.startswith("- "):
+        txt = txt[2:]
+    return txt
+
+
+# --- Tableaux ---
+
+def equivalence_table(title, equivalences):
+    """Bloc tableau d'équivalences (Aliment / Poids / Kcal), None si vide."""
+    if not equivalences:
+        return None
+    lignes = [[row["nom"], f"{row['poids_g']}g", f"{row['kcal']}"] for row in equivalences]
+    return ("tableau", title, ["Aliment", "Poids (g)", "Kcal"], lignes, [90, 45, 35])
+
+
+def protein_equivalence_table(title, items):
+    """Bloc tableau protéines, catégorie affichée sur sa première ligne seulement."""
+    if not items:
+        return None
+    lignes = []
+    current_cat = None
+    for row in items:
+        cat = row.get("categorie", "")
+        lignes.append([cat if cat != current_cat else "", f"{row.get('nom', '')}",
+                       f"{row.get('poids', '')}", f"{row.get('kcal', 0)}"])
+        current_cat = cat
+    return ("tableau", title, ["Categorie", "Aliment", "Poids", "Kcal"], lignes, [45, 65, 40, 30])
+
+
+def macros_table(macros, poids_kg=None):
+    """Bloc tableau des objectifs macro-nutriments (grammes + % kcal + kcal)."""
+    if not macros:
+        return None
+    ratios = macros.get("ratios", {})
+    subtitle = "OBJECTIFS MACRO-NUTRIMENTS"
+    if poids_kg and ratios.get("proteines_g_par_kg"):
+        subtitle += (
+            f" ({poids_kg:.0f} kg x {ratios.get('proteines_g_par_kg', 1.3):.2f} g/kg prot, "
+            f"{int(ratios.get('lipides_pct', 30))}% lip)"
+        )
+    lignes = []
+    for label, key in [("Proteines", "proteines"), ("Lipides", "lipides"), ("Glucides", "glucides")]:
+        row = macros.get(key, {})
+        lignes.append([label, f"{row.get('g', 0):.1f} g", f"{row.get('pct', 0):.1f} %", f"{row.get('kcal', 0)}"])
+    return ("tableau", subtitle, ["Macro", "Grammes", "% kcal", "Kcal"], lignes, [55, 40, 40, 35])
+
+
+def _sans_vides(blocs):
+    return [b for b in blocs if b is not None]
+
+
+# =============================================
+# Sections du programme
+# =============================================
+# Chaque section commence sur une nouvelle page (PDF) et ne lit que ses
+# entrées, extraites du payload par SECTIONS.
+
+def section_couverture(e):
+    """PAGE 1 : Couverture + Objectifs + PDJ"""
+    return _sans_vides([
+        ("couverture", "PROGRAMME ALIMENTAIRE", e["client_ref"],
+         f"Formule : {e['formule_bmr']}  |  BMR : {int(e['bmr'])} kcal  |  TDEE : {int(e['tdee'])} kcal",
+         f"Genere le {e['date']}"),
+        ("section", "OBJECTIFS"),
+        ("puces", [f"- {o}" for o in e["objectifs"]]),
+        macros_table(e["macros"], poids_kg=e["poids_kg"]),
+        ("section", "PETIT-DEJEUNER"),
+        ("options", list(e["pdj_options"]), "Option") if e["pdj_options"] else None,
+        ("encadre", "Ces options peuvent etre a emporter. Les options \"plaisir\" doivent etre occasionnelles."),
+        ("sous_titre", "Reperes pain :"),
+        ("texte", "50g de pain frais = 2 petites tranches = 1 grande tranche = 1/5 baguette = 2 biscottes"),
+    ])
+
+
+def _proteines_titre(prot):
+    return (f"Proteines - {prot.get('portion_viande_g', 125)}g viande OU "
+            f"{prot.get('portion_poisson_g', 150)}g poisson OU {prot.get('portion_oeufs', 3)} oeufs")
+
+
+def _matieres_grasses(mg):
+    if mg.get("equivalences"):
+        return [equivalence_table(f"Matieres Grasses - portion : {mg.get('portion_g', 10)}g huile",
+                                  mg["equivalences"])]
+    return [("sous_titre", "Matieres Grasses"),
+            ("texte", f"{mg.get('portion_g', 10)}g d'huile pour la cuisson ou l'assaisonnement.")]
+
+
+def section_dejeuner(dejeuner):
+    """PAGE 2 : Déjeuner"""
+    prot = dejeuner.get("proteines", {})
+    fec = dejeuner.get("feculents", {})
+    leg = dejeuner.get("legumes", {})
+    mg = dejeuner.get("matieres_grasses", {})
+    return _sans_vides([
+        ("section", "DEJEUNER"),
+        ("texte", "Composez votre assiette avec UN des composants de chaque groupe alimentaire :"),
+        protein_equivalence_table(_proteines_titre(prot), prot.get("equivalences_par_categorie", [])),
+        equivalence_table(f"Feculents - portion : {fec.get('portion_g', 150)}g CUITS", fec.get("equivalences", [])),
+        ("sous_titre", f"Legumes - {leg.get('portion_cuits_g', 200)}g cuits et/ou {leg.get('portion_crudites_g', 150)}g crudites"),
+        equivalence_table("", leg["equivalences"]) if leg.get("equivalences") else
+        ("texte", "150-200g legumes cuits (1/2 assiette) ou 100-150g crudites ou 250-300ml soupe de legumes"),
+        *_matieres_grasses(mg),
+        ("texte", "Varier vos huiles (olive, colza, coco, noix, noisette...)."),
+        ("sous_titre", "Dessert"),
+        ("texte", dejeuner.get("dessert", "+ 1 fruit")),
+    ])
+
+
+def section_collation(collation_options):
+    """PAGE 3 : Collation"""
+    return _sans_vides([
+        ("section", "COLLATION - APRES-MIDI"),
+        ("alternatives", list(collation_options)) if collation_options else None,
+        ("encadre", "Accompagner d'une boisson chaude (the, tisane sans sucre) ou d'eau."),
+        ("espace", 2),
+        ("texte", "Rappel : si consommation de produits sucres (biscuits, gateaux, chocolat), "
+                  "toujours accompagner d'1 poignee d'oleagineux ou 1 fromage blanc."),
+    ])
+
+
+def section_diner(diner):
+    """PAGE 4 : Dîner"""
+    prot = diner.get("proteines", {})
+    fec = diner.get("feculents", {})
+    leg = diner.get("legumes", {})
+    mg = diner.get("matieres_grasses", {})
+    return _sans_vides([
+        ("section", "DINER"),
+        ("texte", "Composez votre assiette avec UN des composants de chaque groupe alimentaire :"),
+        protein_equivalence_table(_proteines_titre(prot), prot.get("equivalences_par_categorie", [])),
+        equivalence_table(f"Feculents - portion : {fec.get('portion_g', 150)}g CUITS", fec.get("equivalences", [])),
+        ("sous_titre", f"Legumes - {leg.get('portion_cuits_g', 200)}g cuits / {leg.get('portion_crudites_g', 150)}g crudites / 250-300ml soupe"),
+        *_matieres_grasses(mg),
+        ("sous_titre", "Dessert"),
+        ("texte", diner.get("dessert", "100g fromage blanc/Skyr/yaourt grecque")),
+    ])
+
+
+def section_repartition(_):
+    """PAGE 5 : Répartition assiette (statique)"""
+    return [
+        ("section", "REPARTITION DE L'ASSIETTE"),
+        ("espace", 4),
+        ("texte", "Partagez votre assiette en 3 :"),
+        ("espace", 2),
+        ("sous_titre", "Option 1"),
+        ("puces", ["- 1/2 assiette : Legumes", "- 1/4 assiette : Feculents",
+                   "- 1/4 assiette : Proteines animales ou vegetales"]),
+        ("sous_titre", "Option 2"),
+        ("puces", ["- 1/3 assiette : Legumes", "- 1/3 assiette : Feculents",
+                   "- 1/3 assiette : Proteines animales ou vegetales"]),
+    ]
+
+
+def section_hydratation(e):
+    """PAGE 6 : Hydratation + Légumineuses"""
+    hydratation = e["hydratation"]
+    return _sans_vides([
+        ("section", "HYDRATATION"),
+        ("puces", [
+            "- Repartir la consommation tout au long de la journee. Min. 8 verres (250ml) d'eau par jour.",
+            f"- Repartition suggeree : {hydratation.get('repartition', '')}",
+            f"- Limiter la consommation de cafe et the noir a {hydratation.get('max_cafe_the', 3)} tasses par jour. Privilegier les tisanes.",
+            f"- Objectif : Boire au moins {hydratation.get('objectif_litres', 1.5)}-2L par jour",
+        ]),
+        ("section", "LEGUMINEUSES"),
+        equivalence_table("Equivalences legumineuses", e["legumineuses"]),
+        ("texte", "Haricots secs (rouge, blanc, coco, noir...), Lentilles (corail, vert, beluga...), "
+                  "Pois chiches, Feves, Pois casses, Flageolets, Edamame."),
+        ("encadre", "Bien les tremper si secs (min 8h). En conserve, bien les rincer avant consommation."),
+    ])
+
+
+def section_oleagineux(_):
+    """PAGE 7 : Oléagineux + Graines (statique)"""
+    return [
+        ("section", "FRUITS A COQUE / OLEAGINEUX (grilles, sans sel)"),
+        ("texte", "Amande, Noix, Noix de pecan, Noisette, Noix de macadamia, Pistache, "
+                  "Noix de cajou, Noix de Bresil, Chataigne"),
+        ("section", "GRAINES"),
+        ("texte", "Tournesol, Courge, Lin (broye avant de consommer), Chia, Chanvre"),
+    ]
+
+
+def section_fruits(_):
+    """PAGE 8 : Fruits (statique)"""
+    return [
+        ("section", "FRUITS"),
+        ("sous_titre", "Equivalences : 1 fruit = environ 100g"),
+        ("texte",
+         "100g compote sans sucres ajoutes, 1 pomme, 1 poire, 1 banane, 2 clementines, "
+         "2 mandarines, 1 orange, 1 pamplemousse, 10-15 raisins, 3 abricots (petits), "
+         "2 dattes, 1 peche, 1 nectarine, 2 kiwis (petit), 2 poignees de myrtilles (20), "
+         "7-8 fraises, 10-15 framboises, 1/4 ananas, 1/2 mangue, 1 belle tranche de pasteque, "
+         "2-3 figues, 2-3 prunes, 1/4 melon (grand) ou 1/2 melon (petit), 15 cerises, 3-4 quetsches"),
+        ("espace", 2),
+        ("encadre", "Pour les fruits seches : meme quantite en frais que seche. "
+                    "Ex. 2-3 abricots frais = 2-3 abricots seches."),
+    ]
+
+
+def section_conseils(e):
+    """PAGE 9-10 : Conseils Généraux"""
+    conseils = e["conseils_generaux"]
+    if isinstance(conseils, str):
+        conseils = [l.strip() for l in conseils.split("\n") if l.strip()]
+    freq = e["frequences_proteines"]
+    freq_items = [
+        ["Viandes blanches", freq.get("viandes_blanches", "5 fois/semaine")],
+        ["Viandes rouges", freq.get("viandes_rouges", "max 2 fois/semaine")],
+        ["Poissons", freq.get("poissons", "2-3 fois/semaine")],
+        ["Oeufs", freq.get("oeufs", "min 3-4 fois/semaine")],
+        ["Vegetarien", freq.get("vegetarien", "min 3-4 fois/semaine")],
+    ]
+    return _sans_vides([
+        ("section", "CONSEILS GENERAUX"),
+        ("puces", list(conseils)) if isinstance(conseils, list) else None,
+        ("section", "FREQUENCES DES PROTEINES AU REPAS"),
+        ("tableau", None, ["Type", "Frequence"], freq_items, [60, 60]),
+        ("espace", 2),
+        ("sous_titre", "MATIERES GRASSES"),
+        ("puces", [
+            "- Varier vos huiles vegetales",
+            "- Ne pas cuire le beurre et la margarine",
+            "- Cuisson : huile d'olive, huile de coco, huile de sesame, huile d'avocat, ghee",
+            "- Assaisonnement : huile de colza, huile de lin, huile de noix, huile de pepins de raisin",
+        ]),
+        ("sous_titre", "EXTRAS"),
+        ("puces", [
+            "- Limiter a 1 produit gras/frit 2-3 fois par semaine",
+            "- Limiter a 2-3 produits sucres par semaine",
+            "- 1 carre de chocolat noir par jour autorise (collation ou apres repas)",
+            "- Limiter boissons sucrees/gazeuses a 2 fois/semaine",
+            "- Limiter restaurants et plats livres a 2 fois par semaine",
+            "- Si dessert patisserie : reduire de ~50g les feculents cuits",
+        ]),
+        ("sous_titre", "CONDIMENTS"),
+        ("texte", "Pas de regles specifiques. Variez vos epices. "
+                  "Vinaigrette maison : 1 cas huile pour 2 cas vinaigre + assaisonnements."),
+    ])
+
+
+# (nom, entrées lues dans le payload, blocs) dans l'ordre du document
+SECTIONS = [
+    ("couverture", lambda data: {
+        "client_ref": data.get("client_ref", "Patient"),
+        "formule_bmr": data.get("formule_bmr", "Harris-Benedict"),
+        "bmr": data.get("bmr", 0),
+        "tdee": data.get("tdee", 0),
+        "date": datetime.now().strftime('%d/%m/%Y'),
+        "objectifs": data.get("objectifs", []),
+        "macros": data.get("macros"),
+        "poids_kg": data.get("poids_kg"),
+        "pdj_options": data.get("petit_dejeuner", {}).get("options", []),
+    }, section_couverture),
+    ("dejeuner", lambda data: data.get("dejeuner", {}), section_dejeuner),
+    ("collation", lambda data: data.get("collation", {}).get("options", []), section_collation),
+    ("diner", lambda data: data.get("diner", {}), section_diner),
+    ("repartition", lambda data: None, section_repartition),
+    ("hydratation", lambda data: {
+        "hydratation": data.get("hydratation", {}),
+        "legumineuses": data.get("listes_reference", {}).get("legumineuses", []),
+    }, section_hydratation),
+    ("oleagineux", lambda data: None, section_oleagineux),
+    ("fruits", lambda data: None, section_fruits),
+    ("conseils", lambda data: {
+        "conseils_generaux": data.get("conseils_generaux", ""),
+        "frequences_proteines": data.get("frequences_proteines", {}),
+    }, section_conseils),
+]
+
+
+def sections(data):
+    """[(nom, blocs)] du document, dans l'ordre, pour un payload."""
+    return [(nom, construire(entrees(data))) for nom, entrees, construire in SECTIONS]
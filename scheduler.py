@@ -0,0 +1,293 @@
+"""
+Planificateur de semaine — NutriSolver
+
+Affecte une protéine de PROTEINES_BY_CATEGORY à chacun des 14 repas de la
+semaine (déjeuner et dîner, 7 jours) en respectant, comme contraintes dures :
+  - les fréquences de settings["frequences_proteines"] ("max 2 fois/semaine",
+    "2-3 fois/semaine dont poissons gras 2 fois", "min 3-4 fois/semaine"...) ;
+  - des limites journalières sur les deux portions de protéines du jour
+    (protéines minimum, kcal maximum), dérivées des cibles macros ;
+  - pas deux fois le même aliment le même jour.
+
+Recherche par retour arrière (backtracking) avec propagation sur les
+compteurs : une affectation est refusée dès qu'un maximum est dépassé ou que
+les minimums restants ne tiennent plus dans les repas restants. L'ordre des
+valeurs est tiré au hasard (graine reproductible), les classes sous leur
+minimum en premier, avec redémarrage si un essai s'enlise ; les jours sont
+ensuite mélangés. Chaque tirage donne une semaine différente
+(`python benchmark.py semaines` mesure le débit).
+"""
+
+import random
+import re
+
+import data_manager
+
+JOURS = ("Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche")
+REPAS = ("dejeuner", "diner")
+
+# Classe de fréquence de chaque aliment (clés de frequences_proteines) ;
+# à défaut, celle de sa catégorie.
+CLASSE_PAR_CATEGORIE = {
+    "Viandes": "viandes_blanches",
+    "Poissons & fruits de mer": "poissons",
+    "Œufs": "oeufs",
+    "Végétarien": "vegetarien",
+}
+CLASSE_PAR_ALIMENT = {
+    "Bœuf (5% MG)": "viandes_rouges",
+    "Veau": "viandes_rouges",
+}
+# Sous-classe utilisée par "dont poissons gras N fois"
+POISSONS_GRAS = {"Saumon", "Maquereau"}
+
+# Part des cibles journalières apportée au plus / au moins par les deux
+# portions de protéines du jour (déjeuner + dîner)
+DEFAULT_PART_PROT_MIN = 0.25
+DEFAULT_PART_KCAL_MAX = 0.35
+
+# Retour arrière avec redémarrages : chaque essai est abandonné au-delà de
+# NOEUDS_PAR_ESSAI affectations et repart d'un autre tirage.
+NOEUDS_PAR_ESSAI = 200
+MAX_REDEMARRAGES = 50
+
+
+def parse_frequency(texte):
+    """
+    Lit une fréquence hebdomadaire en (min, max), max None si non borné :
+      "5 fois/semaine"      -> (5, 5)
+      "max 2 fois/semaine"  -> (0, 2)
+      "2-3 fois/semaine"    -> (2, 3)
+      "min 3-4 fois/semaine"-> (3, None)
+    Retourne None si le texte n'est pas compris.
+    """
+    m = re.search(r"(max|min)?\s*(\d+)\s*(?:-\s*(\d+))?\s*fois", (texte or "").lower())
+    if not m:
+        return None
+    borne, a, b = m.group(1), int(m.group(2)), m.group(3)
+    if borne == "max":
+        return (0, int(b) if b else a)
+    if borne == "min":
+        return (a, None)
+    return (a, int(b) if b else a)
+
+
+def parse_frequences(frequences):
+    """
+    {classe: texte} -> {classe: (min, max)}, avec les sous-clauses
+    "dont poissons gras N fois" sous la clé "poissons_gras".
+    """
+    out = {}
+    for classe, texte in (frequences or {}).items():
+        principal, _, dont = str(texte).partition("dont")
+        freq = parse_frequency(principal)
+        if freq is None:
+            print(f"Fréquence ignorée ({classe}) : {texte!r}")
+            continue
+        out[classe] = freq
+        if dont and "gras" in dont and classe == "poissons":
+            sous = parse_frequency(dont)
+            if sous is not None:
+                out["poissons_gras"] = sous
+    return out
+
+
+def daily_limits(macros, part_prot_min=DEFAULT_PART_PROT_MIN, part_kcal_max=DEFAULT_PART_KCAL_MAX):
+    """Limites (prot_min_g, kcal_max) des deux portions de protéines d'une journée."""
+    kcal = sum(macros[k]["kcal"] for k in ("proteines", "lipides", "glucides"))
+    return macros["proteines"]["g"] * part_prot_min, kcal * part_kcal_max
+
+
+def _aliments():
+    """Aliments de PROTEINES_BY_CATEGORY avec leurs classes de fréquence."""
+    out = []
+    for cat in data_manager.PROTEINES_BY_CATEGORY:
+        for aliment in cat["aliments"]:
+            classe = CLASSE_PAR_ALIMENT.get(aliment["nom"], CLASSE_PAR_CATEGORIE.get(cat["categorie"]))
+            classes = {classe}
+            if aliment["nom"] in POISSONS_GRAS:
+                classes.add("poissons_gras")
+            out.append({**aliment, "categorie": cat["categorie"],
+                        "portion_source": cat["portion_source"], "classes": classes})
+    return out
+
+
+def _apport(aliment, portions):
+    """(portion affichée, prot, kcal) d'un aliment pour les portions d'un repas."""
+    portion = portions.get(aliment["portion_source"], 0) or 0
+    if "kcal_unit" in aliment:
+        return portion, aliment.get("prot_unit", 0.0) * portion, aliment["kcal_unit"] * portion
+    return portion, aliment.get("prot_100g", 0.0) * portion / 100, aliment["kcal_100g"] * portion / 100
+
+
+class WeeklyScheduler:
+    """
+    Générateur de semaines valides.
+
+    Args:
+        frequences: settings["frequences_proteines"] (textes) ou déjà lues
+            {classe: (min, max)}.
+        portions: {"dejeuner": {"viande": g, "poisson": g, "oeufs": n}, "diner": {...}}.
+        limites_jour: (prot_min_g, kcal_max) pour les deux portions du jour,
+            cf. daily_limits ; None pour ne pas contraindre.
+        seed: graine du tirage (mêmes arguments + même graine = mêmes semaines).
+    """
+
+    def __init__(self, frequences=None, portions=None, limites_jour=None, seed=None):
+        if frequences is None:
+            frequences = data_manager.DEFAULT_SETTINGS["frequences_proteines"]
+        if any(isinstance(v, str) for v in frequences.values()):
+            frequences = parse_frequences(frequences)
+        portions = portions or {}
+        self.aliments = _aliments()
+        self.rng = random.Random(seed)
+        n = len(self.aliments)
+
+        # Contraintes de comptage : (classe, membres, min, max)
+        self.contraintes = []
+        for classe, (lo, hi) in frequences.items():
+            membres = frozenset(i for i, a in enumerate(self.aliments) if classe in a["classes"])
+            if membres:
+                self.contraintes.append((classe, membres, lo, 14 if hi is None else hi))
+        # Sous-classes (ex. poissons gras) : rattachées à la classe qui les contient.
+        # Les classes principales sont disjointes : leurs minimums s'additionnent.
+        self.parent = {}
+        for k, (_, membres, _, _) in enumerate(self.contraintes):
+            for j, (_, autres, _, _) in enumerate(self.contraintes):
+                if j != k and membres < autres:
+                    self.parent[k] = j
+        self.principales = [k for k in range(len(self.contraintes)) if k not in self.parent]
+        self.par_aliment = [
+            [k for k, (_, membres, _, _) in enumerate(self.contraintes) if i in membres] for i in range(n)
+        ]
+
+        self.portions, self.prot, self.kcal = {}, {}, {}
+        for repas in REPAS:
+            source = {"viande": 125, "poisson": 150, "oeufs": 3, **portions.get(repas, {})}
+            apports = [_apport(a, source) for a in self.aliments]
+            self.portions[repas] = [p for p, _, _ in apports]
+            self.prot[repas] = [pr for _, pr, _ in apports]
+            self.kcal[repas] = [k for _, _, k in apports]
+        self.prot_min, self.kcal_max = limites_jour if limites_jour else (0.0, float("inf"))
+        self._best_prot_diner = max(self.prot["diner"])
+        self._least_kcal_diner = min(self.kcal["diner"])
+
+    def _solve(self):
+        """
+        Une semaine (14 indices d'aliments), ou None si aucune n'est trouvée
+        en MAX_REDEMARRAGES essais (contraintes irréalisables).
+        """
+        for _ in range(MAX_REDEMARRAGES):
+            week = self._descente(NOEUDS_PAR_ESSAI)
+            if week is not None:
+                # Les jours sont interchangeables : on les mélange
+                jours = list(range(7))
+                self.rng.shuffle(jours)
+                return [a for j in jours for a in week[2 * j:2 * j + 2]]
+        return None
+
+    def _descente(self, max_noeuds):
+        """Retour arrière aléatoire, abandonné au-delà de max_noeuds affectations."""
+        contraintes, parent = self.contraintes, self.parent
+        counts = [0] * len(contraintes)
+        week = []
+        order = list(range(len(self.aliments)))
+        noeuds = [0]
+        rng = self.rng
+
+        def manques():
+            # Minimums restants, en comptant ceux des sous-classes dans leur parent
+            # (None si une sous-classe ne tient plus dans le maximum du parent)
+            manque = {k: max(0, contraintes[k][2] - counts[k]) for k in self.principales}
+            for s, p in parent.items():
+                besoin = max(0, contraintes[s][2] - counts[s])
+                if counts[p] + besoin > contraintes[p][3]:
+                    return None
+                manque[p] = max(manque[p], besoin)
+            return manque
+
+        def place(slot):
+            if slot == 14:
+                return True
+            noeuds[0] += 1
+            if noeuds[0] > max_noeuds:
+                return False
+            repas = REPAS[slot % 2]
+            # Aliments des classes encore sous leur minimum d'abord, au hasard
+            besoin = {k for k in range(len(counts)) if counts[k] < contraintes[k][2]}
+            candidats = sorted(order, key=lambda a: (not besoin.intersection(self.par_aliment[a]), rng.random()))
+            for a in candidats:
+                prot, kcal = self.prot[repas][a], self.kcal[repas][a]
+                if repas == "dejeuner":
+                    # Le dîner doit pouvoir compléter la journée
+                    if prot + self._best_prot_diner < self.prot_min or kcal + self._least_kcal_diner > self.kcal_max:
+                        continue
+                else:
+                    midi = week[-1]
+                    if a == midi:
+                        continue
+                    if (self.prot["dejeuner"][midi] + prot < self.prot_min
+                            or self.kcal["dejeuner"][midi] + kcal > self.kcal_max):
+                        continue
+                ks = self.par_aliment[a]
+                if any(counts[k] >= contraintes[k][3] for k in ks):
+                    continue
+                for k in ks:
+                    counts[k] += 1
+                manque = manques()
+                if manque is not None and sum(manque.values()) <= 13 - slot:
+                    week.append(a)
+                    if place(slot + 1):
+                        return True
+                    week.pop()
+                for k in ks:
+                    counts[k] -= 1
+            return False
+
+        return week if place(0) else None
+
+    def week(self):
+        """Une semaine valide (liste de 14 repas, cf. _repas) ou None."""
+        indices = self._solve()
+        return None if indices is None else self._decode(indices)
+
+    def weeks(self, n, max_essais=None):
+        """Jusqu'à n semaines valides distinctes (générateur)."""
+        vues = set()
+        for _ in range(max_essais or 20 * n):
+            if len(vues) >= n:
+                return
+            indices = self._solve()
+            if indices is None:
+                return
+            cle = tuple(indices)
+            if cle not in vues:
+                vues.add(cle)
+                yield self._decode(indices)
+
+    def _decode(self, indices):
+        out = []
+        for slot, a in enumerate(indices):
+            repas = REPAS[slot % 2]
+            aliment = self.aliments[a]
+            out.append({
+                "jour": JOURS[slot // 2],
+                "repas": repas,
+                "categorie": aliment["categorie"],
+                "aliment": aliment["nom"],
+                "classe": next(c for c in aliment["classes"] if c != "poissons_gras"),
+                "portion": self.portions[repas][a],
+                "prot": round(self.prot[repas][a], 1),
+                "kcal": round(self.kcal[repas][a]),
+            })
+        return out
+
+
+def generate_weeks(n=1, frequences=None, portions=None, macros=None, seed=None):
+    """
+    Raccourci : n semaines distinctes pour des fréquences (textes de
+    settings), des portions par repas et les cibles de compute_macros_targets
+    (limites journalières via daily_limits ; None pour ne pas les appliquer).
+    """
+    limites = daily_limits(macros) if macros else None
+    return list(WeeklyScheduler(frequences, portions, limites, seed).weeks(n))
@@ -0,0 +1,161 @@
+"""
+Simulation d'adhérence — NutriSolver
+
+À chaque repas, le patient choisit librement un aliment dans chaque table
+d'équivalences (protéines, féculents, légumes, matières grasses, dessert),
+ainsi qu'une option de petit-déjeuner et de collation. Les protéines ne sont
+pas iso-caloriques (Saumon 208 kcal/100 g contre Cabillaud 80) : la journée
+réellement consommée s'écarte donc des cibles selon les choix.
+
+simulate_days tire ces choix au hasard (uniformément dans chaque table, ou
+selon des préférences) pour des milliers de journées d'un coup : chaque
+table est une matrice (aliments x macros), une journée est la somme des
+lignes tirées. summarize compare la distribution aux cibles de
+compute_macros_targets (moyenne, p5, p95, probabilité de dépasser le plafond
+de lipides...). 100 000 journées se simulent en quelques dizaines de ms.
+"""
+
+import numpy as np
+
+import data_manager
+import option_parser
+
+MACROS = ("prot", "carb", "lip", "kcal")
+LIPIDES_PLAFOND_PCT = 34
+JOURS_SEMAINE = 7
+
+
+def _group_items(groupe, portion_g):
+    """
+    (noms, macros (n, 4)) de la table d'équivalences d'un groupe : kcal de
+    generate_equivalences, répartis selon le profil macro de la référence
+    (seules les kcal des alternatives sont connues).
+    """
+    g = data_manager.EQUIVALENCES[groupe]
+    noms, ref_kcal, _, kcal = data_manager.equivalence_arrays(groupe, [portion_g])
+    kcal = np.concatenate([ref_kcal, kcal[0]]).astype(np.float64)
+    profil = g.get("ref_macros_100g", {})
+    par_kcal = np.array([profil.get(m, 0.0) / g["ref_kcal_100g"] for m in MACROS[:3]])
+    macros = np.column_stack([kcal[:, None] * par_kcal[None, :], kcal])
+    return [f"{g['ref_aliment']} (réf.)"] + list(noms), macros
+
+
+def _protein_items(portion_viande_g, portion_poisson_g, portion_oeufs_n):
+    """
+    (noms, macros (n, 4)) de PROTEINES_BY_CATEGORY aux portions prescrites.
+    Glucides négligés ; lipides déduits de l'énergie : (kcal - 4 prot) / 9.
+    """
+    portions = {"viande": portion_viande_g, "poisson": portion_poisson_g, "oeufs": portion_oeufs_n}
+    noms, rows = [], []
+    for cat in data_manager.PROTEINES_BY_CATEGORY:
+        portion = portions.get(cat["portion_source"], 0) or 0
+        for aliment in cat["aliments"]:
+            if "kcal_unit" in aliment:
+                kcal = aliment["kcal_unit"] * portion
+                prot = aliment.get("prot_unit", 0.0) * portion
+            else:
+                kcal = aliment["kcal_100g"] * portion / 100
+                prot = aliment.get("prot_100g", 0.0) * portion / 100
+            noms.append(aliment["nom"])
+            rows.append((prot, 0.0, max(0.0, (kcal - 4 * prot) / 9), kcal))
+    return noms, np.array(rows, dtype=np.float64)
+
+
+def _option_items(options, food_db=None):
+    """(options, macros (n, 4)) des options PDJ / collation (option_parser)."""
+    macros = [option_parser.option_macros(o, food_db) for o in options]
+    return list(options), np.array([[m[k] for k in MACROS] for m in macros], dtype=np.float64).reshape(-1, 4)
+
+
+def choice_tables(dejeuner, diner, portion_fruit_g=100, portion_laitier_g=100,
+                  options_pdj=None, options_collation=None, food_db=None):
+    """
+    Tables de choix d'une journée : {slot: (noms, macros (n, 4))}.
+
+    Args:
+        dejeuner, diner: {"viande", "poisson", "oeufs", "feculents", "legumes",
+            "matieres_grasses"} — portions prescrites (g ; œufs en unités).
+        portion_fruit_g, portion_laitier_g: desserts (fruit au déjeuner,
+            laitier au dîner), comme estimate_programme_macros.
+        options_pdj, options_collation: textes des options (None : non simulés).
+    """
+    tables = {}
+    for repas, p in (("dejeuner", dejeuner), ("diner", diner)):
+        tables[f"{repas}_proteines"] = _protein_items(p.get("viande", 0), p.get("poisson", 0), p.get("oeufs", 0))
+        tables[f"{repas}_feculents"] = _group_items("Féculents", p.get("feculents", 0))
+        tables[f"{repas}_legumes"] = _group_items("Légumes", p.get("legumes", 0))
+        tables[f"{repas}_matieres_grasses"] = _group_items("Matières Grasses", p.get("matieres_grasses", 0))
+    tables["dejeuner_dessert"] = _group_items("Fruits", portion_fruit_g)
+    tables["diner_dessert"] = _group_items("Produits Laitiers", portion_laitier_g)
+    if options_pdj:
+        tables["pdj"] = _option_items(options_pdj, food_db)
+    if options_collation:
+        tables["collation"] = _option_items(options_collation, food_db)
+    return tables
+
+
+def simulate_days(tables, n_days=100_000, seed=None, preferences=None):
+    """
+    Tire n_days journées de choix indépendants.
+
+    Args:
+        tables: choice_tables(...).
+        preferences: {slot: poids par aliment} (défaut : choix uniforme).
+
+    Returns:
+        Tableau (n_days, 4) des apports journaliers (prot, carb, lip, kcal).
+    """
+    rng = np.random.default_rng(seed)
+    total = np.zeros((n_days, len(MACROS)))
+    for slot, (_, macros) in tables.items():
+        if not len(macros):
+            continue
+        p = (preferences or {}).get(slot)
+        if p is None:
+            idx = rng.integers(0, len(macros), n_days)
+        else:
+            p = np.asarray(p, dtype=np.float64)
+            idx = rng.choice(len(macros), size=n_days, p=p / p.sum())
+        total += macros[idx]
+    return total
+
+
+def summarize(days, macros_targets):
+    """
+    Distribution des journées simulées face aux cibles de compute_macros_targets.
+
+    Returns:
+        {"macros": {m: {cible, moyenne, p5, p50, p95}}, "p_lipides_plafond",
+         "p_glucides_plancher", "p_kcal_depasse", "p_semaine_lipides_plafond",
+         "n_jours"} — probabilités par journée, et pour la moyenne d'une
+        semaine de 7 journées.
+    """
+    cibles = {
+        "prot": macros_targets["proteines"]["g"],
+        "carb": macros_targets["glucides"]["g"],
+        "lip": macros_targets["lipides"]["g"],
+        "kcal": sum(macros_targets[k]["kcal"] for k in ("proteines", "glucides", "lipides")),
+    }
+    glu_min = float(macros_targets.get("ratios", {}).get("glucides_pct_min", 40))
+    p5, p50, p95 = np.percentile(days, [5, 50, 95], axis=0)
+    stats = {
+        m: {"cible": round(float(cibles[m]), 1), "moyenne": round(float(days[:, i].mean()), 1),
+            "p5": round(float(p5[i]), 1), "p50": round(float(p50[i]), 1), "p95": round(float(p95[i]), 1)}
+        for i, m in enumerate(MACROS)
+    }
+
+    def _parts(a):
+        kcal = np.maximum(a[..., 3], 1e-9)
+        return a[..., 2] * 9 / kcal * 100, a[..., 1] * 4 / kcal * 100
+
+    lip_pct, glu_pct = _parts(days)
+    semaines = days[: len(days) // JOURS_SEMAINE * JOURS_SEMAINE].reshape(-1, JOURS_SEMAINE, len(MACROS))
+    lip_semaine, _ = _parts(semaines.sum(axis=1))
+    return {
+        "macros": stats,
+        "p_lipides_plafond": float((lip_pct > LIPIDES_PLAFOND_PCT).mean()),
+        "p_glucides_plancher": float((glu_pct < glu_min).mean()),
+        "p_kcal_depasse": float((days[:, 3] > cibles["kcal"]).mean()),
+        "p_semaine_lipides_plafond": float((lip_semaine > LIPIDES_PLAFOND_PCT).mean()) if len(semaines) else 0.0,
+        "n_jours": len(days),
+    }
@@ -0,0 +1,549 @@
+"""
+Solveur de portions — NutriSolver
+
+Calcule les portions du déjeuner et du dîner (protéines, féculents, légumes,
+matières grasses) qui rapprochent le plus les macros fournies des cibles de
+compute_macros_targets, dans les bornes fixées par la praticienne.
+
+Modèle :
+  - 8 variables (4 groupes x 2 repas), en grammes de l'aliment de référence
+    du groupe (EQUIVALENCES[...]["ref_macros_100g"]) ;
+  - desserts (fruit au déjeuner, laitier au dîner) comptés comme constantes,
+    comme dans estimate_programme_macros ;
+  - PDJ et collation ne sont pas modélisés : le déjeuner + dîner visent une
+    part `part_repas` des cibles journalières.
+
+Objectif (moindres carrés pondérés, donc programme quadratique) :
+    somme_k  w_k * ((fourni_k - part_repas * cible_k) / cible_k)^2
+  + reg * somme_i ((x_i - ref_i) / ref_i)^2
+sous contraintes de bornes. Le terme de régularisation départage les
+solutions équivalentes (kcal est quasi combinaison linéaire des macros) en
+restant près des portions de référence. Résolution exacte par ensemble actif
+(Lawson-Hanson généralisé aux bornes) : moins d'une milliseconde par patient.
+
+Portions servables (solve_portions_granular) : mêmes objectif et bornes, mais
+portions sur une grille (5 g de viande, 10 g de féculents, 1 g de matières
+grasses...) et limites cliniques (lipides <= 34 %, glucides >=
+plancher) imposées. Séparation et évaluation sur les totaux par groupe, sous
+un budget de temps (DEFAULT_BUDGET_MS) ; `python benchmark.py solveur` mesure
+la latence sur une grille de patients.
+"""
+
+import bisect
+import heapq
+import time
+
+import numpy as np
+import data_manager
+
+MACROS = ("prot", "carb", "lip", "kcal")
+REPAS = ("dejeuner", "diner")
+GROUPES = {
+    "proteines": "Protéines",
+    "feculents": "Féculents",
+    "legumes": "Légumes",
+    "matieres_grasses": "Matières Grasses",
+}
+VARIABLES = [(repas, groupe) for repas in REPAS for groupe in GROUPES]
+
+# Bornes par défaut (g) pour chaque groupe, identiques aux deux repas
+DEFAULT_BOUNDS = {g: tuple(b) for g, b in data_manager.DEFAULT_SETTINGS["bornes_portions"].items()}
+DEFAULT_WEIGHTS = {"prot": 4.0, "carb": 1.0, "lip": 2.0, "kcal": 2.0}
+DEFAULT_PART_REPAS = 0.65  # déj + dîner + desserts ≈ 65 % de la journée
+DEFAULT_REGULARISATION = 0.01
+
+# Granularité des portions (g), alignée sur les pas des champs de l'app.
+# La variable protéines est en grammes de viande de référence : le nombre
+# d'œufs (entier) reste un champ à part, hors du solveur.
+DEFAULT_STEPS = {"proteines": 5, "feculents": 10, "legumes": 10, "matieres_grasses": 1}
+# Limites cliniques vérifiées par compute_macros_targets
+LIPIDES_PLAFOND_PCT = 34
+DEFAULT_BUDGET_MS = 50
+# Écart relatif toléré entre solution et borne pour déclarer l'optimum. L'objectif
+# est une somme d'écarts relatifs au carré : 2 % dessus ~ 1 % sur les écarts.
+DEFAULT_GAP = 0.02
+NODE_DUAL_STEPS = 2  # pas de Newton dual par nœud (λ repris du parent)
+
+
+def _macro_matrix():
+    """Matrice (4 macros x 8 variables) : apport par gramme de chaque variable."""
+    cols = []
+    for _, groupe in VARIABLES:
+        m = data_manager._macros_for(GROUPES[groupe], 1.0)
+        cols.append([m[k] for k in MACROS])
+    return np.array(cols, dtype=np.float64).T
+
+
+def _desserts(portion_fruit_g, portion_laitier_g):
+    fruit = data_manager._macros_for("Fruits", portion_fruit_g)
+    laitier = data_manager._macros_for("Produits Laitiers", portion_laitier_g)
+    return np.array([fruit[k] + laitier[k] for k in MACROS], dtype=np.float64)
+
+
+def box_qp(H, c, lb, ub, x0=None, max_iter=100):
+    """
+    min ½ xᵀHx - cᵀx  sous  lb <= x <= ub, H définie positive
+    (méthode d'ensemble actif ; x0 : point de départ, ex. solution du parent).
+    """
+    x = np.clip(np.linalg.solve(H, c) if x0 is None else x0, lb, ub)
+    # -1 : bloquée en borne basse, +1 : en borne haute, 0 : libre
+    state = np.where(x <= lb, -1, np.where(x >= ub, 1, 0))
+    tol = 1e-10 * max(1.0, float(np.abs(c).max()))
+    for _ in range(max_iter):
+        # Minimisation sur les variables libres, sans quitter la boîte
+        while True:
+            free = state == 0
+            z = x.copy()
+            if free.any():
+                H_free = H[free]
+                rhs = c[free] - H_free[:, ~free] @ x[~free]
+                z[free] = np.linalg.solve(H_free[:, free], rhs)
+            viol = free & ((z < lb) | (z > ub))
+            if not viol.any():
+                x = z
+                break
+            # Avance vers z jusqu'à la première borne rencontrée, qui devient active
+            d = z - x
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = np.where(d < 0, (lb - x) / d, (ub - x) / d)
+            t = np.where(viol, t, np.inf)
+            j = int(np.argmin(t))
+            x = np.clip(x + min(max(t[j], 0.0), 1.0) * d, lb, ub)
+            x[j] = lb[j] if d[j] < 0 else ub[j]
+            state[j] = -1 if d[j] < 0 else 1
+
+        # Conditions KKT : libère la borne dont le gradient pousse vers l'intérieur
+        grad = H @ x - c
+        release = ((state == -1) & (grad < -tol)) | ((state == 1) & (grad > tol))
+        if not release.any():
+            return x
+        state[int(np.argmax(np.abs(grad) * release))] = 0
+    return x
+
+
+def bounded_least_squares(M, y, lb, ub, x0=None):
+    """
+    min ||M x - y||²  sous  lb <= x <= ub.
+    M doit être de rang plein en colonnes (garanti ici par la régularisation).
+    """
+    return box_qp(M.T @ M, M.T @ y, lb, ub, x0)
+
+
+def _bounds_vectors(bounds):
+    bounds = bounds or {}
+    lb, ub = [], []
+    for repas, groupe in VARIABLES:
+        b = bounds.get((repas, groupe), bounds.get(groupe, DEFAULT_BOUNDS[groupe]))
+        lb.append(float(b[0]))
+        ub.append(float(b[1]))
+    lb, ub = np.array(lb), np.array(ub)
+    if np.any(lb > ub):
+        raise ValueError("Bornes de portions incohérentes (min > max)")
+    return lb, ub
+
+
+def cibles_from_macros(macros):
+    """Cibles journalières {prot, carb, lip, kcal} depuis compute_macros_targets."""
+    return {
+        "prot": macros["proteines"]["g"],
+        "carb": macros["glucides"]["g"],
+        "lip": macros["lipides"]["g"],
+        "kcal": macros["proteines"]["kcal"] + macros["glucides"]["kcal"] + macros["lipides"]["kcal"],
+    }
+
+
+def _build_problem(macros, bounds, weights, reference, part_repas,
+                   portion_fruit_g, portion_laitier_g, regularisation):
+    """
+    Termes du problème : écarts macros ||Wa x - yw||² (pondérés, relatifs),
+    régularisation somme_i reg_i * (x_i - ref_i)², bornes lb <= x <= ub.
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    lb, ub = _bounds_vectors(bounds)
+    cibles = cibles_from_macros(macros)
+    objectif = np.array([cibles[k] * part_repas for k in MACROS], dtype=np.float64)
+    scale = np.where(objectif > 0, 1.0 / np.maximum(objectif, 1e-9), 0.0)
+    w = np.sqrt([weights[k] for k in MACROS]) * scale
+
+    reference = reference or {}
+    ref = np.array([
+        float(reference.get((repas, groupe), reference.get(groupe, (lb[i] + ub[i]) / 2)) or 1.0)
+        for i, (repas, groupe) in enumerate(VARIABLES)
+    ])
+    ref = np.maximum(ref, 1.0)
+
+    A = _macro_matrix()
+    base = _desserts(portion_fruit_g, portion_laitier_g)
+    return {
+        "Wa": w[:, None] * A, "yw": w * (objectif - base),
+        "reg": regularisation / ref ** 2, "ref": ref,
+        "lb": lb, "ub": ub, "A": A, "base": base, "objectif": objectif,
+    }
+
+
+def solve_portions(macros, bounds=None, weights=None, reference=None,
+                   part_repas=DEFAULT_PART_REPAS, portion_fruit_g=100, portion_laitier_g=100,
+                   regularisation=DEFAULT_REGULARISATION):
+    """
+    Portions optimales (continues) du déjeuner et du dîner.
+
+    Args:
+        macros: résultat de compute_macros_targets.
+        bounds: {groupe: (min, max)} ou {(repas, groupe): (min, max)} en g ;
+            min == max fixe la portion. Défaut : DEFAULT_BOUNDS.
+        weights: poids des écarts relatifs {prot, carb, lip, kcal}.
+        reference: portions de référence {groupe: g} (ou {(repas, groupe): g})
+            vers lesquelles la régularisation attire la solution.
+        part_repas: part des cibles journalières visée par déj + dîner + desserts.
+
+    Returns:
+        dict avec "dejeuner" et "diner" ({groupe: g}), "fourni" (macros de la
+        solution, comme estimate_programme_macros), "objectif" (cibles x
+        part_repas) et "ecarts" (fourni - objectif).
+    """
+    p = _build_problem(
+        macros, bounds, weights, reference, part_repas,
+        portion_fruit_g, portion_laitier_g, regularisation,
+    )
+    sqrt_reg = np.sqrt(p["reg"])
+    M = np.vstack([p["Wa"], np.diag(sqrt_reg)])
+    y = np.concatenate([p["yw"], sqrt_reg * p["ref"]])
+    x = bounded_least_squares(M, y, p["lb"], p["ub"])
+    return _solution(x, p["A"], p["base"], p["objectif"])
+
+
+def _solution(x, A, base, objectif):
+    fourni = A @ x + base
+    out = {repas: {} for repas in REPAS}
+    for (repas, groupe), val in zip(VARIABLES, x.tolist()):
+        out[repas][groupe] = val
+    out["fourni"] = {k: round(float(v), 1) for k, v in zip(MACROS, fourni)}
+    out["objectif"] = {k: round(float(v), 1) for k, v in zip(MACROS, objectif)}
+    out["ecarts"] = {k: round(float(f - o), 1) for k, f, o in zip(MACROS, fourni, objectif)}
+    return out
+
+
+def _clinical_constraints(macros, A, base):
+    """
+    Limites cliniques sur l'énergie fournie (4 prot + 4 gluc + 9 lip) sous la
+    forme G x <= h : lipides <= LIPIDES_PLAFOND_PCT %, glucides >= plancher.
+    """
+    glu_min = float(macros.get("ratios", {}).get("glucides_pct_min", 40)) / 100
+    lip_max = LIPIDES_PLAFOND_PCT / 100
+    energy = np.array([4.0, 4.0, 9.0, 0.0])
+    E_row, E_base = energy @ A, energy @ base
+    prot, carb, lip = 0, 1, 2
+    G = np.array([
+        9 * A[lip] - lip_max * E_row,
+        glu_min * E_row - 4 * A[carb],
+    ])
+    h = np.array([
+        -(9 * base[lip] - lip_max * E_base),
+        -(glu_min * E_base - 4 * base[carb]),
+    ])
+    return G, h
+
+
+def _lagrange_multipliers(H, c, G, h, lb, ub, iterations=20, lam0=None, S=None, x0=None):
+    """
+    Multiplicateurs λ >= 0 des contraintes G x <= h pour
+    min xᵀHx - 2cᵀx sur la boîte, par ascension duale de Newton (courbure
+    calculée hors bornes, pas divisé par deux s'il n'améliore pas le dual).
+    Tout λ >= 0 donne une borne valide : on garde le meilleur rencontré.
+    x0 : point de départ du premier sous-problème (ex. minimiseur du parent).
+    Retourne (λ, valeur duale sans constante, minimiseur du lagrangien).
+    """
+    if S is None:
+        S = 0.5 * G @ np.linalg.solve(H, G.T)
+
+    def dual(lam, start=None):
+        c_lag = c - 0.5 * G.T @ lam
+        x = box_qp(H, c_lag, lb, ub, start)
+        return float(x @ H @ x - 2 * c_lag @ x - lam @ h), G @ x - h, x
+
+    lam = np.zeros(len(h)) if lam0 is None else lam0
+    val, grad, x = dual(lam, x0)
+    for _ in range(iterations):
+        if np.all(grad <= 1e-9) and abs(float(lam @ grad)) <= 1e-9 * max(1.0, abs(val)):
+            break
+        # Newton restreint aux multiplicateurs actifs (λ > 0 ou contrainte violée)
+        active = (lam > 0) | (grad > 0)
+        step = np.zeros_like(lam)
+        step[active] = np.linalg.lstsq(S[np.ix_(active, active)], grad[active], rcond=None)[0]
+        t = 1.0
+        while t > 1e-3:
+            cand = np.maximum(lam + t * step, 0.0)
+            cand_val, cand_grad, cand_x = dual(cand, x)
+            if cand_val > val + 1e-12:
+                lam, val, grad, x = cand, cand_val, cand_grad, cand_x
+                break
+            t /= 2
+        else:
+            break
+    return lam, val, x
+
+
+def _grid(lo, hi, step):
+    """Valeurs multiples de step dans [lo, hi] (la valeur elle-même si lo == hi)."""
+    if lo == hi:
+        return np.array([lo])
+    k = np.arange(np.ceil(lo / step - 1e-9), np.floor(hi / step + 1e-9) + 1)
+    if not len(k):
+        raise ValueError("Aucune portion de la grille entre les bornes min et max")
+    return k * step
+
+
+def _split_tables(p, step):
+    """
+    Les colonnes déjeuner et dîner d'un même groupe apportent les mêmes macros :
+    seul leur total compte pour les écarts et les limites cliniques. Pour chaque
+    groupe, on tabule tous les totaux atteignables sur la grille avec la
+    répartition déj/dîner de moindre régularisation.
+
+    Retourne, par groupe, (totaux triés, coût, portion déj, portion dîner) et
+    une minorante quadratique du coût : rho * (T - R)² + const.
+    """
+    lb, ub, ref, reg = p["lb"], p["ub"], p["ref"], p["reg"]
+    n_g = len(GROUPES)
+    tables = []
+    rho, R, const = np.zeros(n_g), np.zeros(n_g), np.zeros(n_g)
+    for g in range(n_g):
+        d, n = g, g + n_g
+        vd, vn = _grid(lb[d], ub[d], step[d]), _grid(lb[n], ub[n], step[n])
+        cost = (reg[d] * (vd[:, None] - ref[d]) ** 2 + reg[n] * (vn[None, :] - ref[n]) ** 2).ravel()
+        total = np.round(vd[:, None] + vn[None, :], 6).ravel()
+        order = np.lexsort((cost, total))
+        first = np.r_[True, total[order][1:] != total[order][:-1]]
+        sel = order[first]
+        i_d, i_n = np.unravel_index(sel, (len(vd), len(vn)))
+        tables.append((total[sel], cost[sel], vd[i_d], vn[i_n]))
+
+        fixed_d, fixed_n = lb[d] == ub[d], lb[n] == ub[n]
+        if fixed_d and fixed_n:
+            const[g] = cost.min()
+        elif fixed_n:
+            rho[g], R[g] = reg[d], lb[n] + ref[d]
+            const[g] = reg[n] * (lb[n] - ref[n]) ** 2
+        elif fixed_d:
+            rho[g], R[g] = reg[n], lb[d] + ref[n]
+            const[g] = reg[d] * (lb[d] - ref[d]) ** 2
+        else:
+            rho[g], R[g] = reg[d] * reg[n] / (reg[d] + reg[n]), ref[d] + ref[n]
+    return tables, rho, R, const
+
+
+def solve_portions_granular(macros, bounds=None, weights=None, reference=None,
+                            part_repas=DEFAULT_PART_REPAS, portion_fruit_g=100, portion_laitier_g=100,
+                            regularisation=DEFAULT_REGULARISATION, steps=None,
+                            budget_ms=DEFAULT_BUDGET_MS, gap=DEFAULT_GAP):
+    """
+    Portions optimales sur la grille des pas (5 g, 10 g, 1 g...)
+    par séparation et évaluation (branch-and-bound), en respectant les limites
+    cliniques (lipides <= 34 %, glucides >= plancher des ratios) sur l'énergie
+    fournie par déj + dîner + desserts.
+
+    La recherche porte sur les totaux déj + dîner de chaque groupe (4
+    variables, cf. _split_tables). À chaque nœud, la borne inférieure est la
+    relaxation lagrangienne des limites cliniques (multiplicateurs réajustés
+    depuis ceux du parent) sur la boîte des totaux, avec la minorante
+    quadratique du coût de répartition. Un nœud est élagué si sa borne
+    atteint la meilleure solution connue à `gap` près, ou si les limites
+    cliniques sont irréalisables sur sa boîte. La recherche s'arrête à
+    budget_ms : le résultat indique alors "optimal": False.
+
+    Args:
+        steps: {groupe: pas} ou {(repas, groupe): pas} en g, défaut DEFAULT_STEPS.
+        budget_ms: budget de temps de la recherche.
+        gap: écart relatif toléré entre la solution et la borne.
+        Autres arguments : voir solve_portions.
+
+    Returns:
+        Même format que solve_portions, plus "faisable" (limites cliniques
+        respectées), "optimal" (optimum prouvé dans le budget),
+        "noeuds" et "temps_ms".
+    """
+    t0 = time.perf_counter()
+    p = _build_problem(
+        macros, bounds, weights, reference, part_repas,
+        portion_fruit_g, portion_laitier_g, regularisation,
+    )
+    G, h = _clinical_constraints(macros, p["A"], p["base"])
+    steps = steps or {}
+    step = np.array([
+        float(steps.get((repas, groupe), steps.get(groupe, DEFAULT_STEPS[groupe])))
+        for repas, groupe in VARIABLES
+    ])
+    tables, rho, R, const_split = _split_tables(p, step)
+    totals = [t[0] for t in tables]
+    n_g = len(GROUPES)
+
+    # Problème réduit en T (totaux par groupe) : f(T) = Tᵀ H T - 2 cᵀT + const
+    Ag, Gg, yw = p["Wa"][:, :n_g], G[:, :n_g], p["yw"]
+    H = Ag.T @ Ag + np.diag(rho)
+    c = Ag.T @ yw + rho * R
+    const = float(yw @ yw + rho @ R ** 2 + const_split.sum())
+    S = 0.5 * Gg @ np.linalg.solve(H, Gg.T)
+
+    def exact(idx):
+        T = np.array([totals[g][i] for g, i in enumerate(idx)])
+        r = Ag @ T - yw
+        return float(r @ r) + sum(tables[g][1][i] for g, i in enumerate(idx)), T
+
+    def feasible(T):
+        return bool(np.all(Gg @ T <= h + 1e-9))
+
+    def snap(T, lo, hi):
+        """Index du total atteignable le plus proche de T dans [lo, hi]."""
+        out = []
+        for g in range(n_g):
+            tv = totals[g]
+            j = int(np.clip(np.searchsorted(tv, T[g]), lo[g], hi[g]))
+            if j > lo[g] and abs(tv[j - 1] - T[g]) <= abs(tv[j] - T[g]):
+                j -= 1
+            out.append(j)
+        return out
+
+    lo0 = np.zeros(n_g, dtype=int)
+    hi0 = np.array([len(t) - 1 for t in totals])
+    box = lambda lo, hi: (np.array([totals[g][lo[g]] for g in range(n_g)]),
+                          np.array([totals[g][hi[g]] for g in range(n_g)]))
+
+    t_lo, t_hi = box(lo0, hi0)
+    lam_root, _, T_relax = _lagrange_multipliers(H, c, Gg, h, t_lo, t_hi, S=S)
+    best_idx, best_f = None, np.inf
+    idx = snap(T_relax, lo0, hi0)
+    f, T = exact(idx)
+    if feasible(T):
+        best_idx, best_f = idx, f
+
+    nodes, complete = 0, True
+    stack = [(lo0, hi0, lam_root, T_relax)]
+    while stack:
+        if (time.perf_counter() - t0) * 1000 > budget_ms:
+            complete = False
+            break
+        lo, hi, lam_parent, T_parent = stack.pop()
+        nodes += 1
+        t_lo, t_hi = box(lo, hi)
+        if np.any(np.where(Gg > 0, Gg * t_lo, Gg * t_hi).sum(axis=1) > h + 1e-9):
+            continue  # limites cliniques irréalisables sur la boîte
+        lam, dual_val, T = _lagrange_multipliers(
+            H, c, Gg, h, t_lo, t_hi, iterations=NODE_DUAL_STEPS, lam0=lam_parent, S=S,
+            x0=np.clip(T_parent, t_lo, t_hi),
+        )
+        bound = dual_val + const
+        if bound >= best_f - gap * abs(best_f) - 1e-12:
+            continue
+
+        idx = snap(T, lo, hi)
+        dist = np.array([abs(totals[g][idx[g]] - T[g]) for g in range(n_g)])
+        if dist.max() > 1e-6:
+            # Total non atteignable : on sépare de part et d'autre de T
+            g = int(np.argmax(dist / np.maximum(step[:n_g], 1e-9)))
+            cut = int(np.searchsorted(totals[g], T[g]))  # totaux[cut-1] < T < totaux[cut]
+            near_low = idx[g] < cut
+        else:
+            f, T_int = exact(idx)
+            if feasible(T_int):
+                if f < best_f:
+                    best_idx, best_f = idx, f
+                if f <= bound + gap * abs(f) + 1e-12:
+                    continue  # la borne est atteinte : optimum de la boîte
+            width = hi - lo
+            if width.max() < 1:
+                continue
+            g = int(np.argmax(width))
+            cut = min(max(idx[g], lo[g] + 1), hi[g])
+            near_low = idx[g] < cut
+        down_hi, up_lo = hi.copy(), lo.copy()
+        down_hi[g] = cut - 1
+        up_lo[g] = cut
+        children = [(up_lo, hi), (lo, down_hi)] if near_low else [(lo, down_hi), (up_lo, hi)]
+        for c_lo, c_hi in children:
+            stack.append((c_lo, c_hi, lam, T))
+
+    faisable = best_idx is not None
+    if not faisable:
+        best_idx = snap(T_relax, lo0, hi0)
+    x = np.zeros(len(VARIABLES))
+    for g, i in enumerate(best_idx):
+        x[g], x[g + n_g] = tables[g][2][i], tables[g][3][i]
+    out = _solution(x, p["A"], p["base"], p["objectif"])
+    out["faisable"] = faisable
+    out["optimal"] = complete and faisable
+    out["noeuds"] = nodes
+    out["temps_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    return out
+
+
+def rank_snack_combinations(reste, options_pdj, options_collation, cibles, k=5, weights=None):
+    """
+    Classe les couples (petit-déjeuner, collation) qui comblent au mieux le
+    reste de la journée après déjeuner + dîner.
+
+    Écart d'un couple : somme_m w_m * ((pdj_m + collation_m - reste_m) / cible_m)^2,
+    avec les poids de solve_portions. Les collations sont triées par kcal et
+    les PDJ parcourus du plus proche du reste au plus éloigné : pour chaque
+    PDJ, seules les collations dont le seul terme kcal reste sous le k-ième
+    meilleur écart sont évaluées (fenêtre en kcal, puis écarts vectorisés). Quelques
+    centaines d'options par liste se traitent en quelques millisecondes.
+
+    Args:
+        reste: {prot, carb, lip, kcal} restant à combler.
+        options_pdj, options_collation: listes de {prot, carb, lip, kcal},
+            une par option, telles que les donne option_parser.option_macros
+            (analyseur partagé du texte libre des options).
+        cibles: cibles journalières {prot, carb, lip, kcal} (échelle des écarts).
+        k: nombre de couples retournés.
+
+    Returns:
+        Liste triée de {"pdj": i, "collation": j, "fourni": {...}, "ecarts": {...}, "score"}.
+    """
+    weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+    w = np.array([weights[m] / max(float(cibles[m]), 1e-9) ** 2 for m in MACROS])
+    r = np.array([float(reste[m]) for m in MACROS])
+    P = np.array([[float(o[m]) for m in MACROS] for o in options_pdj]).reshape(-1, 4)
+    C = np.array([[float(o[m]) for m in MACROS] for o in options_collation]).reshape(-1, 4)
+    if not len(P) or not len(C):
+        return []
+
+    kcal = MACROS.index("kcal")
+    order = np.argsort(C[:, kcal], kind="stable")
+    C_sorted = C[order]
+    c_kcal = C_sorted[:, kcal].tolist()
+    w_kcal = w[kcal]
+
+    best = []  # tas de (-score, i, j) des k meilleurs
+    for i in sorted(range(len(P)), key=lambda i: abs(P[i, kcal] - r[kcal])):
+        cible_kcal = r[kcal] - P[i, kcal]
+        if len(best) == k:
+            # Seules les collations assez proches en kcal peuvent encore entrer
+            rayon = np.sqrt(-best[0][0] / w_kcal) if w_kcal > 0 else np.inf
+            lo = bisect.bisect_left(c_kcal, cible_kcal - rayon)
+            hi = bisect.bisect_right(c_kcal, cible_kcal + rayon)
+        else:
+            lo, hi = 0, len(c_kcal)
+        if lo >= hi:
+            continue
+        d = C_sorted[lo:hi] - (r - P[i])
+        scores = (d * d) @ w
+        for j in np.argsort(scores, kind="stable")[:k]:
+            entry = (-float(scores[j]), i, int(order[lo + j]))
+            if len(best) < k:
+                heapq.heappush(best, entry)
+            elif entry[0] > best[0][0]:
+                heapq.heapreplace(best, entry)
+            else:
+                break
+
+    out = []
+    for neg_score, i, j in sorted(best, key=lambda e: (-e[0], e[1], e[2])):
+        fourni = P[i] + C[j]
+        out.append({
+            "pdj": i,
+            "collation": j,
+            "fourni": {m: round(float(v), 1) for m, v in zip(MACROS, fourni)},
+            "ecarts": {m: round(float(v), 1) for m, v in zip(MACROS, fourni - r)},
+            "score": -neg_score,
+        })
+    return out
@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+# Les modules de l'application sont à la racine du dépôt
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_manager
+import programme_graph
+import solver
+
+
+@pytest.fixture
+def entrees():
+    """Entrées de programme_graph, réglages par défaut (widgets à leur valeur initiale)."""
+    settings = data_manager.DEFAULT_SETTINGS
+    p = settings["portions"]
+    return dict(
+        client_ref="Patient Test", sexe="F", age=42, poids=68.0, taille=165, facteur_activite=1.55,
+        formule_bmr="Harris-Benedict", masse_grasse=None, kcal_cible=1800, ratios=settings["macros_cibles"],
+        settings=settings, objectifs=["Manger à bonne quantité - suivre le programme"], food_db=None,
+        pdj_choisies=settings["options_pdj"], collation_choisies=settings["options_collation"],
+        dej_viande=p["proteines_viande"], dej_poisson=p["proteines_poisson"], dej_oeufs=p["proteines_oeufs"],
+        dej_feculents=p["feculents_cuits"], dej_legumes=p["legumes_cuits"], dej_crudites=p["legumes_crus"],
+        dej_mg=p["matieres_grasses_g"],
+        din_viande=p["proteines_viande"], din_poisson=p["proteines_poisson"], din_oeufs=p["proteines_oeufs"],
+        din_feculents=p["feculents_cuits"], din_mg=p["matieres_grasses_g"],
+        part_repas_pct=int(solver.DEFAULT_PART_REPAS * 100), simu_n=1000, semaine_graine=0,
+    )
+
+
+@pytest.fixture
+def payload(entrees):
+    """Payload PDF de l'onglet Programme pour `entrees`."""
+    graphe = programme_graph.ProgrammeGraph()
+    graphe.set_inputs(**entrees)
+    return graphe.get("payload")
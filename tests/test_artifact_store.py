@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+from artifact_store import ArtifactStore
+
+
+def test_open_streams_and_survives_eviction(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    handle = store.put(b"%PDF-contenu")
+    with store.open(handle) as f:
+        os.remove(store.path(handle))
+        assert f.read() == b"%PDF-contenu"
+    assert store.read(handle) is None
+    with pytest.raises(FileNotFoundError, match="expiré"):
+        store.open(handle)
+    with pytest.raises(FileNotFoundError, match="expiré"):
+        store.path(handle)
+
+
+def test_put_stream_matches_put(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    handle = store.put_stream(lambda f: [f.write(b"%PDF-"), f.write(b"contenu")])
+    assert handle == store.put(b"%PDF-contenu")
+    assert store.stats() == {"fichiers": 1, "octets": len(b"%PDF-contenu")}
@@ -0,0 +1,38 @@
+import json
+import os
+import zipfile
+
+import batch_pdf
+
+
+def _entree(tmp_path, payload):
+    path = tmp_path / "payloads.jsonl"
+    lignes = [
+        json.dumps(payload),
+        "pas du json",
+        json.dumps({"id": "second", "payload": {**payload, "client_ref": "Autre"}}),
+    ]
+    path.write_text("\n".join(lignes) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_zip_and_directory_outputs_hold_the_same_documents(tmp_path, payload):
+    entree = _entree(tmp_path, payload)
+    archive = str(tmp_path / "lot.zip")
+    dossier = str(tmp_path / "lot")
+
+    bilan = batch_pdf.run_batch(entree, archive, workers=2)
+    assert (bilan["ok"], bilan["erreurs"]) == (2, 1)
+    assert batch_pdf.run_batch(entree, dossier, workers=2)["ok"] == 2
+
+    with zipfile.ZipFile(archive) as z:
+        noms = sorted(z.namelist())
+        assert noms == sorted(os.listdir(dossier))
+        assert noms == ["00001_Programme_Alimentaire_Patient_Test.pdf", "00003_Programme_Alimentaire_second.pdf"]
+        for nom in noms:
+            assert z.read(nom).startswith(b"%PDF-")
+    # Le dossier temporaire du zip est supprimé
+    assert sorted(os.listdir(tmp_path)) == [
+        "lot", "lot.erreurs.jsonl", "lot.zip", "lot.zip.erreurs.jsonl", "payloads.jsonl"]
+    with open(bilan["journal"], encoding="utf-8") as f:
+        assert json.loads(f.readline())["ligne"] == 2
@@ -0,0 +1,28 @@
+import os
+
+import pandas as pd
+
+import data_manager
+
+
+def test_table_rebuild_keeps_current_sidecars_and_drops_stale_ones(tmp_path):
+    classeur = tmp_path / "Ciqual.xlsx"
+    pd.DataFrame({"alim_nom_fr": ["Pomme"], "kcal": [52]}).to_excel(classeur, index=False)
+    actuel = data_manager._ciqual_cache_path(str(classeur), data_manager._file_digest(str(classeur)))
+    courant = actuel[:-len(".npz")]
+    fichiers = {
+        "Ciqual.0123456789abcdef.npz": False,
+        "Ciqual.0123456789abcdef.knn.npz": False,
+        os.path.basename(courant) + ".knn.npz": True,  # index voisins de la version actuelle
+        "Ciqual.sauvegarde.npz": True,  # hors motif : pas un cache
+    }
+    for nom in fichiers:
+        (tmp_path / nom).write_bytes(b"")
+
+    df = data_manager.read_ciqual_table(str(classeur))
+    assert list(df["alim_nom_fr"]) == ["Pomme"]
+    assert os.path.exists(actuel)
+    for nom, garde in fichiers.items():
+        assert (tmp_path / nom).exists() == garde, nom
+    # Relecture depuis le cache binaire
+    assert data_manager.read_ciqual_table(str(classeur)).attrs["cache_path"] == actuel
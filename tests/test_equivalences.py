@@ -0,0 +1,27 @@
+import random
+
+import data_manager
+
+
+def _types(table):
+    return [(type(r["poids_g"]), type(r["kcal"])) for r in table]
+
+
+def test_batch_matches_scalar_randomized():
+    rng = random.Random(0)
+    groupes = list(data_manager.EQUIVALENCES) + ["Inconnu"]
+    cas = [(rng.choice(groupes), rng.choice([0, 0.0, rng.randint(0, 400), round(rng.uniform(0, 400), 1)]))
+           for _ in range(5000)]
+    batch = data_manager.generate_equivalences_batch([g for g, _ in cas], [p for _, p in cas])
+    for (groupe, portion), table in zip(cas, batch):
+        attendu = data_manager.generate_equivalences(groupe, portion)
+        assert table == attendu, (groupe, portion)
+        assert _types(table) == _types(attendu), (groupe, portion)
+
+
+def test_batch_unknown_group_and_zero_portion():
+    tables = data_manager.generate_equivalences_batch(["Inconnu", "Féculents", "Matières Grasses"], [100, 0, 0])
+    assert tables[0] == []
+    assert tables[1] == data_manager.generate_equivalences("Féculents", 0)
+    assert tables[2] == data_manager.generate_equivalences("Matières Grasses", 0)
+    assert _types(tables[1]) == _types(data_manager.generate_equivalences("Féculents", 0))
@@ -0,0 +1,50 @@
+import os
+
+import pytest
+
+import data_manager
+import option_parser
+
+
+@pytest.fixture(scope="module")
+def food_db():
+    racine = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return data_manager.FoodDatabase.load(os.path.join(racine, data_manager.CIQUAL_FILE))
+
+
+def _item(option):
+    return option_parser.parse_option(option)[0]
+
+
+def test_unknown_word_is_unresolved(food_db):
+    resolu = option_parser.resolve_item(_item("1 blorf"), food_db)
+    assert resolu["source"] is None
+    assert resolu["macros"] == dict.fromkeys(option_parser.MACROS, 0.0)
+
+
+def test_known_food_resolves_from_ciqual(food_db):
+    resolu = option_parser.resolve_item(_item("50g quinoa"), food_db)
+    assert resolu["source"] == "ciqual"
+    assert "Quinoa" in resolu["reference"]
+    assert resolu["grammes"] == 50
+
+
+def test_option_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(option_parser, "OPTION_CACHE_MAX", 3)
+    option_parser.invalidate_cache()
+    for i in range(10):
+        option_parser.option_macros(f"{i + 1}0g fromage blanc")
+    assert option_parser.cache_stats()["size"] == 3
+    option_parser.invalidate_cache()
+
+
+def test_sum_and_alternative_are_cached_apart(food_db):
+    option_parser.invalidate_cache()
+    somme = option_parser.option_macros("1 yaourt + 50g quinoa", food_db)
+    alternative = option_parser.option_macros("1 yaourt / 50g quinoa", food_db)
+    assert somme != alternative
+    assert somme["kcal"] > alternative["kcal"]
+    # Casse et espaces seuls : même entrée du cache
+    assert option_parser.option_macros("1 Yaourt  +  50G quinoa", food_db) == somme
+    assert option_parser.cache_stats()["hits"] == 1
+    option_parser.invalidate_cache()
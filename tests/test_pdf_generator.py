@@ -0,0 +1,94 @@
+import datetime
+import io
+
+import pytest
+
+import pdf_generator
+import programme_model
+
+DATE = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class _PolicePublique(pdf_generator.ProgrammePDF):
+    """ProgrammePDF avec la police enregistrée par l'API publique (add_font)."""
+
+    def _add_police(self):
+        self.add_font(pdf_generator.FONT_NAME, "", pdf_generator.FONT_PATH)
+
+
+def _reference(data):
+    """Rendu d'un seul tenant, sans cache de sections ni sous-ensemble maison."""
+    pdf = _PolicePublique()
+    pdf.set_margins(15, 15, 15)
+    for _, blocs in programme_model.sections(data):
+        pdf_generator._dessiner(pdf, blocs)
+    return bytes(pdf.output())
+
+
+def _pages(pdf):
+    pypdf = pytest.importorskip("pypdf")
+    return [page.extract_text() for page in pypdf.PdfReader(io.BytesIO(pdf)).pages]
+
+
+def _noms_longs(payload):
+    repas = payload["dejeuner"]["feculents"]
+    lignes = [{**row, "nom": f"{row['nom']}, préparation maison, cuit à l'eau, sans sel ajouté"}
+              for row in repas["equivalences"]] * 6
+    return {**payload, "dejeuner": {**payload["dejeuner"], "feculents": {**repas, "equivalences": lignes}}}
+
+
+@pytest.mark.parametrize("variante", ["defaut", "vide", "noms_longs"])
+def test_pages_and_text_match_public_api_render(payload, variante):
+    data = {"defaut": payload, "vide": {}, "noms_longs": _noms_longs(payload)}[variante]
+    pdf_generator.invalidate_section_cache()
+    pages = _pages(bytes(pdf_generator.generate_programme_pdf(data)))
+    assert pages == _pages(_reference(data))
+    assert "Patient Test" in pages[0] or variante == "vide"
+
+
+def test_single_embedded_font(payload):
+    pdf = bytes(pdf_generator.generate_programme_pdf(payload))
+    assert pdf.count(b"/FontFile2") == 1
+
+
+def _octets(data):
+    pdf = pdf_generator._assembler(data)
+    pdf.set_creation_date(DATE)
+    return bytes(pdf.output())
+
+
+def test_cached_render_is_byte_identical_to_cold_render(payload):
+    pdf_generator.invalidate_section_cache()
+    froid = _octets(payload)
+    assert pdf_generator.section_cache_stats()["hits"] == 0
+    chaud = _octets(payload)
+    assert pdf_generator.section_cache_stats()["misses"] == len(programme_model.SECTIONS)
+    assert chaud == froid
+
+
+def test_cache_reused_across_documents(payload):
+    """Une section changée ne perturbe pas les sections voisines reprises du cache."""
+    autre = {**payload, "client_ref": "Autre Patient"}
+    pdf_generator.invalidate_section_cache()
+    froid = _octets(autre)
+    _octets(payload)
+    pdf_generator.invalidate_section_cache()
+    _octets(payload)
+    assert _octets(autre) == froid
+
+
+def test_streamed_output_matches_in_memory_output(payload, monkeypatch, tmp_path):
+    assembler = pdf_generator._assembler
+
+    def date_fixe(data):
+        pdf = assembler(data)
+        pdf.set_creation_date(DATE)
+        return pdf
+
+    monkeypatch.setattr(pdf_generator, "_assembler", date_fixe)
+    attendu = bytes(pdf_generator.generate_programme_pdf(payload))
+    flux = io.BytesIO()
+    assert pdf_generator.write_programme_pdf(payload, flux) == len(attendu)
+    assert flux.getvalue() == attendu
+    pdf_generator.write_programme_pdf(payload, tmp_path / "programme.pdf")
+    assert (tmp_path / "programme.pdf").read_bytes() == attendu
@@ -0,0 +1,50 @@
+import os
+import time
+
+import pytest
+
+import pdf_jobs
+from artifact_store import ArtifactStore
+
+
+@pytest.fixture
+def queue(tmp_path):
+    q = pdf_jobs.PdfJobQueue(ArtifactStore(str(tmp_path)), workers=1)
+    yield q
+    q._pool.shutdown(cancel_futures=True)
+
+
+def _attendre(queue, job_id, timeout=60):
+    fin = time.monotonic() + timeout
+    while queue.status(job_id) in ("en_attente", "en_cours"):
+        assert time.monotonic() < fin
+        time.sleep(0.05)
+    return queue.status(job_id)
+
+
+def test_evicted_pdf_is_forgotten_and_resubmitted(queue, payload):
+    job_id = queue.submit(payload)
+    assert _attendre(queue, job_id) == "termine"
+    handle = queue.result(job_id)
+    assert queue.store.read(handle).startswith(b"%PDF-")
+    assert queue.stats()["termine"] == 1
+
+    os.remove(os.path.join(queue.store.root, handle))
+    assert queue.status(job_id) == "inconnu"
+    assert queue.submit(payload) == job_id
+    assert _attendre(queue, job_id) == "termine"
+    # Rendu refait (horodatage compris) : nouveau fichier présent sur disque
+    assert queue.store.read(queue.result(job_id)).startswith(b"%PDF-")
+
+
+def test_resubmit_after_eviction_renders_again(queue, payload):
+    job_id = queue.submit(payload)
+    assert _attendre(queue, job_id) == "termine"
+    os.remove(os.path.join(queue.store.root, queue.result(job_id)))
+
+    # Sans passer par status : submit voit lui-même que le PDF a disparu
+    assert queue.submit(payload) == job_id
+    assert _attendre(queue, job_id) == "termine"
+    handle = queue.result(job_id)
+    assert queue.store.exists(handle)
+    assert queue.store.read(handle).startswith(b"%PDF-")
@@ -0,0 +1,81 @@
+import inspect
+
+import numpy as np
+import pytest
+
+import programme_graph
+import solver
+
+
+def test_equal_arrays_do_not_invalidate_dependents():
+    appels = []
+
+    def somme(tableau):
+        appels.append(1)
+        return float(tableau.sum())
+
+    graphe = programme_graph.Graph({"somme": somme}, ("tableau",))
+    graphe.set_inputs(tableau=np.arange(6.0).reshape(2, 3))
+    assert graphe.get("somme") == 15.0
+    graphe.set_inputs(tableau=np.arange(6.0).reshape(2, 3))
+    graphe.get("somme")
+    assert len(appels) == 1
+    graphe.set_inputs(tableau=np.arange(6.0))
+    graphe.get("somme")
+    assert len(appels) == 2
+
+
+def test_egal():
+    assert programme_graph._egal(np.zeros(3), np.zeros(3))
+    assert not programme_graph._egal(np.zeros(3), np.zeros((3, 1)))
+    assert not programme_graph._egal(np.zeros(3), np.zeros(3, dtype=int))
+    assert not programme_graph._egal(np.zeros(3), [0.0, 0.0, 0.0])
+    assert programme_graph._egal({"a": [1, 2]}, {"a": [1, 2]})
+
+
+def _dependants(entree):
+    """Nœuds de programme_graph qui dépendent (transitivement) de `entree`."""
+    deps = {nom: set(inspect.signature(fn).parameters) for nom, fn in programme_graph.NODES.items()}
+    atteints = {entree}
+    while True:
+        suivants = {nom for nom, d in deps.items() if d & atteints} - atteints
+        if not suivants:
+            return atteints - {entree}
+        atteints |= suivants
+
+
+def _tout_lire(graphe):
+    valeurs = {nom: graphe.get(nom) for nom in programme_graph.NODES}
+    # Durée du solveur : seule valeur non déterministe
+    valeurs["solution"] = {k: v for k, v in valeurs["solution"].items() if k != "temps_ms"}
+    return valeurs
+
+
+@pytest.mark.parametrize("changement", [
+    {"dej_mg": 15},
+    {"client_ref": "Autre Patient"},
+    {"poids": 80.0},
+    {"ratios": {"proteines_pct": 25, "glucides_pct": 45, "lipides_pct": 30}},
+])
+def test_change_recomputes_only_dependents_and_matches_fresh_build(entrees, changement):
+    graphe = programme_graph.ProgrammeGraph()
+    graphe.set_inputs(**entrees)
+    _tout_lire(graphe)
+
+    graphe.begin_run()
+    graphe.set_inputs(**changement)
+    valeurs = _tout_lire(graphe)
+    recalcules = graphe.recomputed()
+    assert recalcules
+    assert recalcules <= set().union(*(_dependants(entree) for entree in changement))
+
+    neuf = programme_graph.ProgrammeGraph()
+    neuf.set_inputs(**{**entrees, **changement})
+    for nom, valeur in _tout_lire(neuf).items():
+        assert programme_graph._egal(valeurs[nom], valeur), nom
+
+
+def test_cibles_is_the_solver_targets(entrees):
+    graphe = programme_graph.ProgrammeGraph()
+    graphe.set_inputs(**entrees)
+    assert graphe.get("cibles") == solver.cibles_from_macros(graphe.get("macros"))
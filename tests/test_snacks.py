@@ -0,0 +1,25 @@
+import itertools
+
+import numpy as np
+
+import data_manager
+import option_parser
+import solver
+
+
+def test_rank_snack_combinations_matches_brute_force_on_parsed_options():
+    settings = data_manager.DEFAULT_SETTINGS
+    pdj = [option_parser.option_macros(o) for o in settings["options_pdj"]]
+    collation = [option_parser.option_macros(o) for o in settings["options_collation"]]
+    cibles = {"prot": 95.0, "carb": 230.0, "lip": 65.0, "kcal": 2000.0}
+    reste = {"prot": 30.0, "carb": 80.0, "lip": 20.0, "kcal": 700.0}
+
+    couples = solver.rank_snack_combinations(reste, pdj, collation, cibles, k=5)
+
+    w = {m: solver.DEFAULT_WEIGHTS[m] / cibles[m] ** 2 for m in solver.MACROS}
+    scores = sorted(
+        (sum(w[m] * (p[m] + c[m] - reste[m]) ** 2 for m in solver.MACROS), i, j)
+        for (i, p), (j, c) in itertools.product(enumerate(pdj), enumerate(collation))
+    )[:5]
+    assert [(c["pdj"], c["collation"]) for c in couples] == [(i, j) for _, i, j in scores]
+    assert np.allclose([c["score"] for c in couples], [s for s, _, _ in scores])